@@ -0,0 +1,210 @@
+"""
+Todoハンドラのコールドスタート計測
+
+各ハンドラを新しいサブプロセスでimportし、以下をJSONファイルに記録する:
+  - initMs:            モジュールimport（初期化フェーズ）の所要時間
+  - importTime:        -X importtime による累積時間の大きいモジュール
+  - firstInvocationMs: 初回呼び出しのレイテンシ
+  - warmMs:            2回目以降（ウォーム）のレイテンシ p50/p95
+
+DynamoDBはローカルのスタンドイン（既定: DynamoDB Local http://localhost:8000）を使う。
+テーブルがなければ template.yaml と同じ定義で作成する。--emulator 指定時は
+インメモリのエミュレータを使い、計測用のタスクは子プロセス内で作成する
+（ネットワークを含まないため、ハンドラ自体の処理時間の比較に向く）。
+
+--compare に以前の結果を渡すと差分を表示し、初期化時間が --fail-threshold（%）を
+超えて悪化した関数があれば終了コード1で終了する（コミット間の比較用）。
+
+使い方:
+    docker run -p 8000:8000 amazon/dynamodb-local
+    python benchmarks/bench_cold_start.py --output cold-start.json
+    python benchmarks/bench_cold_start.py --compare cold-start.json
+    python benchmarks/bench_cold_start.py --emulator
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+CHILD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cold_start_child.py')
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=harness.ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_importtime(stderr, top):
+    """-X importtime の出力から累積時間の大きいモジュールを抽出"""
+    entries = []
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total_us += int(self_us)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append({'module': name.strip(), 'depth': depth, 'selfUs': int(self_us), 'cumulativeUs': int(cumulative_us)})
+
+    entries.sort(key=lambda e: e['cumulativeUs'], reverse=True)
+    return {'totalUs': total_us, 'top': entries[:top]}
+
+def seed_tasks(route, count):
+    """更新・削除の計測用タスクを作成（子プロセスの接続確立を計測に含めるため親で作成）"""
+    if route not in harness.SEEDED_ROUTES:
+        return []
+    return harness.seed_tasks(count)
+
+def run_child(function, warm, env, importtime):
+    import_path, module, route = harness.FUNCTIONS[function]
+    # エミュレータはプロセスごとにデータを持つため、子プロセス側で作成する
+    in_process = env.get('DYNAMODB_EMULATOR') == '1'
+    task_ids = [] if in_process else seed_tasks(route, warm + 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        spec = {
+            'route': list(route),
+            'taskIds': task_ids,
+            'seedCount': warm + 1 if in_process else 0,
+            'warm': warm,
+            'resultPath': os.path.join(tmp, 'result.json'),
+        }
+        child_env = dict(env)
+        child_env['PYTHONPATH'] = os.pathsep.join([import_path, harness.LAYER_DIR, env.get('PYTHONPATH', '')])
+        if env.get('BENCH_COLD_PYC'):
+            # コンパイル済みバイトコードを使わない（毎回コンパイル）
+            child_env['PYTHONPYCACHEPREFIX'] = os.path.join(tmp, 'pycache')
+
+        command = [sys.executable]
+        if importtime:
+            command += ['-X', 'importtime']
+        command += [CHILD, module, json.dumps(spec)]
+
+        result = subprocess.run(command, env=child_env, capture_output=True, text=True, cwd=tmp)
+        if result.returncode != 0:
+            raise RuntimeError(f'{function} failed:\n{result.stderr[-2000:]}')
+
+        with open(spec['resultPath'], encoding='utf-8') as f:
+            measured = json.load(f)
+    measured['stderr'] = result.stderr
+    return measured
+
+def benchmark(function, runs, warm, env, top):
+    # importtimeの出力は計測を遅くするため、別の1回で取得する
+    profile = run_child(function, 0, env, importtime=True)
+
+    init, first, warm_samples, statuses = [], [], [], set()
+    for _ in range(runs):
+        measured = run_child(function, warm, env, importtime=False)
+        init.append(measured['initMs'])
+        first.append(measured['firstInvocationMs'])
+        warm_samples.extend(measured['warmMs'])
+        statuses.update(measured['statusCodes'])
+
+    return {
+        'initMs': {'median': statistics.median(init), 'min': min(init), 'max': max(init)},
+        'firstInvocationMs': {'median': statistics.median(first), 'min': min(first), 'max': max(first)},
+        'warmMs': {'p50': harness.percentile(warm_samples, 0.50), 'p95': harness.percentile(warm_samples, 0.95)},
+        'statusCodes': sorted(statuses),
+        'importTime': parse_importtime(profile['stderr'], top),
+    }
+
+def compare(current, baseline, threshold):
+    """以前の結果との差分を表示し、初期化時間の悪化があればTrueを返す"""
+    regressed = False
+    print(f"\ncompared with {baseline['meta'].get('commit')}:")
+    print(f"{'function':<12} {'init':>18} {'first invoke':>20}")
+    for name, result in current['functions'].items():
+        base = baseline['functions'].get(name)
+        if not base:
+            continue
+        init_now, init_base = result['initMs']['median'], base['initMs']['median']
+        first_now, first_base = result['firstInvocationMs']['median'], base['firstInvocationMs']['median']
+        change = (init_now - init_base) / init_base * 100 if init_base else 0.0
+        mark = ''
+        if change > threshold:
+            regressed = True
+            mark = '  <-- regression'
+        print(f"{name:<12} {init_base:7.1f}->{init_now:7.1f}ms {first_base:8.1f}->{first_now:7.1f}ms "
+              f"({change:+.1f}%){mark}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description='cold start benchmark for the todo handlers')
+    parser.add_argument('--functions', default=','.join(harness.FUNCTIONS))
+    parser.add_argument('--runs', type=int, default=5, help='関数ごとのコールドスタート回数')
+    parser.add_argument('--warm', type=int, default=20, help='1プロセスあたりのウォーム呼び出し回数')
+    parser.add_argument('--endpoint-url', default=os.environ.get('AWS_ENDPOINT_URL_DYNAMODB', 'http://localhost:8000'))
+    parser.add_argument('--table-name', default='bench-todos')
+    parser.add_argument('--emulator', action='store_true', help='DynamoDB Localの代わりにインメモリのエミュレータを使う')
+    parser.add_argument('--cold-pyc', action='store_true', help='バイトコードキャッシュを使わずに計測')
+    parser.add_argument('--top', type=int, default=15, help='記録するimporttimeの上位件数')
+    parser.add_argument('--output', help='結果を書き出すJSONファイル')
+    parser.add_argument('--compare', help='比較対象の以前の結果（JSON）')
+    parser.add_argument('--fail-threshold', type=float, default=20.0, help='初期化時間の悪化を失敗とみなす割合（%%）')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update({
+        'TABLE_NAME': args.table_name,
+        'AWS_ENDPOINT_URL_DYNAMODB': args.endpoint_url,
+        'PAGE_TOKEN_SECRET': env.get('PAGE_TOKEN_SECRET', 'bench-secret'),
+    })
+    env.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+    env.setdefault('AWS_ACCESS_KEY_ID', 'local')
+    env.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+    if args.cold_pyc:
+        env['BENCH_COLD_PYC'] = '1'
+    if args.emulator:
+        env['DYNAMODB_EMULATOR'] = '1'
+
+    # 親プロセスでもスタンドインを使う（テーブル作成・データ投入）
+    os.environ.update(env)
+    sys.path.insert(0, harness.LAYER_DIR)
+    from common import gateway
+    harness.ensure_table(gateway.client, args.table_name)
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': int(time.time()),
+            'python': sys.version.split()[0],
+            'coldPyc': args.cold_pyc,
+            'emulator': args.emulator,
+            'runs': args.runs,
+            'warm': args.warm,
+        },
+        'functions': {},
+    }
+
+    print(f"{'function':<12} {'init':>9} {'first':>9} {'warm p50':>9} {'warm p95':>9}  (ms)")
+    for function in args.functions.split(','):
+        result = benchmark(function, args.runs, args.warm, env, args.top)
+        results['functions'][function] = result
+        print(f"{function:<12} {result['initMs']['median']:>9.1f} {result['firstInvocationMs']['median']:>9.1f} "
+              f"{result['warmMs']['p50'] or 0:>9.2f} {result['warmMs']['p95'] or 0:>9.2f}")
+
+    # 同じファイルを --compare と --output に指定できるよう、先に読み込む
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if baseline and compare(results, baseline, args.fail_threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
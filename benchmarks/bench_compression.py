@@ -0,0 +1,108 @@
+"""
+レスポンス圧縮のCPU時間と転送量のトレードオフ
+
+GET /todos と同じ形式のレスポンス（日本語のタイトル・説明、ensure_ascii=False）を
+件数ごとに生成し、圧縮方式ごとに以下を出力する。
+  - bytes:  クライアントに届くボディのバイト数（圧縮なしはUTF-8のまま）
+  - ratio:  圧縮前に対する割合
+  - cpu:    Lambda内での圧縮 + base64 の所要時間（ms）
+  - @Nmbps: cpu + 転送時間（ms）の目安（ヘッダー・TLS・RTTは含まない）
+
+brotli パッケージがある場合は br も計測する。AWSへの通信は行わない。
+
+使い方:
+    python benchmarks/bench_compression.py --items 1 5 20 100 --mbps 2 10 50
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYER_DIR = os.path.join(ROOT, 'layers', 'common_layer', 'python')
+sys.path.insert(0, LAYER_DIR)
+
+os.environ.setdefault('TABLE_NAME', 'bench-table')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+
+from common import compression  # noqa: E402
+from common.dynamodb_helper import new_task_id, build_etag  # noqa: E402
+
+TITLES = ['買い物', '週次レポートの作成', '歯医者の予約', '請求書の支払い', 'プレゼン資料のレビュー',
+          '引っ越しの見積もり', '英語の勉強', '部屋の掃除', '誕生日プレゼントを選ぶ', 'ジムに行く']
+DESCRIPTIONS = ['牛乳、卵、パンを買う。帰りにクリーニングも受け取る。',
+                '先週の売上と問い合わせ件数をまとめて、月曜の朝会までに共有する。',
+                '',
+                '午後3時以降で空いている枠を確認して電話する。保険証を忘れないこと。',
+                'デザインチームからのフィードバックを反映し、スライド12〜18を修正する。']
+
+def build_body(count, seed=0):
+    """GET /todos のレスポンスボディ（get_todos と同じ整形・シリアライズ）"""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        task_id, created_at = new_task_id()
+        items.append({
+            'taskId': task_id,
+            'title': f'{rng.choice(TITLES)} {i}',
+            'description': rng.choice(DESCRIPTIONS),
+            'dueDate': f'2030-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z',
+            'priority': rng.choice(['HIGH', 'MEDIUM', 'LOW']),
+            'status': rng.choice(['PENDING', 'COMPLETED']),
+            'createdAt': created_at,
+            'updatedAt': created_at,
+            'etag': build_etag({'version': rng.randint(1, 5)}),
+        })
+    return json.dumps({'items': items, 'count': len(items)}, ensure_ascii=False)
+
+def encoders():
+    """計測する方式: 名前 -> bytesを圧縮する関数（Noneは圧縮なし）"""
+    result = {'identity': None}
+    for level in (1, 6, 9):
+        result[f'gzip-{level}'] = (lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0))
+    if compression.brotli is not None:
+        for quality in (1, 5, 11):
+            result[f'br-{quality}'] = (lambda data, quality=quality: compression.brotli.compress(
+                data, quality=quality, mode=compression.brotli.MODE_TEXT))
+    return result
+
+def measure(body, encode, number):
+    """(クライアントに届くバイト数, 圧縮+base64の1回あたりms)"""
+    data = body.encode('utf-8')
+    if encode is None:
+        return len(data), 0.0
+
+    def run():
+        return base64.b64encode(encode(data))
+
+    elapsed = timeit.timeit(run, number=number) / number
+    return len(encode(data)), elapsed * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='response compression cpu vs bytes')
+    parser.add_argument('--items', type=int, nargs='+', default=[1, 5, 20, 50, 100])
+    parser.add_argument('--mbps', type=float, nargs='+', default=[2, 10, 50],
+                        help='転送時間の見積もりに使う帯域（Mbps）')
+    parser.add_argument('--number', type=int, default=200, help='計測の繰り返し回数')
+    args = parser.parse_args()
+
+    methods = encoders()
+    header = f"{'items':>5} {'method':<9} {'bytes':>8} {'ratio':>6} {'cpu':>8}" + ''.join(
+        f" {f'@{m:g}mbps':>10}" for m in args.mbps)
+    print(f'COMPRESSION_MIN_BYTES={compression.MIN_BYTES} gzip level={compression.GZIP_LEVEL}'
+          f' brotli={"yes" if compression.brotli else "no"}')
+    print(header)
+    for count in args.items:
+        body = build_body(count)
+        raw = len(body.encode('utf-8'))
+        for name, encode in methods.items():
+            size, cpu_ms = measure(body, encode, args.number)
+            totals = ''.join(f' {cpu_ms + size * 8 / (mbps * 1000):>10.3f}' for mbps in args.mbps)
+            print(f'{count:>5} {name:<9} {size:>8} {size / raw:>6.2f} {cpu_ms:>8.3f}{totals}')
+
+if __name__ == '__main__':
+    main()
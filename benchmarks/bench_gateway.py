@@ -0,0 +1,107 @@
+"""
+DynamoDBゲートウェイ（botocoreクライアント）と boto3.resource の比較
+
+- init:   新しいサブプロセスで初期化コード（import + クライアント/テーブル生成）の所要時間
+- decode: 1ページ分のQuery結果（DynamoDB形式）をdictに変換する時間
+
+AWSへの通信は行わない（クライアント生成とデシリアライズのみ）。
+
+使い方:
+    python benchmarks/bench_gateway.py --runs 10 --page-size 100
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYER_DIR = os.path.join(ROOT, 'layers', 'common_layer', 'python')
+sys.path.insert(0, LAYER_DIR)
+
+os.environ.setdefault('TABLE_NAME', 'bench-table')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+
+INIT_SNIPPETS = {
+    'resource': (
+        "import boto3\n"
+        "from boto3.dynamodb.conditions import Key\n"
+        "table = boto3.resource('dynamodb').Table('bench-table')\n"
+    ),
+    'gateway': (
+        "from common import gateway\n"
+    ),
+}
+
+def measure_init_ms(snippet, runs):
+    """新しいサブプロセスで初期化コードを実行し、所要時間（ms）を計測"""
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"{snippet}"
+        "print((time.perf_counter() - start) * 1000)\n"
+    )
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([LAYER_DIR, env.get('PYTHONPATH', '')])
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+def build_page(page_size):
+    """Query結果1ページ分のDynamoDB形式アイテムを生成"""
+    page = []
+    for i in range(page_size):
+        page.append({
+            'PK': {'S': 'USER#bench-user'},
+            'SK': {'S': f'TODO#2025-01-01T00:00:{i % 60:02d}.000000Z#0194a1b2-c3d4-7e5f-8a9b-{i:012d}'},
+            'GSI1PK': {'S': 'USER#bench-user'},
+            'GSI1SK': {'S': 'DUE#2025-02-01T00:00:00.000Z#0'},
+            'GSI2PK': {'S': 'USER#bench-user#STATUS#PENDING'},
+            'taskId': {'S': f'0194a1b2-c3d4-7e5f-8a9b-{i:012d}'},
+            'title': {'S': f'買い物リスト {i}'},
+            'description': {'S': '牛乳、卵、パンを買う。帰りにクリーニングを受け取る。'},
+            'dueDate': {'S': '2025-02-01T00:00:00Z'},
+            'priority': {'S': 'HIGH'},
+            'status': {'S': 'PENDING'},
+            'createdAt': {'S': '2025-01-01T00:00:00.000000Z'},
+            'updatedAt': {'S': '2025-01-01T00:00:00.000000Z'},
+        })
+    return page
+
+def main():
+    parser = argparse.ArgumentParser(description='gateway vs boto3.resource benchmark')
+    parser.add_argument('--runs', type=int, default=10, help='初期化の計測回数')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--decode-repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print('init (median ms):')
+    for name, snippet in INIT_SNIPPETS.items():
+        print(f"  {name:<9} {measure_init_ms(snippet, args.runs):8.1f}")
+
+    from boto3.dynamodb.types import TypeDeserializer
+    from common.gateway import deserialize_item
+
+    page = build_page(args.page_size)
+    deserializer = TypeDeserializer()
+
+    def decode_resource():
+        return [{k: deserializer.deserialize(v) for k, v in item.items()} for item in page]
+
+    def decode_gateway():
+        return [deserialize_item(item) for item in page]
+
+    assert decode_resource() == decode_gateway()
+
+    print(f'decode {args.page_size} items (median ms per page):')
+    for name, func in [('resource', decode_resource), ('gateway', decode_gateway)]:
+        samples = timeit.repeat(func, number=1, repeat=args.decode_repeat)
+        print(f"  {name:<9} {statistics.median(samples) * 1000:8.3f}")
+
+if __name__ == '__main__':
+    main()
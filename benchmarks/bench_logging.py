@@ -0,0 +1,97 @@
+"""
+1回の呼び出しあたりのログ出力のコスト
+
+get_todos 1回分のログ出力を以下の方式で比較し、所要時間（µs）と出力量（バイト。
+CloudWatch Logsの取り込み量に比例）を出力する。DynamoDBへのアクセスは含まない。
+  - print:        従来の print(f"Event: {json.dumps(event)}") ほか5行
+  - logger INFO:  common.logger（DEBUGは書式化せずに捨て、サマリ1行のみ）
+  - logger 1%:    INFO + 1% のリクエストでDEBUGペイロードを出力
+  - logger DEBUG: すべてのリクエストでDEBUGペイロードを出力
+
+使い方:
+    python benchmarks/bench_logging.py --invocations 20000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+sys.path.insert(0, harness.LAYER_DIR)
+from common import logger  # noqa: E402
+
+class CountingSink:
+    """書き込まれたバイト数だけを数える標準出力の代わり"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, text):
+        self.bytes += len(text.encode('utf-8'))
+        return len(text)
+
+    def flush(self):
+        pass
+
+def legacy_invocation(event, items):
+    print(f"Event: {json.dumps(event)}")
+    print(f"Params - status: {None}, limit: {20}, sortBy: {'dueDate'}")
+    print(f"Query: pattern={'GSI1'}, limit={20}, forward={True}")
+    print(f"Retrieved {len(items)} items")
+    print(f"Returning {len(items)} items")
+    return {'statusCode': 200}
+
+@logger.log_request
+def structured_invocation(event, items):
+    logger.debug('Event', payload=event)
+    logger.debug('Params status=%s limit=%s sortBy=%s', None, 20, 'dueDate')
+    logger.append_keys(user=harness.BENCH_USER_ID)
+    logger.debug('Query pattern=%s limit=%s forward=%s', 'GSI1', 20, True)
+    logger.append_keys(pattern='GSI1', itemCount=len(items), hasNextPage=False)
+    return {'statusCode': 200}
+
+def measure(func, event, items, invocations):
+    sink = CountingSink()
+    with redirect_stdout(sink):
+        started = time.perf_counter()
+        for _ in range(invocations):
+            func(event, items)
+        elapsed = time.perf_counter() - started
+    return elapsed / invocations * 1e6, sink.bytes / invocations
+
+def main():
+    parser = argparse.ArgumentParser(description='per-invocation logging overhead')
+    parser.add_argument('--invocations', type=int, default=20000)
+    args = parser.parse_args()
+
+    event = harness.build_event('GET', '/todos', query={'limit': '20'})
+    # 実際のリクエストと同程度のヘッダー（Cognitoのトークンを含む）
+    event['headers'].update({
+        'Authorization': 'eyJraWQiOiJrZXkiLCJhbGciOiJSUzI1NiJ9.' + 'eyJzdWIiOiJ0ZXN0In0' * 40 + '.' + 's' * 342,
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+        'Accept': 'application/json, text/plain, */*',
+        'Origin': 'https://todo.example.com',
+    })
+    items = [object()] * 20
+
+    cases = [
+        ('print', legacy_invocation, None, None),
+        ('logger INFO', structured_invocation, logger.LEVELS['INFO'], 0.0),
+        ('logger 1%', structured_invocation, logger.LEVELS['INFO'], 0.01),
+        ('logger DEBUG', structured_invocation, logger.LEVELS['DEBUG'], 0.0),
+    ]
+
+    print(f"{'mode':<14} {'us/call':>9} {'bytes/call':>11}")
+    for name, func, level, sample_rate in cases:
+        if level is not None:
+            logger.LOG_LEVEL = level
+            logger.DEBUG_SAMPLE_RATE = sample_rate
+        us, size = measure(func, event, items, args.invocations)
+        print(f"{name:<14} {us:>9.2f} {size:>11.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+GSI1 の射影と ProjectionExpression による消費キャパシティ・転送量の比較
+
+インメモリのエミュレータ（common/emulator.py）に合成データのタスクを書き込み、
+GSI1 の射影ごとに以下を出力する。AWSへの通信は行わない。
+  - create / update:  タスク1件あたりのGSI1の消費WCU（作成・ステータス変更）
+  - storage:          GSI1のアイテムの合計サイズ
+  - list RCU:         GSI1を100件ずつQueryして全件読むときの消費RCU（結果整合性）
+
+射影:
+  - ALL:                 テーブルのすべての属性（template.yaml の現在の定義）
+  - INCLUDE:             参考。一覧の項目の属性のみ（GSI5 と同じ）
+  - INCLUDE -description: 参考。一覧から説明を除いた場合
+
+続けて ALL の GSI1 を ProjectionExpression ごとに読み、DynamoDBから返る
+アイテムのサイズを出力する（RCUは読み込んだアイテムのサイズで決まるため変わらない）。
+
+使い方:
+    python benchmarks/bench_projection.py --tasks 1000
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYER_DIR = os.path.join(ROOT, 'layers', 'common_layer', 'python')
+sys.path.insert(0, LAYER_DIR)
+
+os.environ.setdefault('TABLE_NAME', 'bench-table')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+os.environ['DYNAMODB_EMULATOR'] = '1'
+
+from common import emulator, gateway  # noqa: E402
+from common.dynamodb_helper import (  # noqa: E402
+    new_task_id, build_pk, build_sk, build_gsi1_sk, build_status_pk, task_attributes, parse_fields
+)
+
+TABLE = 'bench-projection'
+USER_ID = 'bench-user'
+TITLES = ['買い物', '週次レポートの作成', '歯医者の予約', '請求書の支払い', 'プレゼン資料のレビュー']
+# 説明なし・短い説明・長い説明（メモの貼り付けなど）
+DESCRIPTIONS = [
+    '',
+    '牛乳、卵、パンを買う。帰りにクリーニングも受け取る。',
+    '先週の売上と問い合わせ件数をまとめて、月曜の朝会までに共有する。' * 8,
+]
+
+LIST_ATTRIBUTES = list(task_attributes())
+
+def definition(projection):
+    """GSI1の射影だけを変えたテーブル定義"""
+    result = copy.deepcopy(emulator.TABLE_DEFINITION)
+    for index in result['GlobalSecondaryIndexes']:
+        if index['IndexName'] == 'GSI1':
+            index['Projection'] = projection
+    return result
+
+PROJECTIONS = {
+    'ALL': {'ProjectionType': 'ALL'},
+    'INCLUDE': {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': LIST_ATTRIBUTES},
+    'INCLUDE -description': {
+        'ProjectionType': 'INCLUDE', 'NonKeyAttributes': [a for a in LIST_ATTRIBUTES if a != 'description']
+    },
+}
+
+def build_tasks(count, seed=0):
+    """create_todo と同じ形式のタスク"""
+    rng = random.Random(seed)
+    tasks = []
+    for i in range(count):
+        task_id, created_at = new_task_id()
+        due = f'2030-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z'
+        priority = rng.choice(['HIGH', 'MEDIUM', 'LOW'])
+        tasks.append({
+            'PK': build_pk(USER_ID),
+            'SK': build_sk(task_id, created_at),
+            'GSI1PK': build_pk(USER_ID),
+            'GSI1SK': build_gsi1_sk(due, priority),
+            'GSI2PK': build_status_pk(USER_ID, 'PENDING'),
+            'taskId': task_id,
+            'title': f'{rng.choice(TITLES)} {i}',
+            'description': rng.choice(DESCRIPTIONS),
+            'dueDate': due,
+            'priority': priority,
+            'status': 'PENDING',
+            'createdAt': created_at,
+            'updatedAt': created_at,
+            'version': 1,
+        })
+    return tasks
+
+def gsi1_units(response):
+    return response['ConsumedCapacity'].get('GlobalSecondaryIndexes', {}).get('GSI1', {}).get('CapacityUnits', 0)
+
+def write_tasks(client, tasks):
+    """作成とステータス変更のGSI1の消費WCUの合計"""
+    create = update = 0
+    for task in tasks:
+        response = client.put_item(TableName=TABLE, Item=gateway.serialize_item(task),
+                                   ReturnConsumedCapacity='INDEXES')
+        create += gsi1_units(response)
+    for task in tasks:
+        response = client.update_item(
+            TableName=TABLE,
+            Key=gateway.serialize_item({'PK': task['PK'], 'SK': task['SK']}),
+            UpdateExpression='SET #status = :status, GSI2PK = :gsi2pk, updatedAt = :now ADD version :one',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues=gateway.serialize_item({
+                ':status': 'COMPLETED', ':gsi2pk': build_status_pk(USER_ID, 'COMPLETED'),
+                ':now': '2031-01-01T00:00:00Z', ':one': 1
+            }),
+            ReturnConsumedCapacity='INDEXES'
+        )
+        update += gsi1_units(response)
+    return create, update
+
+def read_all(client, attributes=None):
+    """GSI1を100件ずつ全件Query（消費RCU, 返ったアイテムの合計サイズ）"""
+    units = returned = 0
+    start_key = None
+    while True:
+        params = {
+            'TableName': TABLE, 'IndexName': 'GSI1', 'KeyConditionExpression': 'GSI1PK = :pk',
+            'ExpressionAttributeValues': {':pk': {'S': build_pk(USER_ID)}}, 'Limit': 100,
+            'ReturnConsumedCapacity': 'INDEXES'
+        }
+        if attributes:
+            params['ProjectionExpression'] = ', '.join(f'#{name}' for name in attributes)
+            params['ExpressionAttributeNames'] = {f'#{name}': name for name in attributes}
+        if start_key:
+            params['ExclusiveStartKey'] = start_key
+        response = client.query(**params)
+        units += response['ConsumedCapacity']['CapacityUnits']
+        returned += sum(emulator.item_size(item) for item in response['Items'])
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key:
+            return units, returned
+
+def gsi1_storage(client):
+    table = client.store.tables[TABLE]
+    index = table.indexes['GSI1']
+    return sum(emulator.item_size(index.project(item)) for item in table.items.values() if index.entry(item))
+
+def main():
+    parser = argparse.ArgumentParser(description='GSI1 projection capacity comparison')
+    parser.add_argument('--tasks', type=int, default=1000)
+    args = parser.parse_args()
+
+    tasks = build_tasks(args.tasks)
+    print(f'tasks={args.tasks}')
+    print(f"{'GSI1 projection':<22} {'create WCU':>10} {'update WCU':>10} {'storage KB':>10} {'list RCU':>9}")
+    clients = {}
+    baseline = None
+    for name, projection in PROJECTIONS.items():
+        client = emulator.EmulatedClient(emulator.DynamoDBStore(), definition(projection))
+        create, update = write_tasks(client, tasks)
+        storage = gsi1_storage(client)
+        units, _ = read_all(client)
+        baseline = baseline or (create, update, storage, units)
+        clients[name] = client
+        print(f'{name:<22} {create / args.tasks:>10.2f} {update / args.tasks:>10.2f} {storage / 1024:>10.1f}'
+              f' {units:>9.1f}'
+              f'   ({create / baseline[0]:.0%} / {update / baseline[1]:.0%} / {storage / baseline[2]:.0%}'
+              f' / {units / baseline[3]:.0%})')
+
+    print()
+    print(f"{'ProjectionExpression (ALL)':<34} {'list RCU':>9} {'returned KB':>11}")
+    for label, attributes in (('(none)', None),
+                              ('list fields', task_attributes()),
+                              ('?fields=title,status', task_attributes(parse_fields('title,status')))):
+        units, returned = read_all(clients['ALL'], attributes)
+        print(f'{label:<34} {units:>9.1f} {returned / 1024:>11.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+全文検索（GET /todos/search）のレイテンシと消費RCU
+
+インメモリのエミュレータ（common/emulator.py）に合成データのタスクと検索インデックスの
+ポスティングを書き込み、検索語ごとに search_todos のハンドラを呼び出して以下を出力する。
+AWSへの通信は行わない（レイテンシはエミュレータ上の処理時間で、ネットワークの往復を含まない）。
+  - ms p50 / p95: ハンドラの処理時間
+  - RCU:          1リクエストの消費RCU（ポスティングのQuery + BatchGetItem）
+  - lookups:      並列に実行したポスティングのQueryの数
+  - hits:         スコアを付けた候補の数（SEARCH_MAX_RESULTS まで。1ページ目に返すのは limit 件）
+  - partial:      ポスティングの読み込みか候補の数の上限に達したか
+
+比較として、パーティションのタスクをすべてQueryしてアプリケーション側で照合する場合
+（インデックスなし）の時間と消費RCUを出力する。
+
+使い方:
+    python benchmarks/bench_search.py --tasks 50000
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'layers', 'common_layer', 'python'))
+sys.path.insert(0, os.path.join(ROOT, 'functions', 'search_todos'))
+
+os.environ.setdefault('TABLE_NAME', 'bench-table')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+os.environ.setdefault('PAGE_TOKEN_SECRET', 'bench-secret')
+os.environ['DYNAMODB_EMULATOR'] = '1'
+os.environ['CAPACITY_DEBUG_HEADER'] = '1'
+
+import harness  # noqa: E402
+from common import gateway, search  # noqa: E402
+from common.dynamodb_helper import build_pk  # noqa: E402
+from app import lambda_handler  # noqa: E402
+
+TITLES = ['買い物', '週次レポートの作成', '歯医者の予約', '請求書の支払い', 'プレゼン資料のレビュー',
+          '会議の議事録', 'Deploy the API', 'Fix login bug', 'Review pull request', '引っ越しの手続き']
+WORDS = ['牛乳', '資料', '見積もり', '顧客', '来週', 'レビュー', 'deploy', 'release', 'invoice', 'meeting',
+         '予算', '確認', '共有', '修正', 'テスト', 'staging', 'database', '契約書', '送付', '電話']
+# 検索語: (表示名, q)
+QUERIES = [
+    ('rare term', '4242'),
+    ('10% of tasks', '引っ越し'),
+    ('25% of tasks', '資料'),
+    ('2 terms AND', 'レビュー 顧客'),
+    ('2 char bigram', '会議'),
+    ('latin 3 chars', 'dep'),
+    ('no match', '存在しない語'),
+]
+
+def build_task(index, rng):
+    _, item = harness.build_task_item(harness.BENCH_USER_ID, index)
+    item['title'] = f'{rng.choice(TITLES)} {index}'
+    item['description'] = '、'.join(rng.sample(WORDS, rng.randint(0, 6)))
+    return item
+
+def seed(count, seed_value=0):
+    """タスクとポスティングを BatchWriteItem で書き込む"""
+    rng = random.Random(seed_value)
+    pending = []
+    for i in range(count):
+        task = build_task(i, rng)
+        pending.append(task)
+        pending.extend(search.index_changes(harness.BENCH_USER_ID, None, task)[1])
+        while len(pending) >= gateway.BATCH_WRITE_SIZE:
+            gateway.batch_write(put_items=pending[:gateway.BATCH_WRITE_SIZE])
+            del pending[:gateway.BATCH_WRITE_SIZE]
+    if pending:
+        gateway.batch_write(put_items=pending)
+
+def run_query(q, limit):
+    event = harness.build_event('GET', '/todos/search', query={'q': q, 'limit': str(limit)})
+    with redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        response = lambda_handler(event, None)
+        elapsed = time.perf_counter() - started
+    if response['statusCode'] != 200:
+        raise RuntimeError(response['body'])
+    usage = json.loads(response['headers']['X-Consumed-Capacity'])
+    return elapsed, usage['read']
+
+def scan_baseline(query_terms):
+    """インデックスなし: パーティションのタスクをすべて読み、アプリケーション側で照合"""
+    started = time.perf_counter()
+    units = matched = 0
+    start_key = None
+    while True:
+        response = gateway.client.query(**dict(
+            gateway.QUERY_PATTERNS['TABLE'],
+            TableName=gateway.TABLE_NAME,
+            ExpressionAttributeValues=dict(gateway.QUERY_PATTERNS['TABLE']['ExpressionAttributeValues'],
+                                           **{':pk': {'S': build_pk(harness.BENCH_USER_ID)}}),
+            ReturnConsumedCapacity='TOTAL',
+            **({'ExclusiveStartKey': start_key} if start_key else {})
+        ))
+        units += response['ConsumedCapacity']['CapacityUnits']
+        for raw in response['Items']:
+            matched += search.matches(gateway.deserialize_item(raw), query_terms)
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key:
+            return time.perf_counter() - started, units, matched
+
+def main():
+    parser = argparse.ArgumentParser(description='full-text search latency and RCU')
+    parser.add_argument('--tasks', type=int, default=50000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed(args.tasks)
+    print(f'tasks={args.tasks} seeded in {time.perf_counter() - started:.1f}s limit={args.limit}')
+    print(f"{'query':<16} {'ms p50':>8} {'ms p95':>8} {'RCU':>7} {'lookups':>8} {'hits':>7}"
+          f" {'partial':>7} {'scan ms':>8} {'scan RCU':>9}  q")
+    for label, q in QUERIES:
+        query_terms = search.parse_query(q)
+        ranked, partial = search.search(harness.BENCH_USER_ID, query_terms)
+        hits = len(ranked)
+        lookups = len({prefix for term in query_terms for prefix in search.lookups(term)})
+        samples = [run_query(q, args.limit) for _ in range(args.repeat)]
+        times = sorted(elapsed for elapsed, _ in samples)
+        scan_elapsed, scan_units, _ = scan_baseline(query_terms)
+        print(f'{label:<16} {harness.percentile(times, 0.5) * 1000:>8.1f}'
+              f' {harness.percentile(times, 0.95) * 1000:>8.1f} {samples[0][1]:>7.1f} {lookups:>8} {hits:>7}'
+              f' {str(partial):>7} {scan_elapsed * 1000:>8.0f} {scan_units:>9.1f}  {q}')
+
+if __name__ == '__main__':
+    main()
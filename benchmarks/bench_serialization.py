@@ -0,0 +1,122 @@
+"""
+一覧レスポンスのシリアライズのコスト
+
+GET /todos と同じく、DynamoDBから読んだ形式のアイテム（キー・GSIの属性を含み、
+version は Decimal）をレスポンスのボディにするまでの時間を件数ごとに比較する。
+  - legacy:          アイテムごとにdictを組み立て、json.dumps(ensure_ascii=False)
+  - projection+json: task_response.many + 標準のjson（serialization.dumps_json）
+  - projection+orjson: task_response.many + orjson（orjson パッケージがある場合）
+  - project only:    task_response.many のみ（変換の内訳）
+
+出力は1回あたりのms・1件あたりのµs・ボディのバイト数。AWSへの通信は行わない。
+
+使い方:
+    python benchmarks/bench_serialization.py --items 1000 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYER_DIR = os.path.join(ROOT, 'layers', 'common_layer', 'python')
+sys.path.insert(0, LAYER_DIR)
+
+os.environ.setdefault('TABLE_NAME', 'bench-table')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+
+from common import serialization  # noqa: E402
+from common.dynamodb_helper import (  # noqa: E402
+    new_task_id, build_pk, build_sk, build_gsi1_sk, build_status_pk, build_etag, task_response
+)
+
+TITLES = ['買い物', '週次レポートの作成', '歯医者の予約', '請求書の支払い', 'プレゼン資料のレビュー']
+DESCRIPTIONS = ['牛乳、卵、パンを買う。', '先週の売上と問い合わせ件数をまとめて共有する。', '']
+
+def build_items(count, seed=0):
+    """DynamoDBから読んだ形式のタスク（gateway.query の戻り値と同じ型）"""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        task_id, created_at = new_task_id()
+        due = f'2030-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z'
+        priority = rng.choice(['HIGH', 'MEDIUM', 'LOW'])
+        status = rng.choice(['PENDING', 'COMPLETED'])
+        items.append({
+            'PK': build_pk('bench-user'),
+            'SK': build_sk(task_id, created_at),
+            'GSI1PK': build_pk('bench-user'),
+            'GSI1SK': build_gsi1_sk(due, priority),
+            'GSI2PK': build_status_pk('bench-user', status),
+            'taskId': task_id,
+            'title': f'{rng.choice(TITLES)} {i}',
+            'description': rng.choice(DESCRIPTIONS),
+            'dueDate': due,
+            'priority': priority,
+            'status': status,
+            'createdAt': created_at,
+            'updatedAt': created_at,
+            'version': Decimal(rng.randint(1, 5)),
+        })
+    return items
+
+def legacy(items):
+    """変更前の get_todos の整形とシリアライズ"""
+    clean_items = []
+    for item in items:
+        clean_items.append({
+            'taskId': item['taskId'],
+            'title': item['title'],
+            'description': item.get('description', ''),
+            'dueDate': item['dueDate'],
+            'priority': item['priority'],
+            'status': item['status'],
+            'createdAt': item['createdAt'],
+            'updatedAt': item['updatedAt'],
+            'etag': build_etag(item)
+        })
+    return json.dumps({'items': clean_items, 'count': len(clean_items)}, ensure_ascii=False)
+
+def with_backend(dumps):
+    def run(items):
+        clean_items = task_response.many(items)
+        return dumps({'items': clean_items, 'count': len(clean_items)})
+    return run
+
+def methods():
+    """計測する方式: 名前 -> アイテムのリストからボディを作る関数"""
+    result = {
+        'legacy': legacy,
+        'projection+json': with_backend(serialization.dumps_json),
+    }
+    if serialization.orjson is not None:
+        result['projection+orjson'] = with_backend(serialization.dumps_orjson)
+    result['project only'] = task_response.many
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='response serialization cost')
+    parser.add_argument('--items', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5, help='計測の繰り返し回数（最小値を出力）')
+    args = parser.parse_args()
+
+    print(f'backend={serialization.BACKEND} orjson={"yes" if serialization.orjson else "no"}')
+    print(f"{'items':>6} {'method':<18} {'ms':>9} {'us/item':>8} {'bytes':>9} {'speedup':>8}")
+    for count in args.items:
+        items = build_items(count)
+        number = max(1, 20000 // count)
+        baseline = None
+        for name, run in methods().items():
+            elapsed = min(timeit.repeat(lambda: run(items), number=number, repeat=args.repeat)) / number
+            output = run(items)
+            baseline = baseline or elapsed
+            # project only は内訳のためボディのバイト数・比較は出さない
+            size, speedup = ('-', '-') if not isinstance(output, str) else (
+                len(output.encode('utf-8')), f'{baseline / elapsed:.2f}x')
+            print(f'{count:>6} {name:<18} {elapsed * 1000:>9.2f} {elapsed * 1e6 / count:>8.2f} {size:>9} {speedup:>8}')
+
+if __name__ == '__main__':
+    main()
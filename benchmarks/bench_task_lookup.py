@@ -0,0 +1,109 @@
+"""
+taskIdによるタスク取得のレイテンシをユーザーのタスク数ごとに計測
+
+タスク数 10〜100,000 のユーザーを作成し、以下を比較する:
+  - legacy: パーティション全体をQueryしてtaskIdを探索（従来のfind_task）
+  - keyed:  resolve_task_key() + GetItem 1回（現在のfind_task）
+
+DynamoDB Localに対して実行する場合は AWS_ENDPOINT_URL_DYNAMODB を設定する。
+
+使い方:
+    TABLE_NAME=serverless-todo-dev-todos python benchmarks/bench_task_lookup.py \
+        --sizes 10,100,1000,10000,100000 --lookups 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'layers', 'common_layer', 'python'))
+
+from common import gateway  # noqa: E402
+from common.dynamodb_helper import (  # noqa: E402
+    new_task_id, build_pk, build_sk, build_gsi1_sk, build_status_pk, resolve_task_key
+)
+
+def seed_user(user_id, size):
+    """ベンチマーク用のタスクを作成し、taskIdの一覧を返す"""
+    task_ids = []
+    requests = []
+    for i in range(size):
+        task_id, created_at = new_task_id()
+        requests.append({'PutRequest': {'Item': gateway.serialize_item({
+            'PK': build_pk(user_id),
+            'SK': build_sk(task_id, created_at),
+            'GSI1PK': build_pk(user_id),
+            'GSI1SK': build_gsi1_sk('2030-01-01T00:00:00Z', 'MEDIUM'),
+            'GSI2PK': build_status_pk(user_id, 'PENDING'),
+            'taskId': task_id,
+            'title': f'bench task {i}',
+            'description': '',
+            'dueDate': '2030-01-01T00:00:00Z',
+            'priority': 'MEDIUM',
+            'status': 'PENDING',
+            'createdAt': created_at,
+            'updatedAt': created_at
+        })}})
+        task_ids.append(task_id)
+
+    # 25件ずつBatchWriteItem（未処理分は再送）
+    for i in range(0, len(requests), 25):
+        pending = {gateway.TABLE_NAME: requests[i:i + 25]}
+        while pending:
+            response = gateway.client.batch_write_item(RequestItems=pending)
+            pending = response.get('UnprocessedItems') or None
+            if pending:
+                time.sleep(0.1)
+    return task_ids
+
+def legacy_find(user_id, task_id):
+    """従来方式: パーティション全体をページングしながら探索"""
+    start_key = None
+    while True:
+        items, start_key = gateway.query('TABLE', build_pk(user_id), 1000, start_key=start_key)
+        for item in items:
+            if item.get('taskId') == task_id:
+                return item
+        if not start_key:
+            return None
+
+def keyed_find(user_id, task_id):
+    """現在の方式: キーを解決してGetItem 1回"""
+    key = resolve_task_key(user_id, task_id)
+    return gateway.get_item(key) if key else None
+
+def measure(func, user_id, task_ids, lookups):
+    samples = []
+    for task_id in random.sample(task_ids, min(lookups, len(task_ids))):
+        start = time.perf_counter()
+        item = func(user_id, task_id)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert item is not None, f'task not found: {task_id}'
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description='taskId lookup benchmark')
+    parser.add_argument('--sizes', default='10,100,1000,10000,100000')
+    parser.add_argument('--lookups', type=int, default=50)
+    parser.add_argument('--skip-legacy', action='store_true', help='従来方式の計測を省略（大規模時に時間がかかるため）')
+    args = parser.parse_args()
+
+    print(f"{'tasks':>8} {'keyed p50':>10} {'keyed p95':>10} {'legacy p50':>11} {'legacy p95':>11}  (ms)")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        user_id = f'bench-lookup-{size}'
+        task_ids = seed_user(user_id, size)
+
+        keyed = measure(keyed_find, user_id, task_ids, args.lookups)
+        if args.skip_legacy:
+            legacy = (float('nan'), float('nan'))
+        else:
+            legacy = measure(legacy_find, user_id, task_ids, args.lookups)
+
+        print(f"{size:>8} {keyed[0]:>10.2f} {keyed[1]:>10.2f} {legacy[0]:>11.2f} {legacy[1]:>11.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+bench_cold_start.py から新しいプロセスとして起動される計測用スクリプト
+
+ハンドラモジュールのimport（初期化フェーズ）より前に余計なモジュールを
+読み込まないよう、計測が終わるまで標準ライブラリ以外はimportしない。
+
+引数: <ハンドラのモジュール名> <計測仕様のJSON>
+"""
+import sys
+import time
+
+module_name = sys.argv[1]
+
+start = time.perf_counter()
+__import__(module_name)
+init_ms = (time.perf_counter() - start) * 1000
+
+import io  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+from contextlib import redirect_stdout  # noqa: E402
+
+spec = json.loads(sys.argv[2])
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+handler = sys.modules[module_name].lambda_handler
+route = tuple(spec['route'])
+task_ids = spec['taskIds']
+if spec.get('seedCount') and route in harness.SEEDED_ROUTES:
+    # エミュレータ使用時はこのプロセス内のデータとして作成
+    task_ids = harness.seed_tasks(spec['seedCount'])
+
+def invoke(index):
+    event = harness.build_route_event(route, task_ids[index] if task_ids else None, index)
+    # ハンドラのログ出力は計測結果に含めない
+    with redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        response = handler(event, None)
+        elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, response['statusCode']
+
+first_ms, first_status = invoke(0)
+warm = [invoke(i) for i in range(1, spec['warm'] + 1)]
+
+with open(spec['resultPath'], 'w', encoding='utf-8') as f:
+    json.dump({
+        'initMs': init_ms,
+        'firstInvocationMs': first_ms,
+        'warmMs': [elapsed for elapsed, _ in warm],
+        'statusCodes': [first_status] + [status for _, status in warm],
+    }, f)
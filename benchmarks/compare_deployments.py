@@ -0,0 +1,222 @@
+"""
+split（ルートごとに1関数）と mono（TodoRouterFunction）のデプロイ形態を比較
+
+同じトラフィックを両方の形態に流し、Lambdaのコンテナプールを
+シミュレーションしてコールドスタートの発生頻度とレイテンシ（p50/p95/p99）を出力する。
+
+- トラフィック: API GatewayイベントのNDJSON（requestContext.requestTimeEpoch と
+  httpMethod/resource を使用）。--traffic を省略した場合は合成した
+  ユーザーセッション（一覧→作成→更新→削除）を使う。
+- 初期化時間: 各形態のハンドラを新しいサブプロセスでimportして実測する。
+  boto3がない環境などでは --init-ms で指定する。
+
+使い方:
+    python benchmarks/compare_deployments.py --users 200 --duration 3600
+    python benchmarks/compare_deployments.py --traffic captured.ndjson --init-ms split=450,mono=520
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNCTIONS_DIR = os.path.join(ROOT, 'functions')
+LAYER_DIR = os.path.join(ROOT, 'layers', 'common_layer', 'python')
+
+# ルートごとのウォーム時の処理時間（ms）の既定値
+DEFAULT_WARM_MS = {
+    ('GET', '/todos'): 45.0,
+    ('POST', '/todos'): 30.0,
+    ('PUT', '/todos/{taskId}'): 35.0,
+    ('DELETE', '/todos/{taskId}'): 25.0,
+}
+
+# 各形態の初期化対象モジュール
+SPLIT_MODULES = {
+    ('POST', '/todos'): 'create_todo.app',
+    ('GET', '/todos'): 'get_todos.app',
+    ('PUT', '/todos/{taskId}'): 'update_todo.app',
+    ('DELETE', '/todos/{taskId}'): 'delete_todo.app',
+}
+MONO_MODULE = 'router.app'
+
+def measure_import_ms(module, repeat=3):
+    """新しいサブプロセスでモジュールをimportし、所要時間（ms）の中央値を返す"""
+    code = (
+        'import time; start = time.perf_counter(); '
+        f'import {module}; '
+        'print((time.perf_counter() - start) * 1000)'
+    )
+    env = dict(os.environ)
+    env.setdefault('TABLE_NAME', 'bench-table')
+    env.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+    env['PYTHONPATH'] = os.pathsep.join([FUNCTIONS_DIR, LAYER_DIR, env.get('PYTHONPATH', '')])
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True
+        )
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    samples.sort()
+    return samples[len(samples) // 2]
+
+def load_traffic(path):
+    """NDJSONのAPI Gatewayイベントを (到着時刻秒, ルート) のリストに変換"""
+    requests = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            epoch_ms = event.get('requestContext', {}).get('requestTimeEpoch')
+            if epoch_ms is None:
+                continue
+            requests.append((epoch_ms / 1000.0, (event.get('httpMethod'), event.get('resource'))))
+
+    requests.sort(key=lambda r: r[0])
+    if requests:
+        origin = requests[0][0]
+        requests = [(t - origin, route) for t, route in requests]
+    return requests
+
+def synthesize_traffic(users, duration, sessions_per_user, seed):
+    """ユーザーセッション（一覧→作成→一覧→更新→削除）を合成"""
+    rng = random.Random(seed)
+    session_routes = [
+        ('GET', '/todos'),
+        ('POST', '/todos'),
+        ('GET', '/todos'),
+        ('PUT', '/todos/{taskId}'),
+        ('GET', '/todos'),
+        ('DELETE', '/todos/{taskId}'),
+    ]
+    requests = []
+    for _ in range(users * sessions_per_user):
+        t = rng.uniform(0, duration)
+        for route in session_routes:
+            if rng.random() < 0.8:
+                requests.append((t, route))
+            # 操作間の思考時間
+            t += rng.expovariate(1 / 8.0)
+    requests.sort(key=lambda r: r[0])
+    return requests
+
+def simulate(requests, function_of, init_ms, warm_ms, idle_timeout):
+    """
+    コンテナプールをシミュレーション
+
+    Args:
+        function_of: ルート -> 関数名
+        init_ms: 関数名 -> 初期化時間（ms）
+    """
+    # 関数名 -> 空きコンテナのヒープ [(最終利用時刻の負値, 空き時刻)]
+    idle = {}
+    # 実行中コンテナ [(空き時刻, 関数名)]
+    busy = []
+    latencies = []
+    cold_starts = 0
+
+    for t, route in requests:
+        # tまでに処理を終えたコンテナを空きに戻す
+        while busy and busy[0][0] <= t:
+            free_at, name = heapq.heappop(busy)
+            heapq.heappush(idle.setdefault(name, []), (-free_at, free_at))
+
+        name = function_of(route)
+        pool = idle.setdefault(name, [])
+        latency = warm_ms.get(route, 40.0)
+
+        # 最も最近使われたコンテナを再利用（idle_timeout超過は破棄済みとみなす）
+        container = None
+        while pool:
+            _, free_at = heapq.heappop(pool)
+            if t - free_at <= idle_timeout:
+                container = free_at
+                break
+
+        if container is None:
+            cold_starts += 1
+            latency += init_ms[name]
+
+        latencies.append(latency)
+        heapq.heappush(busy, (t + latency / 1000.0, name))
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0.0
+
+    return {
+        'requests': len(requests),
+        'coldStarts': cold_starts,
+        'coldStartRate': cold_starts / len(requests) if requests else 0.0,
+        'p50Ms': pct(0.50),
+        'p95Ms': pct(0.95),
+        'p99Ms': pct(0.99),
+        'maxMs': latencies[-1] if latencies else 0.0,
+    }
+
+def parse_init_ms(value):
+    result = {}
+    for part in value.split(','):
+        name, ms = part.split('=')
+        result[name.strip()] = float(ms)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='split / mono デプロイ形態の比較')
+    parser.add_argument('--traffic', help='API GatewayイベントのNDJSONファイル')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=3600, help='合成トラフィックの期間（秒）')
+    parser.add_argument('--sessions-per-user', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--idle-timeout', type=float, default=600, help='コンテナが破棄されるまでのアイドル時間（秒）')
+    parser.add_argument('--init-ms', help='初期化時間の指定（例: split=450,mono=520）。省略時は実測')
+    parser.add_argument('--output', help='結果をJSONで書き出すファイル')
+    args = parser.parse_args()
+
+    if args.traffic:
+        requests = load_traffic(args.traffic)
+    else:
+        requests = synthesize_traffic(args.users, args.duration, args.sessions_per_user, args.seed)
+
+    if args.init_ms:
+        given = parse_init_ms(args.init_ms)
+        split_init = {module: given['split'] for module in SPLIT_MODULES.values()}
+        mono_init = {MONO_MODULE: given['mono']}
+    else:
+        split_init = {module: measure_import_ms(module) for module in SPLIT_MODULES.values()}
+        mono_init = {MONO_MODULE: measure_import_ms(MONO_MODULE)}
+
+    # ルート外のリクエストはmonoでは同じ関数、splitではルートごとの関数として扱う
+    results = {
+        'split': simulate(
+            requests,
+            lambda route: SPLIT_MODULES.get(route, 'unknown'),
+            dict(split_init, unknown=max(split_init.values())),
+            DEFAULT_WARM_MS,
+            args.idle_timeout,
+        ),
+        'mono': simulate(requests, lambda route: MONO_MODULE, mono_init, DEFAULT_WARM_MS, args.idle_timeout),
+    }
+    results['split']['initMs'] = split_init
+    results['mono']['initMs'] = mono_init
+
+    print(f"{'shape':<6} {'requests':>9} {'cold':>6} {'cold%':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)")
+    for shape, r in results.items():
+        print(
+            f"{shape:<6} {r['requests']:>9} {r['coldStarts']:>6} {r['coldStartRate'] * 100:>6.2f}% "
+            f"{r['p50Ms']:>8.1f} {r['p95Ms']:>8.1f} {r['p99Ms']:>8.1f} {r['maxMs']:>8.1f}"
+        )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+ベンチマーク共通の定義（ハンドラの場所、テーブル作成、API Gatewayイベント）
+"""
+import io
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNCTIONS_DIR = os.path.join(ROOT, 'functions')
+LAYER_DIR = os.path.join(ROOT, 'layers', 'common_layer', 'python')
+
+BENCH_USER_ID = 'test-user-001'
+
+# 関数名 -> (importパス, モジュール名, ルート)
+FUNCTIONS = {
+    'create_todo': (os.path.join(FUNCTIONS_DIR, 'create_todo'), 'app', ('POST', '/todos')),
+    'get_todos': (os.path.join(FUNCTIONS_DIR, 'get_todos'), 'app', ('GET', '/todos')),
+    'update_todo': (os.path.join(FUNCTIONS_DIR, 'update_todo'), 'app', ('PUT', '/todos/{taskId}')),
+    'delete_todo': (os.path.join(FUNCTIONS_DIR, 'delete_todo'), 'app', ('DELETE', '/todos/{taskId}')),
+    'bulk_update_todos': (os.path.join(FUNCTIONS_DIR, 'bulk_update_todos'), 'app', ('POST', '/todos/bulk-update')),
+    'bulk_delete_todos': (os.path.join(FUNCTIONS_DIR, 'bulk_delete_todos'), 'app', ('POST', '/todos/bulk-delete')),
+    'get_changes': (os.path.join(FUNCTIONS_DIR, 'get_changes'), 'app', ('GET', '/todos/changes')),
+    'get_summary': (os.path.join(FUNCTIONS_DIR, 'get_summary'), 'app', ('GET', '/todos/summary')),
+    'search_todos': (os.path.join(FUNCTIONS_DIR, 'search_todos'), 'app', ('GET', '/todos/search')),
+    'router': (FUNCTIONS_DIR, 'router.app', ('GET', '/todos')),
+}
+
+# 既存のタスクが必要なルート（計測前にタスクを作成する）
+SEEDED_ROUTES = (('PUT', '/todos/{taskId}'), ('DELETE', '/todos/{taskId}'), ('POST', '/todos/bulk-update'))
+
+def ensure_table(client, table_name):
+    """テーブルがなければ作成（DynamoDB Local等のスタンドイン用）"""
+    from common.emulator import TABLE_DEFINITION
+
+    existing = client.list_tables().get('TableNames', [])
+    if table_name in existing:
+        return
+    client.create_table(TableName=table_name, **TABLE_DEFINITION)
+    client.get_waiter('table_exists').wait(TableName=table_name)
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else None
+
+def build_event(method, resource, body=None, path_parameters=None, query=None, user_id=BENCH_USER_ID):
+    """API Gateway（RESTのLambdaプロキシ統合）のイベントを生成"""
+    path = resource
+    for name, value in (path_parameters or {}).items():
+        path = path.replace('{' + name + '}', value)
+
+    return {
+        'resource': resource,
+        'path': path,
+        'httpMethod': method,
+        'headers': {'Content-Type': 'application/json'},
+        'queryStringParameters': query,
+        'pathParameters': path_parameters,
+        'body': json.dumps(body, ensure_ascii=False) if body is not None else None,
+        'isBase64Encoded': False,
+        'requestContext': {
+            'resourcePath': resource,
+            'httpMethod': method,
+            'requestTimeEpoch': int(time.time() * 1000),
+            'authorizer': {'claims': {'sub': user_id}},
+        },
+    }
+
+def build_route_event(route, task_id=None, index=0):
+    """ルートごとの代表的なリクエストを生成"""
+    method, resource = route
+    if route == ('POST', '/todos'):
+        return build_event(method, resource, body={
+            'title': f'ベンチマーク {index}',
+            'description': 'cold start benchmark',
+            'dueDate': '2030-01-01T00:00:00Z',
+            'priority': 'MEDIUM',
+        })
+    if route == ('GET', '/todos'):
+        return build_event(method, resource, query={'limit': '20'})
+    if route == ('PUT', '/todos/{taskId}'):
+        return build_event(method, resource, body={'status': 'COMPLETED'}, path_parameters={'taskId': task_id})
+    if route == ('DELETE', '/todos/{taskId}'):
+        return build_event(method, resource, path_parameters={'taskId': task_id})
+    if route == ('POST', '/todos/bulk-update'):
+        return build_event(method, resource, body={'taskIds': [task_id], 'patch': {'status': 'COMPLETED'}})
+    if route == ('POST', '/todos/bulk-delete'):
+        return build_event(method, resource, body={'scope': 'COMPLETED'})
+    if route == ('GET', '/todos/changes'):
+        return build_event(method, resource, query={'limit': '100'})
+    if route == ('GET', '/todos/summary'):
+        return build_event(method, resource)
+    if route == ('GET', '/todos/search'):
+        return build_event(method, resource, query={'q': 'ベンチマーク'})
+    raise ValueError(f'Unknown route: {route}')
+
+def process_stream(table_name=None):
+    """
+    エミュレータのストリームのレコードをコンシューマ（process_task_changes）に渡す
+
+    DynamoDB StreamsとLambdaのポーリングの代わり。エミュレータ以外（DynamoDB Local等）では何もしない。
+
+    Returns:
+        int: 処理したレコード数
+    """
+    from common import gateway
+    if not hasattr(gateway.client, 'drain_stream'):
+        return 0
+    sys.path.insert(0, FUNCTIONS_DIR)
+    try:
+        from process_task_changes.app import lambda_handler
+    finally:
+        sys.path.remove(FUNCTIONS_DIR)
+
+    records = gateway.client.drain_stream(TableName=table_name or os.environ['TABLE_NAME'])
+    # Lambdaのバッチサイズ（template.yaml の BatchSize）ずつ
+    for start in range(0, len(records), 100):
+        with redirect_stdout(io.StringIO()):
+            lambda_handler({'Records': records[start:start + 100]}, None)
+    return len(records)
+
+def seed_tasks(count, user_id=BENCH_USER_ID):
+    """計測用タスクを作成し、taskIdのリストを返す"""
+    from common import gateway, summary
+
+    task_ids = []
+    counts = {}
+    for i in range(count):
+        task_id, item = build_task_item(user_id, i)
+        gateway.put_item(item)
+        summary.merge(counts, summary.counters(item))
+        task_ids.append(task_id)
+    # 件数の集計も作成したタスクに合わせ、検索インデックスはストリームから作成する
+    summary.apply(user_id, counts)
+    process_stream()
+    return task_ids
+
+def build_task_item(user_id, index, task_id=None):
+    """
+    ベンチマーク用タスクアイテムを生成（taskId, アイテム）
+
+    task_id を指定した場合はそのIDで作成する（UUIDv7のみ。作成日時はIDから復元）
+    """
+    from common.dynamodb_helper import (
+        new_task_id, created_at_from_task_id, build_pk, build_sk, build_due_keys, build_status_pk
+    )
+
+    if task_id:
+        created_at = created_at_from_task_id(task_id)
+        if not created_at:
+            raise ValueError(f'Not a UUIDv7 task id: {task_id}')
+    else:
+        task_id, created_at = new_task_id()
+    return task_id, {
+        'PK': build_pk(user_id),
+        'SK': build_sk(task_id, created_at),
+        'GSI1PK': build_pk(user_id),
+        'GSI2PK': build_status_pk(user_id, 'PENDING'),
+        **build_due_keys('2030-01-01T00:00:00.000Z', 'MEDIUM'),
+        'taskId': task_id,
+        'title': f'ベンチマーク {index}',
+        'description': '',
+        'dueDate': '2030-01-01T00:00:00.000Z',
+        'priority': 'MEDIUM',
+        'status': 'PENDING',
+        'createdAt': created_at,
+        'updatedAt': created_at,
+        'version': 1,
+    }
+
+def load_events(path):
+    """
+    キャプチャしたAPI GatewayイベントのNDJSONを読み込む
+
+    CloudWatch Logsからエクスポートした行（タイムスタンプ等の接頭辞付き）や
+    イベント以外のログ行が混在していてもよい。
+    """
+    events = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            start = line.find('{')
+            if start < 0:
+                continue
+            try:
+                event = json.loads(line[start:])
+            except ValueError:
+                continue
+            if isinstance(event, dict) and 'httpMethod' in event and 'requestContext' in event:
+                events.append(event)
+    return events
@@ -0,0 +1,189 @@
+"""
+キャプチャしたトラフィックのリプレイ
+
+common/capture.py が書き出したAPI GatewayイベントのNDJSONを、元の到着間隔を
+--speedup 倍に縮めて lambda_handler に流し、ルートごとのスループット・
+レイテンシ（p50/p95/p99）・エラー率を出力する。データモデルを変更する前に
+本番と同じ負荷の形をオフラインで再現するためのもの。
+
+- ハンドラはルーター（router.app）経由でこのプロセス内から呼び出す
+  （--concurrency はスレッド数。DynamoDBの待ち時間を含む同時実行を再現する）
+- PUT/DELETE が参照するタスクは再生前に同じtaskIdで作成する（--no-seed で無効）
+- nextToken は本番の署名鍵で発行されているため既定で取り除く（--keep-page-tokens）
+- --speedup 0 は到着間隔を無視して可能な限り速く流す
+
+使い方:
+    TRAFFIC_CAPTURE=traffic.ndjson sam local start-api
+    python benchmarks/replay_traffic.py traffic.ndjson --emulator --concurrency 8 --speedup 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness  # noqa: E402
+
+def prepare(events, keep_page_tokens):
+    """到着時刻順に並べ、必要ならnextTokenを取り除く"""
+    events = sorted(events, key=lambda e: e['requestContext'].get('requestTimeEpoch', 0))
+    if not keep_page_tokens:
+        for event in events:
+            query = event.get('queryStringParameters')
+            if query and 'nextToken' in query:
+                event['queryStringParameters'] = {k: v for k, v in query.items() if k != 'nextToken'} or None
+    return events
+
+def seed_referenced_tasks(events):
+    """PUT/DELETE が参照するタスクを同じtaskIdで作成（作成数, UUIDv7でないため作成できなかった数）"""
+    from common import gateway
+
+    task_ids = []
+    for event in events:
+        if (event['httpMethod'], event.get('resource')) not in harness.SEEDED_ROUTES:
+            continue
+        task_id = (event.get('pathParameters') or {}).get('taskId')
+        if task_id and task_id not in task_ids:
+            task_ids.append(task_id)
+
+    seeded, skipped = 0, 0
+    for index, task_id in enumerate(task_ids):
+        try:
+            _, item = harness.build_task_item(harness.BENCH_USER_ID, index, task_id=task_id)
+        except ValueError:
+            skipped += 1
+            continue
+        gateway.put_item(item)
+        seeded += 1
+    return seeded, skipped
+
+def replay(events, handler, concurrency, speedup):
+    """
+    イベントを再生する
+
+    Returns:
+        tuple: ([(ルート, ステータスコード, レイテンシms, 予定時刻からの遅れms)], 経過秒)
+    """
+    base_ms = events[0]['requestContext'].get('requestTimeEpoch', 0)
+
+    def run(event, due):
+        started = time.perf_counter()
+        try:
+            status = handler(event, None)['statusCode']
+        except Exception:
+            status = None
+        latency_ms = (time.perf_counter() - started) * 1000
+        lag_ms = (started - due) * 1000 if due is not None else 0.0
+        return (event['httpMethod'], event.get('resource')), status, latency_ms, lag_ms
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = []
+        for event in events:
+            due = None
+            if speedup > 0:
+                offset = (event['requestContext'].get('requestTimeEpoch', base_ms) - base_ms) / 1000 / speedup
+                due = start + offset
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append(pool.submit(run, event, due))
+        results = [future.result() for future in futures]
+    return results, time.perf_counter() - start
+
+def summarize(results, elapsed):
+    """ルートごと・全体の集計"""
+    groups = {}
+    for route, status, latency_ms, lag_ms in results:
+        groups.setdefault(' '.join(route), []).append((status, latency_ms, lag_ms))
+    groups['ALL'] = [(status, latency_ms, lag_ms) for _, status, latency_ms, lag_ms in results]
+
+    summary = {}
+    for name, samples in groups.items():
+        latencies = [latency for _, latency, _ in samples]
+        statuses = [status for status, _, _ in samples]
+        client_errors = sum(1 for s in statuses if s is not None and 400 <= s < 500)
+        server_errors = sum(1 for s in statuses if s is None or s >= 500)
+        summary[name] = {
+            'count': len(samples),
+            'throughput': len(samples) / elapsed if elapsed else None,
+            'latencyMs': {
+                'p50': harness.percentile(latencies, 0.50),
+                'p95': harness.percentile(latencies, 0.95),
+                'p99': harness.percentile(latencies, 0.99),
+            },
+            'clientErrorRate': client_errors / len(samples),
+            'serverErrorRate': server_errors / len(samples),
+            'scheduleLagMsP95': harness.percentile([lag for _, _, lag in samples], 0.95),
+        }
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='replay captured API Gateway traffic through the handlers')
+    parser.add_argument('traffic', help='キャプチャしたイベントのNDJSON')
+    parser.add_argument('--concurrency', type=int, default=4, help='同時実行数（スレッド数）')
+    parser.add_argument('--speedup', type=float, default=1.0, help='到着間隔の短縮倍率（0: 待たずに流す）')
+    parser.add_argument('--emulator', action='store_true', help='DynamoDB Localの代わりにインメモリのエミュレータを使う')
+    parser.add_argument('--endpoint-url', default=os.environ.get('AWS_ENDPOINT_URL_DYNAMODB', 'http://localhost:8000'))
+    parser.add_argument('--table-name', default='replay-todos')
+    parser.add_argument('--no-seed', action='store_true', help='参照されるタスクを事前に作成しない')
+    parser.add_argument('--keep-page-tokens', action='store_true', help='nextTokenを取り除かずに再生する')
+    parser.add_argument('--output', help='結果を書き出すJSONファイル')
+    args = parser.parse_args()
+
+    events = prepare(harness.load_events(args.traffic), args.keep_page_tokens)
+    if not events:
+        sys.exit(f'No API Gateway events found in {args.traffic}')
+
+    # 再生中のイベントを再びキャプチャしない
+    os.environ.pop('TRAFFIC_CAPTURE', None)
+    os.environ['TABLE_NAME'] = args.table_name
+    os.environ.setdefault('PAGE_TOKEN_SECRET', 'replay-secret')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+    if args.emulator:
+        os.environ['DYNAMODB_EMULATOR'] = '1'
+    else:
+        os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = args.endpoint_url
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'local')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+    sys.path[:0] = [harness.FUNCTIONS_DIR, harness.LAYER_DIR]
+
+    from common import gateway
+    from router.app import lambda_handler
+
+    harness.ensure_table(gateway.client, args.table_name)
+    if not args.no_seed:
+        seeded, skipped = seed_referenced_tasks(events)
+        print(f'seeded {seeded} referenced tasks ({skipped} legacy ids skipped)')
+
+    # ハンドラのログ出力は集計に含めない
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        results, elapsed = replay(events, lambda_handler, args.concurrency, args.speedup)
+    summary = summarize(results, elapsed)
+
+    print(f'{len(results)} requests in {elapsed:.2f}s (concurrency={args.concurrency}, speedup={args.speedup})')
+    print(f"{'route':<24} {'count':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'4xx':>6} {'5xx':>6}")
+    for name, entry in summary.items():
+        latency = entry['latencyMs']
+        print(f"{name:<24} {entry['count']:>6} {entry['throughput']:>8.1f} {latency['p50']:>8.2f} "
+              f"{latency['p95']:>8.2f} {latency['p99']:>8.2f} {entry['clientErrorRate']:>6.1%} "
+              f"{entry['serverErrorRate']:>6.1%}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {
+                    'traffic': args.traffic,
+                    'concurrency': args.concurrency,
+                    'speedup': args.speedup,
+                    'emulator': args.emulator,
+                    'elapsedSeconds': elapsed,
+                },
+                'routes': summary,
+            }, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
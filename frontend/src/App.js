@@ -13,6 +13,7 @@ Amplify.configure(awsConfig);
 
 function App() {
   const [todos, setTodos] = useState([]);
+  const [summary, setSummary] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -30,14 +31,17 @@ function App() {
         throw new Error('No authentication token available');
       }
 
-      // Call API
-      const response = await fetch(`${awsConfig.API.REST.TodoAPI.endpoint}/todos`, {
-        method: 'GET',
-        headers: {
-          'Authorization': `Bearer ${idToken}`,
-          'Content-Type': 'application/json'
-        }
-      });
+      // Call API (task counts come from the summary, not from the downloaded list)
+      // Accept: application/json lets the API return gzip/br compressed lists
+      const headers = {
+        'Authorization': `Bearer ${idToken}`,
+        'Content-Type': 'application/json',
+        'Accept': 'application/json'
+      };
+      const [response, summaryResponse] = await Promise.all([
+        fetch(`${awsConfig.API.REST.TodoAPI.endpoint}/todos`, { method: 'GET', headers }),
+        fetch(`${awsConfig.API.REST.TodoAPI.endpoint}/todos/summary`, { method: 'GET', headers })
+      ]);
 
       if (!response.ok) {
         throw new Error(`Failed to fetch todos: ${response.statusText}`);
@@ -45,6 +49,7 @@ function App() {
 
       const data = await response.json();
       setTodos(data.items || []);
+      setSummary(summaryResponse.ok ? await summaryResponse.json() : null);
     } catch (err) {
       console.error('Error fetching todos:', err);
       setError(err.message);
@@ -158,6 +163,7 @@ function App() {
             
             <TodoList
               todos={todos}
+              summary={summary}
               loading={loading}
               onUpdate={updateTodo}
               onDelete={deleteTodo}
@@ -2,7 +2,7 @@ import React, { useEffect } from 'react';
 import TodoItem from './TodoItem';
 import './TodoList.css';
 
-function TodoList({ todos, loading, onUpdate, onDelete, onRefresh }) {
+function TodoList({ todos, summary, loading, onUpdate, onDelete, onRefresh }) {
   // Load todos on mount
   useEffect(() => {
     onRefresh();
@@ -31,10 +31,15 @@ function TodoList({ todos, loading, onUpdate, onDelete, onRefresh }) {
   const pendingTodos = todos.filter(todo => todo.status === 'PENDING');
   const completedTodos = todos.filter(todo => todo.status === 'COMPLETED');
 
+  // Counts from GET /todos/summary (the list may be only the first page)
+  const totalCount = summary ? summary.total : todos.length;
+  const pendingCount = summary ? summary.byStatus.PENDING : pendingTodos.length;
+  const completedCount = summary ? summary.byStatus.COMPLETED : completedTodos.length;
+
   return (
     <div className="todo-list-container">
       <div className="list-header">
-        <h2>📋 My Tasks ({todos.length})</h2>
+        <h2>📋 My Tasks ({totalCount})</h2>
         <button onClick={onRefresh} className="refresh-btn">
           🔄 Refresh
         </button>
@@ -43,7 +48,7 @@ function TodoList({ todos, loading, onUpdate, onDelete, onRefresh }) {
       {pendingTodos.length > 0 && (
         <div className="todo-section">
           <h3 className="section-title">
-            ⏰ Pending ({pendingTodos.length})
+            ⏰ Pending ({pendingCount})
           </h3>
           <div className="todo-list">
             {pendingTodos.map(todo => (
@@ -61,7 +66,7 @@ function TodoList({ todos, loading, onUpdate, onDelete, onRefresh }) {
       {completedTodos.length > 0 && (
         <div className="todo-section">
           <h3 className="section-title">
-            ✅ Completed ({completedTodos.length})
+            ✅ Completed ({completedCount})
           </h3>
           <div className="todo-list">
             {completedTodos.map(todo => (
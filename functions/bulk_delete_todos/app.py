@@ -0,0 +1,70 @@
+import json
+import os
+import time
+from common import bulk_delete, capacity, compression, gateway, logger, metrics
+from common.capture import capture_event
+from common.dynamodb_helper import create_response
+
+# 関数のタイムアウト前に処理を打ち切る余裕（最後のページの削除とチェックポイント保存の時間）
+SAFETY_MARGIN_MS = int(os.environ.get('BULK_DELETE_SAFETY_MARGIN_MS', '5000'))
+# 1回の呼び出しで削除を続ける最大時間（API Gatewayの統合タイムアウト29秒より前に応答する）
+MAX_RUN_MS = int(os.environ.get('BULK_DELETE_MAX_RUN_MS', '25000'))
+
+def get_deadline(context):
+    """処理を打ち切る時刻（time.monotonic()基準）"""
+    run_ms = MAX_RUN_MS
+    if context is not None:
+        run_ms = min(run_ms, context.get_remaining_time_in_millis() - SAFETY_MARGIN_MS)
+    return time.monotonic() + max(0, run_ms) / 1000
+
+@logger.log_request
+@metrics.log_metrics
+@compression.compress_response
+@capacity.track_capacity
+def lambda_handler(event, context):
+    """
+    タスク一括削除（完了済みタスクの削除・全タスクのパージ）
+
+    時間内に終わらない場合は202とstatus=IN_PROGRESSを返す。同じリクエストを
+    再送するとチェックポイントから再開する。
+    """
+
+    logger.debug('Event', payload=event)
+    capture_event(event)
+
+    try:
+        # リクエストボディ解析
+        body = json.loads(event.get('body') or '{}')
+        scope = body.get('scope') if isinstance(body, dict) else None
+        if scope not in bulk_delete.SCOPES:
+            return create_response(400, {'error': 'scope must be COMPLETED or ALL'})
+
+        # ユーザーID（固定）
+        user_id = 'test-user-001'
+        logger.append_keys(user=user_id, scope=scope)
+
+        try:
+            result = bulk_delete.run(user_id, scope, get_deadline(context))
+        except bulk_delete.JobInProgressError as e:
+            # 先の呼び出し（タイムアウトしたクライアントの再送元など）が実行中
+            logger.warning('Bulk delete already running: %s', e)
+            return create_response(409, {'error': 'Bulk delete is already running, retry later', 'scope': scope},
+                                   headers={'Retry-After': '5'})
+        except gateway.UnprocessedItemsError as e:
+            # 進捗は直前のページまで保存済み。時間をおいて再送すると再開する
+            logger.warning('Bulk delete throttled: %s', e)
+            return create_response(503, {'error': 'Throttled, retry later', 'scope': scope})
+
+        logger.append_keys(deleted=result['deletedThisRun'], jobStatus=result['status'])
+        metrics.increment('ItemsDeleted', result['deletedThisRun'])
+
+        status_code = 200 if result['status'] == 'COMPLETED' else 202
+        return create_response(status_code, dict(result, scope=scope))
+
+    except json.JSONDecodeError as e:
+        logger.warning('JSON decode error: %s', e)
+        return create_response(400, {'error': 'Invalid JSON'})
+
+    except Exception as e:
+        logger.exception('Error: %s', e)
+        return create_response(500, {'error': 'Internal server error', 'details': str(e)})
@@ -0,0 +1,166 @@
+import time
+
+import pytest
+
+from bulk_delete_todos import app
+from common import bulk_delete, gateway, summary as task_summary
+from common.dynamodb_helper import build_list_version_key, build_pk, RESET_SK
+
+USER_ID = 'test-user-001'
+
+def complete(api, task):
+    status, _, _ = api('PUT', '/todos/{taskId}', body={'status': 'COMPLETED'},
+                       path_parameters={'taskId': task['taskId']})
+    assert status == 200
+
+def test_delete_completed_subtracts_only_completed(api, create_task, summary):
+    tasks = [create_task(priority=priority) for priority in ('HIGH', 'HIGH', 'MEDIUM', 'LOW')]
+    complete(api, tasks[0])
+    complete(api, tasks[2])
+
+    status, body, _ = api('POST', '/todos/bulk-delete', body={'scope': 'COMPLETED'})
+
+    assert status == 200
+    assert body['status'] == 'COMPLETED'
+    assert body['deleted'] == 2
+    counts = summary()
+    assert counts['byStatus'] == {'PENDING': 2, 'COMPLETED': 0}
+    assert counts['pendingByPriority'] == {'HIGH': 1, 'MEDIUM': 0, 'LOW': 1}
+    assert task_summary.count_tasks(USER_ID) == {'PENDING': 2, 'PENDING_HIGH': 1, 'PENDING_LOW': 1}
+
+def test_delete_all_resets_counters(api, create_task, summary):
+    for _ in range(3):
+        create_task()
+
+    status, body, _ = api('POST', '/todos/bulk-delete', body={'scope': 'ALL'})
+
+    assert status == 200
+    assert body['status'] == 'COMPLETED'
+    assert summary()['total'] == 0
+    assert task_summary.count_tasks(USER_ID) == {}
+
+def test_repeated_request_does_not_subtract_twice(api, create_task, summary):
+    create_task()
+    complete(api, create_task())
+    api('POST', '/todos/bulk-delete', body={'scope': 'COMPLETED'})
+
+    status, body, _ = api('POST', '/todos/bulk-delete', body={'scope': 'COMPLETED'})
+
+    assert status == 200
+    assert summary()['byStatus'] == {'PENDING': 1, 'COMPLETED': 0}
+
+def changes(api, since=None):
+    status, body, _ = api('GET', '/todos/changes', query={'since': since} if since else None)
+    return status, body
+
+def list_version():
+    return gateway.get_item(build_list_version_key(USER_ID))['version']
+
+def tombstone(task):
+    return gateway.get_item({'PK': build_pk(USER_ID), 'SK': f'DELETED#{task["taskId"]}'})
+
+def test_completed_writes_tombstones_and_list_version_with_counters(api, create_task, table):
+    done = create_task()
+    complete(api, done)
+    create_task()
+    before = list_version()
+    table.stats['calls'].clear()
+
+    status, _, _ = api('POST', '/todos/bulk-delete', body={'scope': 'COMPLETED'})
+
+    assert status == 200
+    assert table.stats['calls'].get('TransactWriteItems') == 1
+    assert 'BatchWriteItem' not in table.stats['calls']
+    assert tombstone(done)['deleted'] is True
+    assert list_version() == before + 1
+
+def test_failed_transaction_leaves_no_tombstone_or_bump(api, create_task, summary, monkeypatch):
+    done = create_task()
+    complete(api, done)
+    before = list_version()
+
+    def fail(actions):
+        raise RuntimeError('transaction failed')
+
+    monkeypatch.setattr(gateway, 'transact_write', fail)
+    status, _, _ = api('POST', '/todos/bulk-delete', body={'scope': 'COMPLETED'})
+    monkeypatch.undo()
+
+    assert status == 500
+    assert tombstone(done) is None
+    assert list_version() == before
+    # 中断した呼び出しはジョブを手放している
+    assert api('POST', '/todos/bulk-delete', body={'scope': 'COMPLETED'})[0] == 200
+
+def test_purge_bumps_list_version_with_other_items(api, create_task, table):
+    task = create_task()
+    api('DELETE', '/todos/{taskId}', path_parameters={'taskId': task['taskId']})
+    before = list_version()
+    table.stats['calls'].clear()
+
+    status, _, _ = api('POST', '/todos/bulk-delete', body={'scope': 'ALL'})
+
+    assert status == 200
+    # トゥームストーンの削除は一覧のバージョンの加算と同じトランザクション
+    assert table.stats['calls'].get('TransactWriteItems') == 1
+    assert 'BatchWriteItem' not in table.stats['calls']
+    assert list_version() == before + 1
+    assert tombstone(task) is None
+
+def test_purge_writes_reset_marker_before_deleting(api, create_task, monkeypatch):
+    create_task()
+    _, body = changes(api)
+    token = body['syncToken']
+
+    def fail(actions):
+        raise RuntimeError('transaction failed')
+
+    monkeypatch.setattr(gateway, 'transact_write', fail)
+    status, _, _ = api('POST', '/todos/bulk-delete', body={'scope': 'ALL'})
+    monkeypatch.undo()
+
+    assert status == 500
+    assert gateway.get_item({'PK': build_pk(USER_ID), 'SK': RESET_SK})['reset'] is True
+    assert changes(api, token)[0] == 410
+
+def test_concurrent_call_gets_409(api, create_task):
+    complete(api, create_task())
+    bulk_delete.claim(USER_ID, 'COMPLETED')
+
+    status, body, headers = api('POST', '/todos/bulk-delete', body={'scope': 'COMPLETED'})
+
+    assert status == 409
+    assert headers['Retry-After']
+    assert body['scope'] == 'COMPLETED'
+
+def test_paused_call_releases_job(api, create_task, monkeypatch):
+    complete(api, create_task())
+    monkeypatch.setattr(app, 'MAX_RUN_MS', 0)
+
+    status, body, _ = api('POST', '/todos/bulk-delete', body={'scope': 'COMPLETED'})
+    assert status == 202
+    assert body['status'] == 'IN_PROGRESS'
+
+    monkeypatch.undo()
+    status, body, _ = api('POST', '/todos/bulk-delete', body={'scope': 'COMPLETED'})
+    assert status == 200
+    assert body['deleted'] == 1
+
+def test_checkpoint_is_not_saved_after_job_is_taken_over(create_task):
+    checkpoint = bulk_delete.claim(USER_ID, 'ALL')
+    gateway.update_item({'PK': build_pk(USER_ID), 'SK': 'JOB#DELETE#ALL'}, {'lockedUntil': 0})
+    bulk_delete.claim(USER_ID, 'ALL')
+
+    with pytest.raises(gateway.ConditionFailedError):
+        bulk_delete.save_checkpoint(USER_ID, 'ALL', checkpoint)
+
+class Context:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+@pytest.mark.parametrize('remaining_ms, expected', [(300000, 25), (20000, 15), (1000, 0)])
+def test_deadline_is_capped_below_api_gateway_timeout(remaining_ms, expected):
+    assert app.get_deadline(Context(remaining_ms)) - time.monotonic() == pytest.approx(expected, abs=0.5)
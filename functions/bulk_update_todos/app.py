@@ -0,0 +1,315 @@
+import contextvars
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from common import capacity, compression, gateway, logger, metrics, summary
+from common.capture import capture_event
+from common.dynamodb_helper import (
+    create_response, resolve_task_key, build_pk, build_status_pk, build_due_keys, build_due_range, build_priority_range,
+    version_condition, bump_list_version, normalize_due_date, get_current_timestamp, PRIORITY_INDEX_ENABLED
+)
+from common.pagination import encode_page_token, decode_page_token
+
+# 1回の呼び出しで更新する最大件数（超える分はnextTokenで続きを処理する）
+MAX_BULK_TASKS = 1000
+# 並列に実行する条件付き更新の数（コネクションプール DDB_MAX_POOL_CONNECTIONS 以下にする）
+BULK_CONCURRENCY = int(os.environ.get('BULK_CONCURRENCY', '16'))
+# フィルタ指定時のQuery 1回あたりの件数
+QUERY_PAGE_SIZE = 100
+# 読んだタスクが書き込みまでに変更された場合の再試行回数
+MAX_ATTEMPTS = 3
+
+STATUSES = ['PENDING', 'COMPLETED']
+PRIORITIES = ['HIGH', 'MEDIUM', 'LOW']
+PATCH_FIELDS = ('status', 'priority', 'dueDate')
+# フィルタ指定のジョブ（nextTokenで続けるページ全体）で更新済みの印。
+# 更新でインデックス上の位置が変わったタスクを後のページで再び選んでも二重に更新しない
+JOB_ATTRIBUTE = 'bulkUpdateJob'
+
+def validate_patch(patch):
+    """更新内容を検証（エラーメッセージ、問題なければNone）"""
+    if not isinstance(patch, dict) or not patch:
+        return 'patch must contain status, priority or dueDate'
+    unknown = sorted(set(patch) - set(PATCH_FIELDS))
+    if unknown:
+        return f"patch cannot update: {', '.join(unknown)}"
+    if 'status' in patch and patch['status'] not in STATUSES:
+        return 'status must be PENDING or COMPLETED'
+    if 'priority' in patch and patch['priority'] not in PRIORITIES:
+        return 'priority must be HIGH, MEDIUM, or LOW'
+    if 'dueDate' in patch:
+        try:
+            normalize_due_date(patch['dueDate'])
+        except ValueError as e:
+            return str(e)
+    return None
+
+def validate_filter(task_filter):
+    """フィルタを検証（エラーメッセージ、問題なければNone）"""
+    if not isinstance(task_filter, dict):
+        return 'filter must be an object'
+    unknown = sorted(set(task_filter) - {'status', 'priority', 'dueFrom', 'dueTo'})
+    if unknown:
+        return f"unknown filter: {', '.join(unknown)}"
+    if 'status' in task_filter and task_filter['status'] not in STATUSES:
+        return 'status must be PENDING or COMPLETED'
+    if 'priority' in task_filter and task_filter['priority'] not in PRIORITIES:
+        return 'priority must be HIGH, MEDIUM, or LOW'
+    try:
+        build_due_range(task_filter.get('dueFrom'), task_filter.get('dueTo'))
+    except ValueError as e:
+        return str(e)
+    return None
+
+def filter_condition(task_filter, job_id):
+    """
+    フィルタに一致し、このジョブで未更新であることの条件式（condition, condition_values）
+
+    値の名前はSETの値（:{属性名}）と重ならないよう :filter* にする。
+    期限の範囲は選択と同じGSI1SKの範囲で判定する。
+    """
+    parts = [f'(attribute_not_exists(#{JOB_ATTRIBUTE}) OR #{JOB_ATTRIBUTE} <> :filterJob)']
+    values = {':filterJob': job_id}
+    if task_filter.get('status'):
+        parts.append('#status = :filterStatus')
+        values[':filterStatus'] = task_filter['status']
+    if task_filter.get('priority'):
+        parts.append('#priority = :filterPriority')
+        values[':filterPriority'] = task_filter['priority']
+    if task_filter.get('dueFrom') or task_filter.get('dueTo'):
+        due_range = build_due_range(task_filter.get('dueFrom'), task_filter.get('dueTo'))
+        parts.append('#GSI1SK BETWEEN :filterDueFrom AND :filterDueTo')
+        values[':filterDueFrom'] = due_range[':from']
+        values[':filterDueTo'] = due_range[':to']
+    return ' AND '.join(parts), values
+
+def matches_filter(task, task_filter, job_id):
+    """条件チェックに失敗したときのアイテムが、まだフィルタに一致しこのジョブで未更新か（filter_condition と同じ判定）"""
+    if task.get(JOB_ATTRIBUTE) == job_id:
+        return False
+    for name in ('status', 'priority'):
+        if task_filter.get(name) and task.get(name) != task_filter[name]:
+            return False
+    if task_filter.get('dueFrom') or task_filter.get('dueTo'):
+        due_range = build_due_range(task_filter.get('dueFrom'), task_filter.get('dueTo'))
+        return due_range[':from'] <= task.get('GSI1SK', '') <= due_range[':to']
+    return True
+
+def select_by_filter(user_id, task_filter, start_key, job_id):
+    """
+    フィルタに一致するタスクを最大MAX_BULK_TASKS件取得
+
+    ステータス指定時はGSI2、priorityのみの指定はGSI5（優先度・期限の範囲）、
+    それ以外はGSI1を期限の範囲でQueryする。GSI2/GSI1ではpriorityはキーに含まれないため
+    取得後に絞り込む（GSI5をデプロイしていない場合も同じ）。このジョブで更新済みのタスクは除く
+    （GSI5の射影には印がないため、更新時の条件で除く）。
+
+    Returns:
+        tuple: (タスクのリスト, 続きのLastEvaluatedKey（最後まで読んだ場合はNone）)
+    """
+    priority = task_filter.get('priority')
+    if task_filter.get('status'):
+        pattern, pk = 'GSI2_DUE_RANGE', build_status_pk(user_id, task_filter['status'])
+        due_range = build_due_range(task_filter.get('dueFrom'), task_filter.get('dueTo'))
+    elif priority and PRIORITY_INDEX_ENABLED:
+        pattern, pk = 'GSI5_RANGE', build_pk(user_id)
+        due_range = build_priority_range(priority, task_filter.get('dueFrom'), task_filter.get('dueTo'))
+    else:
+        pattern, pk = 'GSI1_DUE_RANGE', build_pk(user_id)
+        due_range = build_due_range(task_filter.get('dueFrom'), task_filter.get('dueTo'))
+
+    tasks = []
+    while True:
+        # 残り件数までに抑えることで、途中で打ち切ったページのアイテムを取りこぼさない
+        limit = min(QUERY_PAGE_SIZE, MAX_BULK_TASKS - len(tasks))
+        items, start_key = gateway.query(pattern, pk, limit, start_key=start_key, values=due_range)
+        tasks.extend(item for item in items
+                     if (not priority or item.get('priority') == priority) and item.get(JOB_ATTRIBUTE) != job_id)
+        if not start_key or len(tasks) >= MAX_BULK_TASKS:
+            return tasks, start_key
+
+def build_changes(user_id, patch, task, now):
+    """1件分の更新内容（patchにないdueDate/priorityは既存のタスクの値）"""
+    changes = dict(patch)
+    if 'status' in patch:
+        changes['GSI2PK'] = build_status_pk(user_id, patch['status'])
+    if 'dueDate' in patch or 'priority' in patch:
+        changes.update(build_due_keys(
+            patch.get('dueDate', task.get('dueDate')),
+            patch.get('priority', task.get('priority', 'MEDIUM'))
+        ))
+    changes['updatedAt'] = now
+    return changes
+
+def update_one(user_id, task_id, patch, task, now, task_filter=None, job_id=None):
+    """
+    1件を条件付きで更新（ワーカースレッドで実行）
+
+    patchの項目は件数の集計（status/priority）かGSI1SK/GSI5SK（dueDate/priority）に関わるため、
+    既存の値を参照する（taskIds指定では既存のアイテムを取得する）。読んだversionを条件にし、
+    件数が変わる場合は集計の更新と同じトランザクションで書き込む。間に別の更新があれば
+    条件チェック失敗時に返るアイテムで計算し直す。フィルタ指定では、フィルタに一致し
+    このジョブで未更新であることも条件にし、更新したタスクにジョブの印を付ける
+    （インデックスが古く一致しなくなったタスク・更新済みのタスクは skipped）。
+
+    Returns:
+        dict: taskIdごとの結果（updated / skipped / not_found / error）
+    """
+    try:
+        if task is not None:
+            key = {'PK': task['PK'], 'SK': task['SK']}
+        else:
+            key = resolve_task_key(user_id, task_id)
+            if not key:
+                return {'taskId': task_id, 'result': 'not_found'}
+            task = gateway.get_item(key)
+            if not task:
+                return {'taskId': task_id, 'result': 'not_found'}
+
+        for _ in range(MAX_ATTEMPTS):
+            condition, condition_values = version_condition(int(task.get('version', 0)))
+            changes = build_changes(user_id, patch, task, now)
+            if task_filter is not None:
+                extra, extra_values = filter_condition(task_filter, job_id)
+                condition = f'({condition}) AND {extra}'
+                condition_values = dict(condition_values or {}, **extra_values)
+                changes[JOB_ATTRIBUTE] = job_id
+            counts = summary.delta(task, dict(task, **changes))
+            try:
+                if counts:
+                    gateway.transact_write([
+                        gateway.update_action(key, changes, condition=condition, condition_values=condition_values,
+                                              add={'version': 1}),
+                        summary.update_action(user_id, counts)
+                    ])
+                else:
+                    gateway.update_item(key, changes, condition=condition, condition_values=condition_values,
+                                        add={'version': 1})
+                return {'taskId': task_id, 'result': 'updated'}
+            except gateway.ConditionFailedError as e:
+                if e.item is None:
+                    return {'taskId': task_id, 'result': 'not_found'}
+                if task_filter is not None and not matches_filter(e.item, task_filter, job_id):
+                    return {'taskId': task_id, 'result': 'skipped'}
+                task = e.item
+        return {'taskId': task_id, 'result': 'error', 'error': 'Task was modified concurrently'}
+    except Exception as e:
+        logger.exception('Error updating task %s: %s', task_id, e)
+        return {'taskId': task_id, 'result': 'error', 'error': str(e)}
+
+def apply_patch(user_id, targets, patch, task_filter=None, job_id=None):
+    """
+    (taskId, アイテムまたはNone) のリストに並列で更新を適用
+
+    ワーカーはリクエストのcontextvarsのコピーで実行し、ログ・メトリクス・
+    消費キャパシティをこのリクエストに集計する。
+    """
+    now = get_current_timestamp()
+    with ThreadPoolExecutor(max_workers=BULK_CONCURRENCY) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, update_one, user_id, task_id, patch, task, now,
+                        task_filter, job_id)
+            for task_id, task in targets
+        ]
+        return [future.result() for future in futures]
+
+@logger.log_request
+@metrics.log_metrics
+@compression.compress_response
+@capacity.track_capacity
+def lambda_handler(event, context):
+    """タスク一括更新（taskIdのリストまたはフィルタで選択）"""
+
+    logger.debug('Event', payload=event)
+    capture_event(event)
+
+    try:
+        # リクエストボディ解析
+        body = json.loads(event.get('body') or '{}')
+        if not isinstance(body, dict):
+            return create_response(400, {'error': 'Request body must be an object'})
+
+        patch = body.get('patch')
+        error = validate_patch(patch)
+        if error:
+            return create_response(400, {'error': error})
+        if 'dueDate' in patch:
+            # UTCの正規形にする（GSI1SKの文字列順を期限順と一致させる）
+            patch = dict(patch, dueDate=normalize_due_date(patch['dueDate']))
+
+        task_ids = body.get('taskIds')
+        task_filter = body.get('filter')
+        if (task_ids is None) == (task_filter is None):
+            return create_response(400, {'error': 'Specify either taskIds or filter'})
+
+        # ユーザーID（固定）
+        user_id = 'test-user-001'
+        logger.append_keys(user=user_id, fields=sorted(patch))
+
+        next_key = None
+        job_id = None
+        if task_ids is not None:
+            if not isinstance(task_ids, list) or not all(isinstance(t, str) and t for t in task_ids):
+                return create_response(400, {'error': 'taskIds must be a list of strings'})
+            # 重複は1回だけ更新する（順序は維持）
+            task_ids = list(dict.fromkeys(task_ids))
+            if not task_ids or len(task_ids) > MAX_BULK_TASKS:
+                return create_response(400, {'error': f'taskIds must contain 1 to {MAX_BULK_TASKS} items'})
+            targets = [(task_id, None) for task_id in task_ids]
+        else:
+            error = validate_filter(task_filter)
+            if error:
+                return create_response(400, {'error': error})
+
+            # ページ間で変わってはいけない条件（nextTokenに紐づける）
+            # patchも含める（ジョブの印は同じ更新を続けるページの間でのみ有効）
+            query_shape = {'user': user_id, 'filter': task_filter, 'patch': patch}
+            # 続きのキーとジョブのID（最初のページで発行し、nextTokenで引き継ぐ）
+            position = {'k': None, 'job': str(uuid.uuid4())}
+            if body.get('nextToken'):
+                try:
+                    position = decode_page_token(body['nextToken'], query_shape)
+                except ValueError as e:
+                    return create_response(400, {'error': str(e)})
+                if not isinstance(position, dict) or not position.get('job'):
+                    return create_response(400, {'error': 'Invalid nextToken'})
+
+            job_id = position['job']
+            tasks, next_key = select_by_filter(user_id, task_filter, position['k'], job_id)
+            targets = [(task['taskId'], task) for task in tasks]
+
+        results = apply_patch(user_id, targets, patch, task_filter, job_id)
+
+        updated = sum(1 for r in results if r['result'] == 'updated')
+        skipped = sum(1 for r in results if r['result'] == 'skipped')
+        not_found = sum(1 for r in results if r['result'] == 'not_found')
+        failed = len(results) - updated - skipped - not_found
+        if updated:
+            bump_list_version(user_id)
+
+        logger.append_keys(selected=len(targets), updated=updated, skipped=skipped, notFound=not_found, failed=failed,
+                           hasNextPage=next_key is not None)
+        metrics.increment('ItemsUpdated', updated)
+
+        result = {
+            'updated': updated,
+            'skipped': skipped,
+            'notFound': not_found,
+            'failed': failed,
+            'results': results
+        }
+
+        # フィルタ指定で上限を超えた場合のみ、続きを処理するためのnextTokenを返す
+        if next_key:
+            result['nextToken'] = encode_page_token({'k': next_key, 'job': job_id}, query_shape)
+
+        return create_response(200, result)
+
+    except json.JSONDecodeError as e:
+        logger.warning('JSON decode error: %s', e)
+        return create_response(400, {'error': 'Invalid JSON'})
+
+    except Exception as e:
+        logger.exception('Error: %s', e)
+        return create_response(500, {'error': 'Internal server error', 'details': str(e)})
@@ -0,0 +1,169 @@
+import pytest
+
+from bulk_update_todos import app
+from common import gateway
+from common.dynamodb_helper import resolve_task_key
+
+USER_ID = 'test-user-001'
+
+def bulk_update(api, body):
+    return api('POST', '/todos/bulk-update', body=body)
+
+def stored(task):
+    return gateway.get_item(resolve_task_key(USER_ID, task['taskId']))
+
+def run_all_pages(api, body):
+    """nextTokenがなくなるまで同じボディで続け、各ページのレスポンスを返す"""
+    pages = []
+    token = None
+    while True:
+        status, response, _ = bulk_update(api, dict(body, nextToken=token) if token else body)
+        assert status == 200, response
+        pages.append(response)
+        token = response.get('nextToken')
+        if not token:
+            return pages
+
+def test_filter_status_can_be_patched(api, create_task, summary):
+    tasks = [create_task() for _ in range(3)]
+
+    status, body, _ = bulk_update(api, {'filter': {'status': 'PENDING'}, 'patch': {'status': 'COMPLETED'}})
+
+    assert status == 200
+    assert body['updated'] == 3
+    assert all(stored(task)['status'] == 'COMPLETED' for task in tasks)
+    assert summary()['byStatus'] == {'PENDING': 0, 'COMPLETED': 3}
+
+def test_due_date_patch_under_due_range_updates_each_task_once(api, create_task, monkeypatch):
+    """更新で期限の範囲内の後ろへ移ったタスクを、後のページで再び更新しない"""
+    monkeypatch.setattr(app, 'MAX_BULK_TASKS', 2)
+    monkeypatch.setattr(app, 'QUERY_PAGE_SIZE', 2)
+    tasks = [create_task(due_date=f'2030-01-0{day}') for day in range(1, 6)]
+
+    pages = run_all_pages(api, {
+        'filter': {'dueFrom': '2030-01-01', 'dueTo': '2030-12-31'},
+        'patch': {'dueDate': '2030-06-01'},
+    })
+
+    assert sum(page['updated'] for page in pages) == 5
+    assert all(stored(task)['version'] == 2 for task in tasks)
+    assert all(stored(task)['dueDate'] == '2030-06-01T00:00:00.000Z' for task in tasks)
+
+def test_task_that_no_longer_matches_is_skipped(api, create_task, monkeypatch):
+    """インデックスが古く、選択後にフィルタに一致しなくなったタスクは更新しない"""
+    keep, reopened = create_task(), create_task()
+    original = gateway.query
+
+    def complete_after_select(*args, **kwargs):
+        result = original(*args, **kwargs)
+        gateway.update_item(resolve_task_key(USER_ID, reopened['taskId']), {'status': 'COMPLETED'}, add={'version': 1})
+        return result
+
+    monkeypatch.setattr(gateway, 'query', complete_after_select)
+    status, body, _ = bulk_update(api, {'filter': {'status': 'PENDING'}, 'patch': {'priority': 'HIGH'}})
+    monkeypatch.undo()
+
+    assert status == 200
+    assert body['updated'] == 1
+    assert body['skipped'] == 1
+    assert {'taskId': reopened['taskId'], 'result': 'skipped'} in body['results']
+    assert stored(reopened)['priority'] == 'MEDIUM'
+    assert stored(keep)['priority'] == 'HIGH'
+
+def test_concurrent_change_that_still_matches_is_retried(api, create_task, monkeypatch):
+    task = create_task()
+    original = gateway.query
+
+    def rename_after_select(*args, **kwargs):
+        result = original(*args, **kwargs)
+        gateway.update_item(resolve_task_key(USER_ID, task['taskId']), {'title': 'renamed'}, add={'version': 1})
+        return result
+
+    monkeypatch.setattr(gateway, 'query', rename_after_select)
+    status, body, _ = bulk_update(api, {'filter': {'status': 'PENDING'}, 'patch': {'priority': 'LOW'}})
+    monkeypatch.undo()
+
+    assert body['updated'] == 1
+    item = stored(task)
+    assert item['priority'] == 'LOW'
+    assert item['title'] == 'renamed'
+    assert item['version'] == 3
+
+def test_next_token_is_bound_to_filter_and_patch(api, create_task, monkeypatch):
+    monkeypatch.setattr(app, 'MAX_BULK_TASKS', 1)
+    monkeypatch.setattr(app, 'QUERY_PAGE_SIZE', 1)
+    for _ in range(2):
+        create_task()
+    body = {'filter': {'status': 'PENDING'}, 'patch': {'priority': 'HIGH'}}
+    _, first, _ = bulk_update(api, body)
+
+    status, _, _ = bulk_update(api, dict(body, patch={'priority': 'LOW'}, nextToken=first['nextToken']))
+    assert status == 400
+
+    status, _, _ = bulk_update(api, dict(body, nextToken=first['nextToken'][:-2] + 'AA'))
+    assert status == 400
+
+def test_task_ids_get_per_item_results(api, create_task, summary):
+    high, low = create_task(priority='HIGH', due_date='2030-01-01'), create_task(priority='LOW')
+
+    status, body, _ = bulk_update(api, {
+        'taskIds': [high['taskId'], 'missing', high['taskId'], low['taskId']],
+        'patch': {'status': 'COMPLETED', 'dueDate': '2030-02-01T09:00:00+09:00'},
+    })
+
+    assert status == 200
+    assert (body['updated'], body['notFound'], body['failed']) == (2, 1, 0)
+    assert body['results'] == [
+        {'taskId': high['taskId'], 'result': 'updated'},
+        {'taskId': 'missing', 'result': 'not_found'},
+        {'taskId': low['taskId'], 'result': 'updated'},
+    ]
+    item = stored(high)
+    assert item['dueDate'] == '2030-02-01T00:00:00.000Z'
+    assert item['GSI1SK'] == 'DUE#2030-02-01T00:00:00.000Z#0'
+    assert item['GSI2PK'].endswith('#STATUS#COMPLETED')
+    assert summary()['byStatus'] == {'PENDING': 0, 'COMPLETED': 2}
+
+def test_filter_by_priority_and_due_range_selects_only_matching(api, create_task):
+    match = create_task(priority='HIGH', due_date='2030-01-10')
+    other_priority = create_task(priority='LOW', due_date='2030-01-10')
+    out_of_range = create_task(priority='HIGH', due_date='2030-03-01')
+
+    _, body, _ = bulk_update(api, {
+        'filter': {'priority': 'HIGH', 'dueFrom': '2030-01-01', 'dueTo': '2030-01-31'},
+        'patch': {'priority': 'MEDIUM'},
+    })
+
+    assert [r['taskId'] for r in body['results']] == [match['taskId']]
+    assert stored(match)['priority'] == 'MEDIUM'
+    assert stored(other_priority)['priority'] == 'LOW'
+    assert stored(out_of_range)['priority'] == 'HIGH'
+
+def test_thousand_tasks_in_one_call(api, create_task):
+    for i in range(1000):
+        create_task(title=f'task {i}')
+
+    pages = run_all_pages(api, {'filter': {'status': 'PENDING'}, 'patch': {'status': 'COMPLETED'}})
+
+    # 上限ちょうどで止まった場合は続きがあるかわからないため、次のページは空になる
+    assert [page['updated'] for page in pages] == [1000, 0]
+
+@pytest.mark.parametrize('body', [
+    {'patch': {'status': 'COMPLETED'}},
+    {'taskIds': ['a'], 'filter': {}, 'patch': {'status': 'COMPLETED'}},
+    {'taskIds': [], 'patch': {'status': 'COMPLETED'}},
+    {'taskIds': ['a', 1], 'patch': {'status': 'COMPLETED'}},
+    {'taskIds': ['a'], 'patch': {}},
+    {'taskIds': ['a'], 'patch': {'title': 'x'}},
+    {'taskIds': ['a'], 'patch': {'status': 'DONE'}},
+    {'taskIds': ['a'], 'patch': {'dueDate': 'someday'}},
+    {'filter': {'owner': 'me'}, 'patch': {'priority': 'HIGH'}},
+    {'filter': {'dueFrom': '2030-02-01', 'dueTo': '2030-01-01'}, 'patch': {'priority': 'HIGH'}},
+])
+def test_invalid_request_returns_400(api, body):
+    assert bulk_update(api, body)[0] == 400
+
+def test_too_many_task_ids_returns_400(api, monkeypatch):
+    monkeypatch.setattr(app, 'MAX_BULK_TASKS', 2)
+
+    assert bulk_update(api, {'taskIds': ['a', 'b', 'c'], 'patch': {'priority': 'HIGH'}})[0] == 400
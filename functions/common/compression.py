@@ -0,0 +1,162 @@
+"""
+レスポンスの圧縮（Accept-Encoding による gzip / brotli のネゴシエーション）
+
+API Gateway（REST）のLambdaプロキシ統合は、レスポンスを isBase64Encoded=true で返し、
+リクエストの Accept の先頭のメディアタイプが API の BinaryMediaTypes に含まれる場合のみ
+バイナリに戻してクライアントへ送る。そのため圧縮するのは Accept が COMPRESSIBLE_ACCEPT
+（template.yaml の BinaryMediaTypes と同じ）の場合に限る。
+
+BinaryMediaTypes に一致する Content-Type（application/json）のリクエストボディはbase64で渡されるため、
+すべてのルートでハンドラを呼ぶ前に文字列に戻す（ハンドラは isBase64Encoded を見なくてよい）。
+base64・UTF-8として不正なボディはハンドラを呼ばずに400を返す。
+
+COMPRESSION_MIN_BYTES 未満のボディは圧縮しない（ヘッダーとbase64の分だけ大きくなり、
+CPU時間に見合わない）。brotli は brotli パッケージがある場合のみ使う。
+比較は benchmarks/bench_compression.py で計測する。
+"""
+import base64
+import binascii
+import functools
+import gzip
+import os
+from typing import Dict, Optional
+
+from common import logger, metrics
+from common.dynamodb_helper import create_response
+
+try:
+    import brotli
+except ImportError:  # レイヤーに含めない場合はgzipのみ
+    brotli = None
+
+MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+# 128MBのLambdaはCPUが1コアの1/14程度。100件の一覧でgzip-6はgzip-1の約2倍のCPU時間で、
+# 減るのは約900バイトのため、既定は低いレベルにする
+GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '1'))
+BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+COMPRESSIBLE_ACCEPT = 'application/json'
+
+def _compress_gzip(data: bytes) -> bytes:
+    # mtime=0: 同じボディは同じバイト列になる
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+def _compress_brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+
+ENCODERS = {'gzip': _compress_gzip}
+if brotli is not None:
+    ENCODERS['br'] = _compress_brotli
+
+# q値が同じ場合の優先順（圧縮率の高い順）
+PREFERENCE = ('br', 'gzip')
+
+def _header(headers: Optional[Dict], name: str) -> Optional[str]:
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Accept-Encoding から使う圧縮方式を選ぶ（q値の高いもの。圧縮しない場合はNone）
+
+    例: 'gzip, deflate, br' -> 'br'（brotliがなければ'gzip'）、'gzip;q=0' -> None
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    wildcard = weights.get('*', 0.0)
+    candidates = [(weights.get(name, wildcard), -rank, name)
+                  for rank, name in enumerate(PREFERENCE) if name in ENCODERS]
+    q, _, name = max(candidates)
+    return name if q > 0 else None
+
+def accepts_binary(headers: Optional[Dict]) -> bool:
+    """API Gatewayがbase64のレスポンスをバイナリに戻すAcceptか（先頭のメディアタイプのみ見る）"""
+    accept = _header(headers, 'accept') or ''
+    first = accept.split(',')[0].split(';')[0].strip().lower()
+    return first == COMPRESSIBLE_ACCEPT
+
+def decode_request_body(event: Dict) -> Dict:
+    """
+    base64で渡されたリクエストボディを文字列に戻したイベント（それ以外はそのまま）
+
+    Raises:
+        ValueError: base64・UTF-8として不正なボディ
+    """
+    if not event.get('isBase64Encoded') or event.get('body') is None:
+        return event
+    try:
+        body = base64.b64decode(event['body'], validate=True).decode('utf-8')
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError('Invalid base64 request body') from e
+    return dict(event, body=body, isBase64Encoded=False)
+
+def compress(response: Dict, encoding: str) -> Dict:
+    """
+    レスポンスのボディを圧縮してbase64にする
+
+    MIN_BYTES 未満、または圧縮しても小さくならない場合は元のレスポンスを返す。
+    """
+    body = response.get('body')
+    if not body or response.get('isBase64Encoded'):
+        return response
+    data = body.encode('utf-8')
+    if len(data) < MIN_BYTES:
+        return response
+
+    compressed = ENCODERS[encoding](data)
+    if len(compressed) >= len(data):
+        return response
+
+    metrics.increment('ResponseBytesSaved', len(data) - len(compressed), unit='Bytes')
+    logger.append_keys(contentEncoding=encoding, bodyBytes=len(data), compressedBytes=len(compressed))
+    headers = dict(response.get('headers') or {}, **{'Content-Encoding': encoding})
+    return dict(
+        response,
+        headers=headers,
+        body=base64.b64encode(compressed).decode('ascii'),
+        isBase64Encoded=True
+    )
+
+def compress_response(handler):
+    """
+    Accept-Encoding に応じてレスポンスを圧縮するデコレータ
+
+    log_metrics の内側に付ける（ResponseBytes は圧縮後のサイズになる）。
+    idempotency より外側に付け、保存するレスポンスは圧縮前のものにする。
+    """
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        try:
+            decoded = decode_request_body(event)
+        except ValueError as e:
+            logger.warning('Request body decode error: %s', e)
+            return create_response(400, {'error': str(e)}, headers={'Vary': 'Accept-Encoding'})
+        response = handler(decoded, context)
+        if not response:
+            return response
+
+        # 同じURLでもAccept-Encodingによって内容が変わることをキャッシュに伝える
+        headers = response.setdefault('headers', {})
+        headers['Vary'] = 'Accept-Encoding'
+
+        request_headers = event.get('headers')
+        encoding = choose_encoding(_header(request_headers, 'accept-encoding'))
+        if encoding and accepts_binary(request_headers):
+            return compress(response, encoding)
+        return response
+
+    return wrapper
@@ -0,0 +1,537 @@
+"""
+DynamoDBゲートウェイ（botocoreの低レベルクライアント）
+
+boto3.resourceのファクトリ/モデル生成とTypeDeserializerを経由せず、
+固定のアクセスパターン用に事前生成したリクエストでDynamoDBを呼び出す。
+アイテムはPythonのdict（文字列属性は str）で受け渡しする。
+"""
+import os
+import random
+import re
+import time
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import botocore.session
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from common import capacity, metrics
+
+TABLE_NAME = os.environ['TABLE_NAME']
+
+# DynamoDBクライアント初期化（コンテナ内で共有）
+# DYNAMODB_EMULATOR=1 の場合はインメモリのエミュレータを使う（ローカルの負荷試験用）
+# 一括処理では複数スレッドから並列に呼び出すため、コネクションプールを並列数以上にする
+if os.environ.get('DYNAMODB_EMULATOR') == '1':
+    from common.emulator import EmulatedClient
+    client = EmulatedClient()
+else:
+    client = botocore.session.get_session().create_client(
+        'dynamodb',
+        config=Config(max_pool_connections=int(os.environ.get('DDB_MAX_POOL_CONNECTIONS', '25')))
+    )
+
+class ConditionFailedError(Exception):
+    """
+    条件付き書き込みの条件を満たさなかった（item は失敗時点のアイテム。存在しない場合はNone）
+
+    transact_write の場合、index は条件を満たさなかったアクションの位置。
+    """
+
+    def __init__(self, message: str, item: Optional[Dict] = None, index: Optional[int] = None):
+        super().__init__(message)
+        self.item = item
+        self.index = index
+
+class UnprocessedItemsError(Exception):
+    """BatchWriteItemの未処理アイテムが再試行後も残った"""
+
+# アクセスパターンごとの事前生成済みQueryパラメータ（:pk は呼び出し時に設定）
+QUERY_PATTERNS = {
+    # パーティション内の全アイテム（ポインタ・ジョブ等を含む）
+    'PARTITION': {
+        'KeyConditionExpression': 'PK = :pk',
+        'ExpressionAttributeValues': {}
+    },
+    # メインテーブル・作成日順（タスク以外のアイテムは除外）
+    'TABLE': {
+        'KeyConditionExpression': 'PK = :pk AND begins_with(SK, :sk)',
+        'ExpressionAttributeValues': {':sk': {'S': 'TODO#'}}
+    },
+    # 期限順
+    'GSI1': {
+        'IndexName': 'GSI1',
+        'KeyConditionExpression': 'GSI1PK = :pk',
+        'ExpressionAttributeValues': {}
+    },
+    # ステータス別・期限順
+    'GSI2': {
+        'IndexName': 'GSI2',
+        'KeyConditionExpression': 'GSI2PK = :pk',
+        'ExpressionAttributeValues': {}
+    },
+    # 期限の範囲（:from / :to はGSI1SKの値。build_due_range で生成）
+    'GSI1_DUE_RANGE': {
+        'IndexName': 'GSI1',
+        'KeyConditionExpression': 'GSI1PK = :pk AND GSI1SK BETWEEN :from AND :to',
+        'ExpressionAttributeValues': {}
+    },
+    # ステータス別・期限の範囲
+    'GSI2_DUE_RANGE': {
+        'IndexName': 'GSI2',
+        'KeyConditionExpression': 'GSI2PK = :pk AND GSI1SK BETWEEN :from AND :to',
+        'ExpressionAttributeValues': {}
+    },
+    # ステータス別・期限が :before より前（期限切れ。build_due_before で生成）
+    'GSI2_DUE_BEFORE': {
+        'IndexName': 'GSI2',
+        'KeyConditionExpression': 'GSI2PK = :pk AND GSI1SK < :before',
+        'ExpressionAttributeValues': {}
+    },
+    # 優先度順・同じ優先度は期限順（GSI5SK: PRIO#{rank}#DUE#{dueDate}）
+    'GSI5': {
+        'IndexName': 'GSI5',
+        'KeyConditionExpression': 'GSI1PK = :pk',
+        'ExpressionAttributeValues': {}
+    },
+    # 1つの優先度・期限の範囲（:from / :to はGSI5SKの値。build_priority_range で生成）
+    'GSI5_RANGE': {
+        'IndexName': 'GSI5',
+        'KeyConditionExpression': 'GSI1PK = :pk AND GSI5SK BETWEEN :from AND :to',
+        'ExpressionAttributeValues': {}
+    },
+    # ステータス別・作成日順
+    'GSI3': {
+        'IndexName': 'GSI3',
+        'KeyConditionExpression': 'GSI2PK = :pk',
+        'ExpressionAttributeValues': {}
+    },
+    # 変更順（:from より後に更新・削除されたタスク）
+    'CHANGES': {
+        'IndexName': 'GSI4',
+        'KeyConditionExpression': 'GSI1PK = :pk AND updatedAt > :from',
+        'ExpressionAttributeValues': {}
+    },
+    # 検索のポスティング（:prefix は SEARCH#{gram}。common.search で生成）
+    'SEARCH': {
+        'KeyConditionExpression': 'PK = :pk AND begins_with(SK, :prefix)',
+        'ExpressionAttributeValues': {}
+    },
+}
+
+# 書き込み条件
+ITEM_EXISTS = 'attribute_exists(PK)'
+ITEM_NOT_EXISTS = 'attribute_not_exists(PK)'
+
+# BatchWriteItem 1回あたりの上限と、UnprocessedItemsの再試行（指数バックオフ＋ジッター）
+BATCH_WRITE_SIZE = 25
+BATCH_MAX_ATTEMPTS = 8
+BATCH_BACKOFF_BASE = 0.05
+BATCH_BACKOFF_MAX = 2.0
+# TransactWriteItems 1回のアクション数の上限
+TRANSACT_WRITE_SIZE = 100
+# BatchGetItem 1回あたりのキー数の上限
+BATCH_GET_SIZE = 100
+
+def _serialize_value(value: Any) -> Dict:
+    """Pythonの値をDynamoDBの属性値に変換（文字列以外の型）"""
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, (int, Decimal)):
+        return {'N': str(value)}
+    if isinstance(value, float):
+        return {'N': str(Decimal(str(value)))}
+    if isinstance(value, (bytes, bytearray)):
+        return {'B': bytes(value)}
+    if isinstance(value, dict):
+        return {'M': {k: _serialize_value(v) for k, v in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'L': [_serialize_value(v) for v in value]}
+    if isinstance(value, (set, frozenset)):
+        if all(isinstance(v, str) for v in value):
+            return {'SS': list(value)}
+        if all(isinstance(v, (int, Decimal)) and not isinstance(v, bool) for v in value):
+            return {'NS': [str(v) for v in value]}
+        return {'BS': [bytes(v) for v in value]}
+    raise TypeError(f'Unsupported type for DynamoDB: {type(value).__name__}')
+
+def _deserialize_value(value: Dict) -> Any:
+    """DynamoDBの属性値をPythonの値に変換（文字列以外の型）"""
+    (type_code, data), = value.items()
+    if type_code == 'S':
+        return data
+    if type_code == 'N':
+        return Decimal(data)
+    if type_code == 'BOOL':
+        return data
+    if type_code == 'NULL':
+        return None
+    if type_code == 'M':
+        return {k: _deserialize_value(v) for k, v in data.items()}
+    if type_code == 'L':
+        return [_deserialize_value(v) for v in data]
+    if type_code == 'SS':
+        return set(data)
+    if type_code == 'NS':
+        return {Decimal(v) for v in data}
+    if type_code == 'B':
+        return data
+    if type_code == 'BS':
+        return set(data)
+    raise TypeError(f'Unsupported DynamoDB type: {type_code}')
+
+def serialize_item(item: Dict) -> Dict:
+    """アイテムをDynamoDB形式に変換（タスクの属性はすべて文字列のため高速パスを優先）"""
+    result = {}
+    for name, value in item.items():
+        if type(value) is str:
+            result[name] = {'S': value}
+        else:
+            result[name] = _serialize_value(value)
+    return result
+
+def deserialize_item(raw: Dict) -> Dict:
+    """DynamoDB形式のアイテムをdictに変換（文字列属性は高速パス）"""
+    result = {}
+    for name, value in raw.items():
+        s = value.get('S')
+        result[name] = s if s is not None else _deserialize_value(value)
+    return result
+
+@lru_cache(maxsize=64)
+def _render_update_expression(fields: Tuple[str, ...], add_fields: Tuple[str, ...] = ()) -> Tuple[str, Dict]:
+    """SET句（とADD句）を属性名の組み合わせごとに一度だけ生成"""
+    clauses = []
+    if fields:
+        clauses.append('SET ' + ', '.join(f'#{name} = :{name}' for name in fields))
+    if add_fields:
+        clauses.append('ADD ' + ', '.join(f'#{name} :{name}' for name in add_fields))
+    names = {f'#{name}': name for name in fields + add_fields}
+    return ' '.join(clauses), names
+
+@lru_cache(maxsize=64)
+def _render_projection(attributes: Tuple[str, ...]) -> Tuple[str, Dict]:
+    """ProjectionExpressionを属性名の組み合わせごとに一度だけ生成（status等の予約語もプレースホルダで指定）"""
+    return ', '.join(f'#{name}' for name in attributes), {f'#{name}': name for name in attributes}
+
+# 条件式中の属性名のプレースホルダ（#name は属性 name を指す）
+_NAME_PLACEHOLDER_RE = re.compile(r'#(\w+)')
+
+def _call(operation, params: Dict) -> Dict:
+    """DynamoDB呼び出し（回数・レイテンシ・消費キャパシティを記録）"""
+    params['ReturnConsumedCapacity'] = 'INDEXES'
+    started = time.perf_counter()
+    response = None
+    try:
+        response = operation(**params)
+        return response
+    finally:
+        latency_ms = (time.perf_counter() - started) * 1000
+        metrics.record_dynamodb_call(latency_ms)
+        consumed = response.get('ConsumedCapacity') if response else None
+        capacity.record(operation.__name__, consumed, latency_ms, params)
+
+def _raise_condition_failed(e: ClientError):
+    if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+        raw = e.response.get('Item')
+        raise ConditionFailedError(str(e), deserialize_item(raw) if raw else None) from e
+    raise e
+
+def _add_condition(params: Dict, condition: Optional[str], condition_values: Optional[Dict]):
+    """条件式を設定（失敗時は読み直さずに済むよう、その時点のアイテムを返させる）"""
+    if not condition:
+        return
+    params['ConditionExpression'] = condition
+    params['ReturnValuesOnConditionCheckFailure'] = 'ALL_OLD'
+    names = {f'#{name}': name for name in _NAME_PLACEHOLDER_RE.findall(condition)}
+    if names:
+        params.setdefault('ExpressionAttributeNames', {}).update(names)
+    if condition_values:
+        params.setdefault('ExpressionAttributeValues', {}).update(serialize_item(condition_values))
+
+def _put_params(item: Dict, condition: Optional[str], condition_values: Optional[Dict]) -> Dict:
+    params = {'TableName': TABLE_NAME, 'Item': serialize_item(item)}
+    _add_condition(params, condition, condition_values)
+    return params
+
+def _update_params(key: Dict, changes: Dict, condition: Optional[str], condition_values: Optional[Dict],
+                   add: Optional[Dict]) -> Dict:
+    fields = tuple(sorted(changes))
+    add = add or {}
+    add_fields = tuple(sorted(add))
+    update_expression, names = _render_update_expression(fields, add_fields)
+
+    values = {f':{name}': _serialize_value(changes[name]) for name in fields}
+    values.update({f':{name}': _serialize_value(add[name]) for name in add_fields})
+    params = {
+        'TableName': TABLE_NAME,
+        'Key': serialize_item(key),
+        'UpdateExpression': update_expression,
+        'ExpressionAttributeNames': dict(names),
+        'ExpressionAttributeValues': values
+    }
+    _add_condition(params, condition, condition_values)
+    return params
+
+def _delete_params(key: Dict, condition: Optional[str], condition_values: Optional[Dict]) -> Dict:
+    params = {'TableName': TABLE_NAME, 'Key': serialize_item(key)}
+    _add_condition(params, condition, condition_values)
+    return params
+
+def get_item(key: Dict, projection: Optional[str] = None, consistent: bool = False) -> Optional[Dict]:
+    """GetItem（存在しない場合はNone）"""
+    params = {'TableName': TABLE_NAME, 'Key': serialize_item(key)}
+    if projection:
+        params['ProjectionExpression'] = projection
+    if consistent:
+        params['ConsistentRead'] = True
+
+    response = _call(client.get_item, params)
+    raw = response.get('Item')
+    return deserialize_item(raw) if raw else None
+
+def put_item(item: Dict, condition: Optional[str] = None, condition_values: Optional[Dict] = None):
+    """
+    PutItem
+
+    Args:
+        condition_values: 条件式のプレースホルダの値（例: {':now': 1700000000}）
+
+    Raises:
+        ConditionFailedError: conditionを満たさない場合
+    """
+    try:
+        _call(client.put_item, _put_params(item, condition, condition_values))
+    except ClientError as e:
+        _raise_condition_failed(e)
+
+def update_item(key: Dict, changes: Dict, condition: Optional[str] = ITEM_EXISTS,
+                condition_values: Optional[Dict] = None, add: Optional[Dict] = None) -> Dict:
+    """
+    指定した属性をSETするUpdateItem
+
+    Args:
+        condition_values: 条件式のプレースホルダの値（SETの値と重ならない名前にする）
+        add: 数値属性への加算（ADD。属性がなければ0から。例: {'version': 1}）
+
+    Returns:
+        dict: 更新後のアイテム（ALL_NEW）
+
+    Raises:
+        ConditionFailedError: conditionを満たさない場合（既定はアイテムが存在しない場合）
+    """
+    params = _update_params(key, changes, condition, condition_values, add)
+    params['ReturnValues'] = 'ALL_NEW'
+
+    try:
+        response = _call(client.update_item, params)
+    except ClientError as e:
+        _raise_condition_failed(e)
+
+    return deserialize_item(response['Attributes'])
+
+def delete_item(key: Dict, condition: Optional[str] = None, condition_values: Optional[Dict] = None):
+    """
+    DeleteItem
+
+    Raises:
+        ConditionFailedError: conditionを満たさない場合
+    """
+    try:
+        _call(client.delete_item, _delete_params(key, condition, condition_values))
+    except ClientError as e:
+        _raise_condition_failed(e)
+
+def delete_returning(key: Dict, condition: Optional[str] = None,
+                     condition_values: Optional[Dict] = None) -> Tuple[Optional[Dict], float]:
+    """
+    削除前のアイテムを返すDeleteItem（ReturnValues=ALL_OLD。書き込みのコストは delete_item と同じ）
+
+    Returns:
+        tuple: (削除前のアイテム（存在しなかった場合はNone）, 消費した書き込みキャパシティ（GSIを含む合計WCU）)
+
+    Raises:
+        ConditionFailedError: conditionを満たさない場合
+    """
+    params = _delete_params(key, condition, condition_values)
+    params['ReturnValues'] = 'ALL_OLD'
+
+    try:
+        response = _call(client.delete_item, params)
+    except ClientError as e:
+        _raise_condition_failed(e)
+
+    raw = response.get('Attributes')
+    units = (response.get('ConsumedCapacity') or {}).get('CapacityUnits', 0)
+    return (deserialize_item(raw) if raw else None), units
+
+def put_action(item: Dict, condition: Optional[str] = None, condition_values: Optional[Dict] = None) -> Dict:
+    """transact_write のPut（引数は put_item と同じ）"""
+    return {'Put': _put_params(item, condition, condition_values)}
+
+def update_action(key: Dict, changes: Dict, condition: Optional[str] = ITEM_EXISTS,
+                  condition_values: Optional[Dict] = None, add: Optional[Dict] = None) -> Dict:
+    """transact_write のUpdate（引数は update_item と同じ。changesは空でもよい）"""
+    return {'Update': _update_params(key, changes, condition, condition_values, add)}
+
+def delete_action(key: Dict, condition: Optional[str] = None, condition_values: Optional[Dict] = None) -> Dict:
+    """transact_write のDelete（引数は delete_item と同じ）"""
+    return {'Delete': _delete_params(key, condition, condition_values)}
+
+def transact_write(actions: List[Dict]) -> float:
+    """
+    TransactWriteItemsで最大100件のアクション（put_action / update_action / delete_action）を
+    すべて適用するか、1件も適用しない
+
+    再送時の重複適用はbotocoreが自動で付けるClientRequestTokenで防がれる。
+
+    Returns:
+        float: 消費した書き込みキャパシティ（GSIを含む合計WCU）
+
+    Raises:
+        ConditionFailedError: いずれかのアクションの条件を満たさない場合（index で位置がわかる）
+    """
+    if len(actions) > TRANSACT_WRITE_SIZE:
+        raise ValueError(f'transact_write accepts at most {TRANSACT_WRITE_SIZE} actions')
+
+    try:
+        response = _call(client.transact_write_items, {'TransactItems': list(actions)})
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'TransactionCanceledException':
+            for index, reason in enumerate(e.response.get('CancellationReasons') or []):
+                if reason.get('Code') == 'ConditionalCheckFailed':
+                    raw = reason.get('Item')
+                    raise ConditionFailedError(str(e), deserialize_item(raw) if raw else None, index) from e
+        raise
+    return sum(c.get('CapacityUnits', 0) for c in response.get('ConsumedCapacity') or [])
+
+def _query_params(pattern: str, pk: str, values: Optional[Dict]) -> Dict:
+    template = QUERY_PATTERNS[pattern]
+    params = dict(template)
+    params['TableName'] = TABLE_NAME
+    params['ExpressionAttributeValues'] = dict(template['ExpressionAttributeValues'], **{':pk': {'S': pk}})
+    if values:
+        params['ExpressionAttributeValues'].update(serialize_item(values))
+    return params
+
+def query(pattern: str, pk: str, limit: int, forward: bool = True,
+          start_key: Optional[Dict] = None, values: Optional[Dict] = None,
+          consistent: bool = False, attributes: Optional[Tuple[str, ...]] = None) -> Tuple[List[Dict], Optional[Dict]]:
+    """
+    事前生成済みのアクセスパターンで1ページ分Query
+
+    Args:
+        pattern: QUERY_PATTERNSのキー（TABLE / GSI1 / GSI2 / GSI3 / *_DUE_RANGE / GSI2_DUE_BEFORE / CHANGES / SEARCH）
+        pk: パーティションキーの値
+        start_key: 前ページのLastEvaluatedKey（dict形式）
+        values: :pk 以外のプレースホルダの値（例: {':from': ..., ':to': ...}）
+        consistent: 強い整合性で読む（メインテーブルのパターンのみ）
+        attributes: 返す属性（ProjectionExpression。Noneはすべて）。消費RCUは変わらず、
+            転送量と変換のコストが減る。GSIでは射影に含まれる属性のみ指定できる
+
+    Returns:
+        tuple: (アイテムのリスト, LastEvaluatedKey（最終ページはNone）)
+    """
+    params = _query_params(pattern, pk, values)
+    params['Limit'] = limit
+    if attributes:
+        expression, names = _render_projection(attributes)
+        params['ProjectionExpression'] = expression
+        params['ExpressionAttributeNames'] = dict(names)
+    params['ScanIndexForward'] = forward
+    if start_key:
+        params['ExclusiveStartKey'] = serialize_item(start_key)
+    if consistent:
+        params['ConsistentRead'] = True
+
+    response = _call(client.query, params)
+    # 読み込んだ件数（FilterExpression適用前）。返却件数との差が読み捨て
+    metrics.increment('ItemsRead', response.get('ScannedCount', 0))
+    items = [deserialize_item(raw) for raw in response.get('Items', [])]
+    last_key = response.get('LastEvaluatedKey')
+    return items, deserialize_item(last_key) if last_key else None
+
+def count(pattern: str, pk: str, values: Optional[Dict] = None) -> int:
+    """
+    アクセスパターンに一致するアイテム数（Select=COUNT。アイテムは返さないが、
+    読み込んだサイズ分のRCUは消費する。1MBごとのページをすべて読む）
+    """
+    params = _query_params(pattern, pk, values)
+    params['Select'] = 'COUNT'
+    total = 0
+    while True:
+        response = _call(client.query, params)
+        metrics.increment('ItemsRead', response.get('ScannedCount', 0))
+        total += response.get('Count', 0)
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return total
+        params['ExclusiveStartKey'] = last_key
+
+def batch_write(delete_keys: List[Dict] = (), put_items: List[Dict] = ()) -> float:
+    """
+    BatchWriteItemで合計最大25件を削除・作成（UnprocessedItemsはバックオフしながら再送）
+
+    Returns:
+        float: 消費した書き込みキャパシティ（GSIを含む合計WCU）
+
+    Raises:
+        UnprocessedItemsError: BATCH_MAX_ATTEMPTS回の再試行後も未処理が残った場合
+    """
+    if len(delete_keys) + len(put_items) > BATCH_WRITE_SIZE:
+        raise ValueError(f'batch_write accepts at most {BATCH_WRITE_SIZE} requests')
+
+    requests = [{'DeleteRequest': {'Key': serialize_item(key)}} for key in delete_keys]
+    requests += [{'PutRequest': {'Item': serialize_item(item)}} for item in put_items]
+    units = 0.0
+    for attempt in range(BATCH_MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(random.uniform(0, min(BATCH_BACKOFF_MAX, BATCH_BACKOFF_BASE * 2 ** attempt)))
+        response = _call(client.batch_write_item, {'RequestItems': {TABLE_NAME: requests}})
+        units += sum(c.get('CapacityUnits', 0) for c in response.get('ConsumedCapacity') or [])
+        requests = (response.get('UnprocessedItems') or {}).get(TABLE_NAME)
+        if not requests:
+            return units
+        metrics.increment('UnprocessedItems', len(requests))
+
+    raise UnprocessedItemsError(f'{len(requests)} items left unprocessed after {BATCH_MAX_ATTEMPTS} attempts')
+
+def batch_get(keys: List[Dict], attributes: Optional[Tuple[str, ...]] = None) -> List[Dict]:
+    """
+    BatchGetItemで複数のアイテムを取得（BATCH_GET_SIZE件ずつ。UnprocessedKeysはバックオフしながら再送）
+
+    存在しないキーは結果に含まれない。順序はキーの順とは限らない。
+
+    Args:
+        attributes: 返す属性（ProjectionExpression。Noneはすべて）
+
+    Raises:
+        UnprocessedItemsError: BATCH_MAX_ATTEMPTS回の再試行後も未処理が残った場合
+    """
+    request = {}
+    if attributes:
+        expression, names = _render_projection(attributes)
+        request['ProjectionExpression'] = expression
+        request['ExpressionAttributeNames'] = dict(names)
+
+    items = []
+    for start in range(0, len(keys), BATCH_GET_SIZE):
+        pending = dict(request, Keys=[serialize_item(key) for key in keys[start:start + BATCH_GET_SIZE]])
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            if attempt:
+                time.sleep(random.uniform(0, min(BATCH_BACKOFF_MAX, BATCH_BACKOFF_BASE * 2 ** attempt)))
+            response = _call(client.batch_get_item, {'RequestItems': {TABLE_NAME: pending}})
+            items.extend(deserialize_item(raw) for raw in response.get('Responses', {}).get(TABLE_NAME, []))
+            pending = (response.get('UnprocessedKeys') or {}).get(TABLE_NAME)
+            if not pending:
+                break
+            metrics.increment('UnprocessedItems', len(pending['Keys']))
+        else:
+            raise UnprocessedItemsError(f"{len(pending['Keys'])} keys left unprocessed after {BATCH_MAX_ATTEMPTS} attempts")
+    return items
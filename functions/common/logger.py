@@ -0,0 +1,138 @@
+"""
+構造化ログ（1行1JSON）
+
+- LOG_LEVEL（DEBUG / INFO / WARNING / ERROR）未満のログは書式化せずに捨てる
+- メッセージは logger.info('msg %s', value) の形式で渡し、出力する場合のみ書式化する
+- log_request で包んだハンドラは、リクエストごとに1行のサマリ（ルート・ユーザー・
+  ステータス・レイテンシと append_keys で追加した項目）を出力する
+- LOG_DEBUG_SAMPLE_RATE の割合のリクエストは LOG_LEVEL に関係なくDEBUGログも出力する
+- payload に渡した値はトークン・認証ヘッダー等を伏せてから出力する
+"""
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import sys
+import time
+import traceback
+from typing import Any
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+LOG_LEVEL = LEVELS.get(os.environ.get('LOG_LEVEL', 'INFO').upper(), LEVELS['INFO'])
+DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', '0'))
+
+REDACTED = '[REDACTED]'
+# 値を伏せるキー（ヘッダー名・クエリパラメータ名など）
+SENSITIVE_KEY_RE = re.compile(r'token|authorization|cookie|password|secret', re.IGNORECASE)
+# 文字列中のJWT
+JWT_RE = re.compile(r'eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*')
+
+# リクエスト単位の状態（level / requestId / fields）
+# スレッドごとに独立し、contextvars.copy_context() で並列処理のワーカーにも引き継げる
+_request = contextvars.ContextVar('log_request', default=None)
+
+def redact(value: Any) -> Any:
+    """機密情報を伏せたコピーを返す"""
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if v is not None and SENSITIVE_KEY_RE.search(k) else redact(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(v) for v in value]
+    if isinstance(value, str) and 'eyJ' in value:
+        return JWT_RE.sub(REDACTED, value)
+    return value
+
+def _threshold() -> int:
+    request = _request.get()
+    return request['level'] if request is not None else LOG_LEVEL
+
+def is_enabled(level: str) -> bool:
+    """指定したレベルのログが出力されるか（出力用の値の計算を省く場合に使う）"""
+    return LEVELS[level] >= _threshold()
+
+def _emit(level: str, message: str, fields: dict):
+    record = {'level': level, 'message': message}
+    request = _request.get()
+    if request is not None and request['requestId']:
+        record['requestId'] = request['requestId']
+    record.update(fields)
+    sys.stdout.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+def _log(level: str, msg: str, args: tuple, fields: dict):
+    if LEVELS[level] < _threshold():
+        return
+    message = msg % args if args else msg
+    if 'payload' in fields:
+        fields = dict(fields, payload=redact(fields['payload']))
+    _emit(level, message, fields)
+
+def debug(msg: str, *args, **fields):
+    _log('DEBUG', msg, args, fields)
+
+def info(msg: str, *args, **fields):
+    _log('INFO', msg, args, fields)
+
+def warning(msg: str, *args, **fields):
+    _log('WARNING', msg, args, fields)
+
+def error(msg: str, *args, **fields):
+    _log('ERROR', msg, args, fields)
+
+def exception(msg: str, *args, **fields):
+    """ERRORログにスタックトレースを付けて出力（except節の中で呼ぶ）"""
+    if is_enabled('ERROR'):
+        fields['error'] = traceback.format_exc()
+    _log('ERROR', msg, args, fields)
+
+def route_of(event: dict) -> str:
+    """ルート（API Gatewayは 'メソッド リソース'、DynamoDB Streams等のイベントはイベントソース）"""
+    if 'httpMethod' in event:
+        return f"{event.get('httpMethod')} {event.get('resource')}"
+    records = event.get('Records') or [{}]
+    return records[0].get('eventSource') or 'unknown'
+
+def append_keys(**fields):
+    """リクエストのサマリ行に項目を追加（件数など）"""
+    request = _request.get()
+    if request is not None:
+        request['fields'].update(fields)
+
+def log_request(handler):
+    """ハンドラを包み、リクエストごとに1行のサマリを出力するデコレータ"""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        sampled = DEBUG_SAMPLE_RATE > 0 and random.random() < DEBUG_SAMPLE_RATE
+        request = {
+            'level': LEVELS['DEBUG'] if sampled else LOG_LEVEL,
+            'requestId': getattr(context, 'aws_request_id', None),
+            'fields': {},
+        }
+        token = _request.set(request)
+
+        started = time.perf_counter()
+        status = None
+        try:
+            response = handler(event, context)
+            status = response.get('statusCode')
+            return response
+        finally:
+            if is_enabled('INFO'):
+                claims = ((event.get('requestContext') or {}).get('authorizer') or {}).get('claims') or {}
+                summary = {
+                    'route': route_of(event),
+                    'user': claims.get('sub'),
+                    'statusCode': status,
+                    'latencyMs': round((time.perf_counter() - started) * 1000, 3),
+                }
+                if sampled:
+                    summary['debugSampled'] = True
+                summary.update(request['fields'])
+                _emit('INFO', 'request', summary)
+            _request.reset(token)
+
+    return wrapper
@@ -0,0 +1,143 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import botocore.session
+from botocore.exceptions import BotoCoreError, ClientError
+
+from common import logger
+
+# 1ページあたりの件数
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+_SIGNATURE_BYTES = 16
+
+# トークン署名用のシークレット（Secrets Manager のARNか名前）。環境変数に値を置かず、実行時に取得する。
+# 未設定の場合は PAGE_TOKEN_SECRET の値を使う（ローカル実行・テスト）
+SECRET_ID = os.environ.get('PAGE_TOKEN_SECRET_ARN')
+# 取得したシークレットを使い回す秒数（ローテーション後、この時間内に新しいシークレットで署名し始める）
+SECRET_TTL_SECONDS = int(os.environ.get('PAGE_TOKEN_SECRET_TTL_SECONDS', '300'))
+
+# 取得済みのシークレット（コンテナ内で共有）と再取得する時刻（time.monotonic()基準）
+_secrets = {'values': None, 'refreshAt': 0.0}
+_secrets_client = None
+
+def _fetch_secrets() -> List[bytes]:
+    """
+    Secrets Manager から現在（AWSCURRENT）と1つ前（AWSPREVIOUS）のシークレットを取得
+
+    1つ前のシークレットは、ローテーションの前に発行したトークンの検証だけに使う。
+    """
+    global _secrets_client
+    if _secrets_client is None:
+        _secrets_client = botocore.session.get_session().create_client('secretsmanager')
+    values = [_secrets_client.get_secret_value(SecretId=SECRET_ID)['SecretString'].encode('utf-8')]
+    try:
+        previous = _secrets_client.get_secret_value(SecretId=SECRET_ID, VersionStage='AWSPREVIOUS')
+        values.append(previous['SecretString'].encode('utf-8'))
+    except ClientError as e:
+        # ローテーションしていないシークレットには AWSPREVIOUS がない
+        if e.response['Error']['Code'] != 'ResourceNotFoundException':
+            raise
+    return values
+
+def _get_secrets() -> List[bytes]:
+    """
+    トークン署名用のシークレット（先頭が署名に使う現在のもの。以降は検証のみに使う）
+
+    最初のトークンの署名・検証で取得し、SECRET_TTL_SECONDS ごとに取得し直す。
+    取得し直しに失敗した場合は、取得済みのシークレットを使い続ける。
+    """
+    if not SECRET_ID:
+        secret = os.environ.get('PAGE_TOKEN_SECRET')
+        if not secret:
+            raise RuntimeError('PAGE_TOKEN_SECRET_ARN or PAGE_TOKEN_SECRET is not configured')
+        return [secret.encode('utf-8')]
+
+    now = time.monotonic()
+    if _secrets['values'] is None or now >= _secrets['refreshAt']:
+        try:
+            _secrets['values'] = _fetch_secrets()
+        except (BotoCoreError, ClientError) as e:
+            if _secrets['values'] is None:
+                raise
+            logger.warning('Page token secret refresh failed: %s', e)
+        _secrets['refreshAt'] = now + SECRET_TTL_SECONDS
+    return _secrets['values']
+
+def _sign(payload: bytes, secret: bytes) -> bytes:
+    return hmac.new(secret, payload, hashlib.sha256).digest()[:_SIGNATURE_BYTES]
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+def _shape_digest(shape: Dict) -> str:
+    """クエリの形（ユーザー・インデックス・フィルタ等）のダイジェストを生成"""
+    canonical = json.dumps(shape, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+def parse_page_size(value: Optional[str]) -> int:
+    """
+    limitパラメータを検証
+
+    Raises:
+        ValueError: 1〜MAX_PAGE_SIZEの整数でない場合
+    """
+    if value is None or value == '':
+        return DEFAULT_PAGE_SIZE
+
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+
+    return limit
+
+def encode_page_token(last_evaluated_key: Dict, shape: Dict) -> str:
+    """
+    LastEvaluatedKeyとクエリの形から署名付きの不透明なnextTokenを生成
+
+    Args:
+        last_evaluated_key: DynamoDB QueryのLastEvaluatedKey
+        shape: ページ間で変わってはいけないクエリ条件
+    """
+    payload = json.dumps(
+        {'k': last_evaluated_key, 's': _shape_digest(shape)},
+        separators=(',', ':'), ensure_ascii=False
+    ).encode('utf-8')
+    signature = _sign(payload, _get_secrets()[0])
+    return f"{_b64encode(payload)}.{_b64encode(signature)}"
+
+def decode_page_token(token: str, shape: Dict) -> Dict:
+    """
+    nextTokenを検証してExclusiveStartKeyを復元
+
+    Raises:
+        ValueError: 改ざん・形式不正、またはクエリ条件が発行時と異なる場合
+    """
+    try:
+        encoded_payload, encoded_signature = token.split('.')
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except (ValueError, AttributeError):
+        raise ValueError('Invalid nextToken')
+
+    if not any(hmac.compare_digest(signature, _sign(payload, secret)) for secret in _get_secrets()):
+        raise ValueError('Invalid nextToken')
+
+    data = json.loads(payload)
+    if data.get('s') != _shape_digest(shape):
+        raise ValueError('nextToken does not match the query parameters')
+
+    return data['k']
@@ -0,0 +1,97 @@
+"""
+レスポンスのJSONシリアライズ
+
+DynamoDBから読んだアイテムには標準のjsonで扱えない型が含まれる
+（数値は Decimal、セットは set、バイナリは bytes）。dumps はこれらを
+数値・ソート済みのリスト・base64文字列に変換する。
+
+orjson パッケージがある場合は orjson で書き出す（JSON_BACKEND=json で標準のjsonに固定）。
+どちらも区切りの空白なし・非ASCII文字はそのまま（UTF-8）で出力する。
+
+Projection はアイテムから公開する属性だけを取り出す変換で、属性の一覧から
+変換関数を作成時に1回だけ生成する（アイテムごとに属性の一覧を解釈しない）。
+比較は benchmarks/bench_serialization.py で計測する。
+"""
+import base64
+import json
+import os
+from decimal import Decimal
+from typing import Any, Callable, Dict, Sequence, Union
+
+try:
+    import orjson
+except ImportError:  # レイヤーに含めない場合は標準のjson
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None and os.environ.get('JSON_BACKEND') != 'json' else 'json'
+
+def default(value: Any) -> Any:
+    """標準のJSONにない型を変換（json.dumps / orjson.dumps の default）"""
+    if isinstance(value, Decimal):
+        # 整数の値は整数、それ以外は浮動小数点数（DynamoDBの数値は Decimal で返る）
+        if value == value.to_integral_value():
+            return int(value)
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        # 出力を毎回同じにするためソートする（DynamoDBのセットの要素は同じ型）
+        return sorted(value)
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def dumps_json(obj: Any) -> str:
+    """標準のjsonで書き出す"""
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default)
+
+def dumps_orjson(obj: Any) -> str:
+    """orjsonで書き出す（orjson がない場合は使えない）"""
+    return orjson.dumps(obj, default=default).decode('utf-8')
+
+# レスポンスのボディをJSON文字列にする（Decimal・set・bytesを含んでよい）
+dumps = dumps_orjson if BACKEND == 'orjson' else dumps_json
+
+class Projection:
+    """
+    アイテムから公開する属性だけを取り出してdictにする変換
+
+    例:
+        task = Projection(['taskId', ('description', '')], etag=build_etag)
+        task(item)  # {'taskId': ..., 'description': ...（なければ''）, 'etag': build_etag(item)}
+
+    Args:
+        fields: 属性名（必須。なければKeyError）、または (属性名, ない場合の値)
+        computed: 出力する名前 -> アイテムから値を計算する関数
+    """
+
+    def __init__(self, fields: Sequence[Union[str, tuple]], **computed: Callable[[Dict], Any]):
+        self.names = tuple(field if isinstance(field, str) else field[0] for field in fields) + tuple(computed)
+        self._project = self._compile(fields, computed)
+
+    @staticmethod
+    def _compile(fields, computed) -> Callable[[Dict], Dict]:
+        # 手書きのdictリテラルと同じコードを生成する（属性名は repr で埋め込み、
+        # 既定値と関数は名前空間経由で渡す）
+        namespace = {}
+        entries = []
+        for index, field in enumerate(fields):
+            if isinstance(field, str):
+                entries.append(f'{field!r}: item[{field!r}]')
+            else:
+                name, value = field
+                namespace[f'_default{index}'] = value
+                entries.append(f'{name!r}: item.get({name!r}, _default{index})')
+        for index, (name, function) in enumerate(computed.items()):
+            namespace[f'_computed{index}'] = function
+            entries.append(f'{name!r}: _computed{index}(item)')
+
+        source = 'def project(item):\n    return {' + ', '.join(entries) + '}\n'
+        exec(compile(source, '<projection>', 'exec'), namespace)
+        return namespace['project']
+
+    def __call__(self, item: Dict) -> Dict:
+        return self._project(item)
+
+    def many(self, items: Sequence[Dict]) -> list:
+        """複数のアイテムを変換"""
+        project = self._project
+        return [project(item) for item in items]
@@ -0,0 +1,123 @@
+"""
+ユーザーごとのタスク件数の集計（ステータス別・優先度別）
+
+ユーザーのパーティションに集計アイテム（SK: SUMMARY）を1つ置き、タスクの作成・
+ステータス/優先度の変更・削除と同じ TransactWriteItems で件数を ADD で増減する。
+更新・削除は読んだタスクのversionを条件に書き込むため、増減を求めたステータス/優先度のまま
+書き込まれる（間に変更があればトランザクション全体が失敗し、読み直して計算し直す）。
+件数の属性は {status}（例: PENDING）と {status}_{priority}（例: PENDING_HIGH）。
+GET /todos/summary はこのアイテムのGetItem 1回で答える。
+
+一括削除はタスクの削除をトランザクションにせず、25件ごとに削除前のアイテム（DeleteItem の ALL_OLD）から
+求めた差分を、進捗のチェックポイントと同じトランザクションでまとめて減算する。途中で失敗した場合などに実際の件数とずれたときは、
+recompute（scripts/repair_summary.py）でパーティションから数え直す。
+"""
+from typing import Dict, Optional
+
+from common import gateway
+from common.dynamodb_helper import build_pk, get_current_timestamp
+
+SUMMARY_SK = 'SUMMARY'
+STATUSES = ('PENDING', 'COMPLETED')
+PRIORITIES = ('HIGH', 'MEDIUM', 'LOW')
+# 集計アイテムの件数の属性名
+COUNTERS = STATUSES + tuple(f'{status}_{priority}' for status in STATUSES for priority in PRIORITIES)
+
+# 数え直しの間に件数が更新された場合の再試行回数
+RECOMPUTE_MAX_ATTEMPTS = 3
+
+def summary_key(user_id: str) -> Dict:
+    return {'PK': build_pk(user_id), 'SK': SUMMARY_SK}
+
+def counters(task: Optional[Dict]) -> Dict[str, int]:
+    """タスク1件が寄与する件数（Noneなら空）"""
+    if not task:
+        return {}
+    status = task['status']
+    return {status: 1, f"{status}_{task.get('priority', 'MEDIUM')}": 1}
+
+def delta(old: Optional[Dict], new: Optional[Dict]) -> Dict[str, int]:
+    """old（変更前のタスク、作成ならNone）から new（変更後、削除ならNone）への件数の増減（0は含めない）"""
+    changes = dict(counters(new))
+    for name, count in counters(old).items():
+        changes[name] = changes.get(name, 0) - count
+    return {name: count for name, count in changes.items() if count}
+
+def merge(total: Dict[str, int], changes: Dict[str, int]):
+    """増減をtotalに足し込む（一括処理で複数件をまとめる場合）"""
+    for name, count in changes.items():
+        total[name] = total.get(name, 0) + count
+
+def update_action(user_id: str, changes: Dict[str, int]) -> Dict:
+    """件数を増減する transact_write のアクション（集計アイテムがなければ0から）"""
+    return gateway.update_action(summary_key(user_id), {}, condition=None, add=dict(changes, revision=1))
+
+def apply(user_id: str, changes: Dict[str, int]):
+    """トランザクションの外で件数を増減（changesは実際に書き込んだアイテムから求める）"""
+    changes = {name: count for name, count in changes.items() if count}
+    if changes:
+        gateway.update_item(summary_key(user_id), {}, condition=None, add=dict(changes, revision=1))
+
+def read(user_id: str) -> Dict:
+    """
+    集計アイテムをレスポンスの形式で取得（強い整合性のGetItem 1回）
+
+    Returns:
+        dict: total、byStatus、byPriority、pendingByPriority
+    """
+    item = gateway.get_item(summary_key(user_id), consistent=True) or {}
+
+    def count(name):
+        # 件数のずれで負になった場合も0として返す（recomputeで修正する）
+        return max(0, int(item.get(name, 0)))
+
+    by_status = {status: count(status) for status in STATUSES}
+    return {
+        'total': sum(by_status.values()),
+        'byStatus': by_status,
+        'byPriority': {
+            priority: sum(count(f'{status}_{priority}') for status in STATUSES) for priority in PRIORITIES
+        },
+        'pendingByPriority': {priority: count(f'PENDING_{priority}') for priority in PRIORITIES},
+    }
+
+def count_tasks(user_id: str) -> Dict[str, int]:
+    """パーティションのタスクを強い整合性のQueryで数える（集計アイテムと同じ属性名）"""
+    totals = {}
+    start_key = None
+    while True:
+        items, start_key = gateway.query('TABLE', build_pk(user_id), 100, start_key=start_key, consistent=True)
+        for item in items:
+            merge(totals, counters(item))
+        if not start_key:
+            return totals
+
+def recompute(user_id: str) -> Dict[str, int]:
+    """
+    パーティションのタスクを数え直して集計アイテムを置き換える
+
+    数え直しの間に件数が更新された場合（revision が変わった場合）は最初からやり直す。
+
+    Returns:
+        dict: 数え直した件数
+    """
+    key = summary_key(user_id)
+    for _ in range(RECOMPUTE_MAX_ATTEMPTS):
+        current = gateway.get_item(key, consistent=True)
+        revision = int(current.get('revision', 0)) if current else None
+        totals = count_tasks(user_id)
+
+        if revision is None:
+            condition, values = gateway.ITEM_NOT_EXISTS, None
+        else:
+            condition, values = '#revision = :revision', {':revision': revision}
+        try:
+            gateway.put_item(
+                dict(key, revision=(revision or 0) + 1, recomputedAt=get_current_timestamp(), **totals),
+                condition=condition, condition_values=values
+            )
+            return totals
+        except gateway.ConditionFailedError:
+            continue
+
+    raise RuntimeError(f'Summary of {user_id} kept changing during recompute')
@@ -0,0 +1,105 @@
+"""
+ハンドラのテストの共通設定（DynamoDBはインメモリのエミュレータ）
+
+実行方法:
+    python -m pytest -q functions
+"""
+import base64
+import json
+import os
+
+import pytest
+
+# common をimportする前に設定する（テストでは本物のテーブルに接続しない）
+os.environ['DYNAMODB_EMULATOR'] = '1'
+os.environ.setdefault('TABLE_NAME', 'todo-test')
+os.environ.setdefault('PAGE_TOKEN_SECRET', 'test-secret')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+USER_ID = 'test-user-001'
+
+def build_event(method, resource, body=None, path_parameters=None, query=None, headers=None, base64_body=False):
+    """
+    API Gateway（RESTのLambdaプロキシ統合）のイベント
+
+    base64_body=True ではボディをbase64で渡す（BinaryMediaTypes に一致する Content-Type のリクエスト）
+    """
+    path = resource
+    for name, value in (path_parameters or {}).items():
+        path = path.replace('{' + name + '}', value)
+    raw = json.dumps(body, ensure_ascii=False) if body is not None else None
+    if raw is not None and base64_body:
+        raw = base64.b64encode(raw.encode('utf-8')).decode('ascii')
+    return {
+        'resource': resource,
+        'path': path,
+        'httpMethod': method,
+        'headers': dict({'Content-Type': 'application/json'}, **(headers or {})),
+        'queryStringParameters': query,
+        'pathParameters': path_parameters,
+        'body': raw,
+        'isBase64Encoded': raw is not None and base64_body,
+        'requestContext': {'resourcePath': resource, 'httpMethod': method},
+    }
+
+@pytest.fixture(autouse=True)
+def table():
+    """テストごとに空のテーブルから始める"""
+    from common import gateway
+    gateway.client.store.reset()
+    yield gateway.client.store
+
+@pytest.fixture
+def api():
+    """
+    ルーター経由でAPIを呼び出す関数
+
+    api(method, resource, body=None, path_parameters=None, query=None, headers=None, base64_body=False)
+    -> (ステータスコード, ボディ（JSON）, ヘッダー)
+    """
+    from router.app import lambda_handler
+
+    def call(method, resource, **kwargs):
+        response = lambda_handler(build_event(method, resource, **kwargs), None)
+        body = response.get('body')
+        return response['statusCode'], json.loads(body) if body else None, response.get('headers') or {}
+
+    return call
+
+@pytest.fixture
+def create_task(api):
+    """タスクを作成してレスポンスのタスクを返す関数"""
+
+    def create(title='task', priority='MEDIUM', due_date='2030-01-01', description=''):
+        status, body, _ = api('POST', '/todos', body={
+            'title': title, 'description': description, 'dueDate': due_date, 'priority': priority
+        })
+        assert status == 201, body
+        return body['todo']
+
+    return create
+
+@pytest.fixture
+def summary(api):
+    """GET /todos/summary のボディを返す関数"""
+
+    def read():
+        status, body, _ = api('GET', '/todos/summary')
+        assert status == 200, body
+        return body
+
+    return read
+
+@pytest.fixture
+def process_stream():
+    """テーブルのストリームのレコードをコンシューマ（process_task_changes）に渡す関数"""
+    from common import gateway
+    from process_task_changes.app import lambda_handler
+
+    def process():
+        records = gateway.client.drain_stream(TableName=os.environ['TABLE_NAME'])
+        for start in range(0, len(records), 100):
+            response = lambda_handler({'Records': records[start:start + 100]}, None)
+            assert response['batchItemFailures'] == []
+
+    return process
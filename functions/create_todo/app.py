@@ -1,116 +1,100 @@
 import json
-import uuid
-import os
-import boto3
-from datetime import datetime
-
-# DynamoDBクライアント
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['TABLE_NAME'])
+from common import capacity, compression, gateway, idempotency, logger, metrics, summary
+from common.capture import capture_event
+from common.dynamodb_helper import (
+    create_response, new_task_id, build_pk, build_sk, build_due_keys, build_status_pk, build_etag, task_response, list_version_action,
+    normalize_due_date
+)
 
+@logger.log_request
+@metrics.log_metrics
+@compression.compress_response
+@capacity.track_capacity
+@idempotency.idempotent
 def lambda_handler(event, context):
-    """タスク作成"""
+    """タスク作成（Idempotency-Key ヘッダー付きの再送は最初のレスポンスを返す）"""
     
-    print(f"Event: {json.dumps(event)}")
+    logger.debug('Event', payload=event)
+    capture_event(event)
     
     try:
         # リクエストボディ解析
         body = json.loads(event['body'])
-        print(f"Body: {body}")
+        logger.debug('Body', payload=body)
         
         # 必須フィールドチェック
         if 'title' not in body or not body['title']:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'title is required'})
-            }
+            return create_response(400, {'error': 'title is required'})
+        
+        # title・descriptionは文字列のみ（検索インデックスはテキストとして索引する）
+        if not isinstance(body['title'], str):
+            return create_response(400, {'error': 'title must be a string'})
+        
+        if not isinstance(body.get('description', ''), str):
+            return create_response(400, {'error': 'description must be a string'})
         
         if 'dueDate' not in body or not body['dueDate']:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'dueDate is required'})
-            }
+            return create_response(400, {'error': 'dueDate is required'})
         
         if 'priority' not in body or not body['priority']:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'priority is required'})
-            }
+            return create_response(400, {'error': 'priority is required'})
         
         # priorityチェック
         if body['priority'] not in ['HIGH', 'MEDIUM', 'LOW']:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'priority must be HIGH, MEDIUM, or LOW'})
-            }
+            return create_response(400, {'error': 'priority must be HIGH, MEDIUM, or LOW'})
+        
+        # dueDateをUTCの正規形にする（GSI1SKの文字列順を期限順と一致させる）
+        try:
+            due_date = normalize_due_date(body['dueDate'])
+        except ValueError as e:
+            return create_response(400, {'error': str(e)})
         
         # データ作成
         user_id = 'test-user-001'
-        task_id = str(uuid.uuid4())
-        current_time = datetime.utcnow().isoformat() + 'Z'
+        logger.append_keys(user=user_id)
+        # taskIdは作成時刻を内包し、taskIdだけからSKを復元できる
+        task_id, current_time = new_task_id()
         
         item = {
-            'PK': f'USER#{user_id}',
-            'SK': f'TODO#{current_time}#{task_id}',
-            'GSI1PK': f'USER#{user_id}',
-            'GSI1SK': f'DUE#{body["dueDate"]}#{body["priority"]}',
+            'PK': build_pk(user_id),
+            'SK': build_sk(task_id, current_time),
+            'GSI1PK': build_pk(user_id),
+            'GSI2PK': build_status_pk(user_id, 'PENDING'),
+            **build_due_keys(due_date, body['priority']),
             'taskId': task_id,
             'title': body['title'],
             'description': body.get('description', ''),
-            'dueDate': body['dueDate'],
+            'dueDate': due_date,
             'priority': body['priority'],
             'status': 'PENDING',
             'createdAt': current_time,
-            'updatedAt': current_time
+            'updatedAt': current_time,
+            'version': 1
         }
         
-        print(f"Saving: {json.dumps(item, default=str)}")
+        logger.debug('Saving', payload=item)
         
-        # DynamoDB保存
-        table.put_item(Item=item)
+        # レスポンス（Idempotency-Key の記録に書き込みと同時に保存するため先に作る）
+        response = create_response(
+            201,
+            {'message': 'Task created successfully', 'todo': task_response(item)},
+            headers={'Access-Control-Expose-Headers': 'ETag', 'ETag': build_etag(item)}
+        )
         
-        print("Success!")
+        # DynamoDB保存（件数の集計・一覧のバージョン・Idempotency-Key の記録も同じトランザクション）
+        idempotency.transact_write([
+            gateway.put_action(item),
+            summary.update_action(user_id, summary.delta(None, item)),
+            list_version_action(user_id)
+        ], response)
+        logger.append_keys(taskId=task_id)
         
-        # レスポンス
-        return {
-            'statusCode': 201,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'message': 'Task created successfully',
-                'todo': {
-                    'taskId': item['taskId'],
-                    'title': item['title'],
-                    'description': item['description'],
-                    'dueDate': item['dueDate'],
-                    'priority': item['priority'],
-                    'status': item['status'],
-                    'createdAt': item['createdAt'],
-                    'updatedAt': item['updatedAt']
-                }
-            }, ensure_ascii=False)
-        }
+        return response
         
     except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}")
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Invalid JSON'})
-        }
+        logger.warning('JSON decode error: %s', e)
+        return create_response(400, {'error': 'Invalid JSON'})
     
     except Exception as e:
-        print(f"Error: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Internal server error', 'details': str(e)})
-        }
\ No newline at end of file
+        logger.exception('Error: %s', e)
+        return create_response(500, {'error': 'Internal server error', 'details': str(e)})
\ No newline at end of file
@@ -0,0 +1,69 @@
+import pytest
+
+from common import gateway
+from create_todo import app
+
+BODY = {'title': 'Shopping', 'dueDate': '2030-01-01', 'priority': 'HIGH'}
+
+def list_tasks(api):
+    status, body, _ = api('GET', '/todos')
+    assert status == 200
+    return body['items']
+
+def test_retry_with_same_key_replays_first_response(api):
+    first = api('POST', '/todos', body=BODY, headers={'Idempotency-Key': 'k1'})
+    retry = api('POST', '/todos', body=BODY, headers={'idempotency-key': 'k1'})
+
+    assert first[0] == retry[0] == 201
+    assert retry[1] == first[1]
+    assert retry[2]['Idempotent-Replayed'] == 'true'
+    assert len(list_tasks(api)) == 1
+
+def test_key_reused_for_other_body_is_rejected(api):
+    api('POST', '/todos', body=BODY, headers={'Idempotency-Key': 'k1'})
+    status, _, _ = api('POST', '/todos', body=dict(BODY, title='Other'), headers={'Idempotency-Key': 'k1'})
+
+    assert status == 422
+    assert len(list_tasks(api)) == 1
+
+def test_failure_after_commit_still_replays(api, monkeypatch):
+    """書き込み後の処理が失敗しても記録を消さず、再送で二重に作成しない"""
+    def fail_after_commit(**keys):
+        if 'taskId' in keys:
+            raise RuntimeError('after commit')
+
+    monkeypatch.setattr(app.logger, 'append_keys', fail_after_commit)
+    first = api('POST', '/todos', body=BODY, headers={'Idempotency-Key': 'k1'})
+    monkeypatch.undo()
+    retry = api('POST', '/todos', body=BODY, headers={'Idempotency-Key': 'k1'})
+
+    assert first[0] == retry[0] == 201
+    assert retry[1] == first[1]
+    assert len(list_tasks(api)) == 1
+
+def test_failed_write_releases_key(api, monkeypatch):
+    def fail(actions):
+        raise RuntimeError('write failed')
+
+    monkeypatch.setattr(gateway, 'transact_write', fail)
+    status, _, _ = api('POST', '/todos', body=BODY, headers={'Idempotency-Key': 'k1'})
+    monkeypatch.undo()
+    assert status == 500
+
+    status, _, headers = api('POST', '/todos', body=BODY, headers={'Idempotency-Key': 'k1'})
+    assert status == 201
+    assert 'Idempotent-Replayed' not in headers
+    assert len(list_tasks(api)) == 1
+
+@pytest.mark.parametrize('key', ['', 'x' * 256])
+def test_invalid_key(api, key):
+    status, _, _ = api('POST', '/todos', body=BODY, headers={'Idempotency-Key': key})
+    assert status == 400
+
+@pytest.mark.parametrize('field, value', [('title', 123), ('title', ['a']), ('description', None), ('description', 5)])
+def test_non_string_text_is_rejected(api, field, value):
+    status, body, _ = api('POST', '/todos', body=dict(BODY, **{field: value}))
+
+    assert status == 400
+    assert body['error'] == f'{field} must be a string'
+    assert list_tasks(api) == []
@@ -1,88 +1,107 @@
-import json
-import os
-import boto3
-from boto3.dynamodb.conditions import Key
+from common import capacity, compression, gateway, logger, metrics, summary
+from common.capture import capture_event
+from common.dynamodb_helper import (
+    create_response, build_pk, build_task_ref_sk, created_at_from_task_id, resolve_task_key, build_etag, parse_if_match, version_condition,
+    build_tombstone, get_current_timestamp, list_version_action
+)
 
-# DynamoDBクライアント
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['TABLE_NAME'])
+# 読んだタスクが削除までに変更された場合の再試行回数
+MAX_ATTEMPTS = 3
 
-def find_task(user_id, task_id):
-    """taskIdからタスクを検索"""
-    try:
-        response = table.query(
-            KeyConditionExpression=Key('PK').eq(f'USER#{user_id}')
-        )
-        
-        for item in response.get('Items', []):
-            if item.get('taskId') == task_id:
-                return item
-        
-        return None
-    except Exception as e:
-        print(f"Error finding task: {e}")
-        return None
+def delete_task(user_id, task_id, key, expected_version):
+    """
+    タスクを読み、そのversionを条件に1つのトランザクションで削除
+
+    削除・件数の集計の減算・差分同期（GET /todos/changes）用のトゥームストーンの作成・
+    一覧のバージョンの加算・旧形式taskIdのポインタの削除を TransactWriteItems 1回で書き込む
+    （どれかが失敗すればどれも書き込まない）。versionの条件により status/priority も読んだ値の
+    ままのため、集計の減算は読んだアイテムから求める。間に別の更新があれば条件チェック失敗時に
+    返るアイテムで計算し直す（If-Matchを指定した場合は412）。
 
+    Returns:
+        tuple: 失敗した場合の理由（not_found / conflict、成功した場合はNone）とその時点のアイテム
+               （成功した場合は削除したアイテム）
+    """
+    current = gateway.get_item(key)
+    for _ in range(MAX_ATTEMPTS):
+        if not current:
+            return 'not_found', None
+        version = int(current.get('version', 0))
+        if expected_version is not None and version != expected_version:
+            return 'conflict', current
+
+        condition, condition_values = version_condition(version)
+        actions = [
+            gateway.delete_action(key, condition=condition, condition_values=condition_values),
+            gateway.put_action(build_tombstone(user_id, task_id, get_current_timestamp())),
+            summary.update_action(user_id, summary.delta(current, None)),
+            list_version_action(user_id)
+        ]
+        if not created_at_from_task_id(task_id):
+            actions.append(gateway.delete_action({'PK': build_pk(user_id), 'SK': build_task_ref_sk(task_id)}))
+        try:
+            gateway.transact_write(actions)
+            return None, current
+        except gateway.ConditionFailedError as e:
+            current = e.item
+
+    if not current:
+        return 'not_found', None
+    return 'conflict', current
+
+@logger.log_request
+@metrics.log_metrics
+@compression.compress_response
+@capacity.track_capacity
 def lambda_handler(event, context):
-    """タスク削除"""
+    """
+    タスク削除
+
+    If-Match ヘッダー（ETag）を指定した場合は、そのversionのときだけ削除する（異なれば412）。
+    """
     
-    print(f"Event: {json.dumps(event)}")
+    logger.debug('Event', payload=event)
+    capture_event(event)
     
     try:
         # パスパラメータからtaskId取得
         task_id = event.get('pathParameters', {}).get('taskId')
         if not task_id:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'taskId is required'})
-            }
+            return create_response(400, {'error': 'taskId is required'})
         
-        print(f"Delete taskId={task_id}")
+        logger.append_keys(taskId=task_id)
         
         # ユーザーID（固定）
         user_id = 'test-user-001'
         
-        # タスク検索
-        existing_task = find_task(user_id, task_id)
-        if not existing_task:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Task not found', 'taskId': task_id})
-            }
+        # 期待するversion（If-Match）
+        try:
+            expected_version = parse_if_match(event.get('headers'))
+        except ValueError as e:
+            return create_response(400, {'error': str(e)})
         
-        print(f"Found task: {existing_task['PK']}, {existing_task['SK']}")
+        # キー解決（パーティション全体のQueryは行わない）
+        key = resolve_task_key(user_id, task_id)
+        if not key:
+            return create_response(404, {'error': 'Task not found', 'taskId': task_id})
         
-        # DynamoDB削除
-        table.delete_item(
-            Key={
-                'PK': existing_task['PK'],
-                'SK': existing_task['SK']
-            }
-        )
+        logger.debug('Resolved key %s %s', key['PK'], key['SK'])
         
-        print("Delete successful!")
+        # DynamoDB削除（件数の集計・トゥームストーン・一覧のバージョン・旧形式taskIdのポインタと同じトランザクション）
+        reason, current = delete_task(user_id, task_id, key, expected_version)
+        if reason:
+            if reason == 'conflict':
+                logger.append_keys(conflict=True)
+                return create_response(
+                    412,
+                    {'error': 'Task was modified by another request', 'taskId': task_id},
+                    headers={'Access-Control-Expose-Headers': 'ETag', 'ETag': build_etag(current)}
+                )
+            return create_response(404, {'error': 'Task not found', 'taskId': task_id})
         
         # レスポンス
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'message': 'Task deleted successfully',
-                'taskId': task_id
-            })
-        }
+        return create_response(200, {'message': 'Task deleted successfully', 'taskId': task_id})
         
     except Exception as e:
-        print(f"Error: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Internal server error', 'details': str(e)})
-        }
\ No newline at end of file
+        logger.exception('Error: %s', e)
+        return create_response(500, {'error': 'Internal server error', 'details': str(e)})
\ No newline at end of file
@@ -0,0 +1,68 @@
+from common import gateway
+from common.dynamodb_helper import TOMBSTONE_SK_PREFIX, build_pk, resolve_task_key
+
+USER_ID = 'test-user-001'
+
+def delete(api, task_id, if_match=None):
+    headers = {'If-Match': if_match} if if_match else None
+    return api('DELETE', '/todos/{taskId}', path_parameters={'taskId': task_id}, headers=headers)
+
+def test_delete_writes_counters_and_tombstone_in_one_transaction(api, create_task, summary, table):
+    task = create_task(priority='HIGH')
+    create_task(priority='LOW')
+    table.stats['calls'].clear()
+
+    status, body, _ = delete(api, task['taskId'])
+
+    assert status == 200
+    assert body['taskId'] == task['taskId']
+    assert table.stats['calls'] == {'GetItem': 1, 'TransactWriteItems': 1}
+    assert gateway.get_item(resolve_task_key(USER_ID, task['taskId'])) is None
+    tombstone = gateway.get_item({'PK': build_pk(USER_ID), 'SK': f"{TOMBSTONE_SK_PREFIX}{task['taskId']}"})
+    assert tombstone['deleted'] is True
+    counts = summary()
+    assert counts['total'] == 1
+    assert counts['byPriority'] == {'HIGH': 0, 'MEDIUM': 0, 'LOW': 1}
+
+def test_failed_transaction_keeps_task_and_writes_no_tombstone(api, create_task, summary, monkeypatch):
+    task = create_task()
+
+    def fail(actions):
+        raise RuntimeError('transaction failed')
+
+    monkeypatch.setattr(gateway, 'transact_write', fail)
+    status, _, _ = delete(api, task['taskId'])
+    monkeypatch.undo()
+
+    assert status == 500
+    assert gateway.get_item(resolve_task_key(USER_ID, task['taskId'])) is not None
+    assert gateway.get_item({'PK': build_pk(USER_ID), 'SK': f"{TOMBSTONE_SK_PREFIX}{task['taskId']}"}) is None
+    assert summary()['total'] == 1
+
+def test_stale_if_match_returns_412_and_keeps_task(api, create_task, summary):
+    task = create_task()
+    api('PUT', '/todos/{taskId}', body={'title': 'changed'}, path_parameters={'taskId': task['taskId']})
+
+    status, _, headers = delete(api, task['taskId'], if_match=task['etag'])
+
+    assert status == 412
+    assert headers['ETag'] == '"2"'
+    assert gateway.get_item(resolve_task_key(USER_ID, task['taskId'])) is not None
+    assert summary()['total'] == 1
+
+def test_matching_if_match_deletes(api, create_task, summary):
+    task = create_task()
+    status, _, _ = delete(api, task['taskId'], if_match=task['etag'])
+
+    assert status == 200
+    assert summary()['total'] == 0
+
+def test_second_delete_returns_404_and_does_not_double_count(api, create_task, summary):
+    task = create_task()
+    create_task()
+    delete(api, task['taskId'])
+
+    status, _, _ = delete(api, task['taskId'])
+
+    assert status == 404
+    assert summary()['byStatus'] == {'PENDING': 1, 'COMPLETED': 0}
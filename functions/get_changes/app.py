@@ -0,0 +1,116 @@
+import os
+import time
+from datetime import datetime
+from common import capacity, compression, gateway, logger, metrics
+from common.capture import capture_event
+from common.dynamodb_helper import (
+    create_response, build_pk, timestamp_seconds_ago, task_response, task_attributes, CHANGES_RETENTION_SECONDS,
+    CHANGES_INDEX_ENABLED
+)
+from common.pagination import parse_page_size, encode_page_token, decode_page_token
+
+# 書き込みのタイムスタンプ取得からコミットまでの遅れ・インスタンス間の時計のずれを吸収する幅。
+# 同期時刻は現在よりこの秒数以上前までしか進めないため、直近の変更は次回も重複して返ることがある
+SYNC_SKEW_SECONDS = int(os.environ.get('SYNC_SKEW_SECONDS', '2'))
+# 同期トークンなし（初回）の読み込み開始位置（すべてのupdatedAtより小さい値）
+INITIAL_SINCE = '0'
+# 読む属性（タスクのレスポンスの項目、トゥームストーンの削除フラグ、パーティションのリセットの印）
+CHANGE_ATTRIBUTES = task_attributes() + ('deleted', 'reset')
+
+def stable_until():
+    """これより前のupdatedAtを持つ書き込みはすべてコミット済みとみなせる時刻"""
+    return timestamp_seconds_ago(SYNC_SKEW_SECONDS)
+
+def is_expired(timestamp):
+    """トゥームストーンの保持期間より古い同期時刻か（削除を取りこぼすため全件の再取得が必要）"""
+    if timestamp == INITIAL_SINCE:
+        return False
+    since = datetime.strptime(timestamp[:19], '%Y-%m-%dT%H:%M:%S')
+    return since < datetime.utcfromtimestamp(time.time() - CHANGES_RETENTION_SECONDS)
+
+def to_change(item):
+    """変更1件をレスポンス用に整形（削除はtaskIdとdeletedのみ）"""
+    if item.get('deleted'):
+        return {'taskId': item['taskId'], 'deleted': True, 'updatedAt': item['updatedAt']}
+    return task_response(item)
+
+@logger.log_request
+@metrics.log_metrics
+@compression.compress_response
+@capacity.track_capacity
+def lambda_handler(event, context):
+    """
+    差分同期（since以降に更新・削除されたタスクを変更順に返す）
+
+    sinceなしの場合は全タスクを返す。レスポンスのsyncTokenを次回のsinceに渡す。
+    hasMore=trueの場合は、すぐに続きを取得する。
+    """
+
+    logger.debug('Event', payload=event)
+    capture_event(event)
+
+    try:
+        # ChangesIndex=disabled のスタックにはGSI4がない
+        if not CHANGES_INDEX_ENABLED:
+            return create_response(400, {'error': 'changes index is not enabled'})
+
+        # クエリパラメータ
+        params = event.get('queryStringParameters') or {}
+        try:
+            limit = parse_page_size(params.get('limit'))
+        except ValueError as e:
+            return create_response(400, {'error': str(e)})
+
+        # ユーザーID（固定）
+        user_id = 'test-user-001'
+        logger.append_keys(user=user_id)
+
+        # 同期トークン（同期時刻と、ページの途中であれば続きのキー）
+        query_shape = {'user': user_id, 'feed': 'changes'}
+        position = {'since': INITIAL_SINCE, 'k': None}
+        if params.get('since'):
+            try:
+                position = decode_page_token(params['since'], query_shape)
+            except ValueError as e:
+                return create_response(400, {'error': str(e)})
+
+        if is_expired(position['since']):
+            return create_response(410, {'error': 'Sync token expired; reload all tasks without since'})
+
+        # GSI4で変更順
+        items, last_key = gateway.query(
+            'CHANGES', build_pk(user_id), limit, start_key=position['k'],
+            values={':from': position['since']}, attributes=CHANGE_ATTRIBUTES
+        )
+
+        # sinceより後にパーティションがパージされた（削除のトゥームストーンがない）
+        if position['since'] != INITIAL_SINCE and any(item.get('reset') for item in items):
+            return create_response(410, {'error': 'Tasks were purged; reload all tasks without since'})
+
+        changes = [to_change(item) for item in items if not item.get('reset')]
+
+        if last_key:
+            # ページの途中: 同じ同期時刻で続きから読む
+            next_position = {'since': position['since'], 'k': last_key}
+        else:
+            # 最後まで読んだ: 返した変更の最新時刻（ただしコミット済みとみなせる時刻まで）が次回の同期時刻
+            # （前ページまでの最新時刻は続きのキーのupdatedAt）
+            seen = [position['since']] + [item['updatedAt'] for item in items]
+            if position['k']:
+                seen.append(position['k']['updatedAt'])
+            latest = max(seen)
+            next_position = {'since': max(position['since'], min(latest, stable_until())), 'k': None}
+
+        logger.append_keys(changeCount=len(changes), hasNextPage=last_key is not None)
+        metrics.increment('ItemsReturned', len(changes))
+
+        return create_response(200, {
+            'changes': changes,
+            'count': len(changes),
+            'syncToken': encode_page_token(next_position, query_shape),
+            'hasMore': last_key is not None
+        })
+
+    except Exception as e:
+        logger.exception('Error: %s', e)
+        return create_response(500, {'error': 'Internal server error', 'details': str(e)})
@@ -0,0 +1,123 @@
+import pytest
+
+from common import gateway, pagination
+from common.dynamodb_helper import resolve_task_key, timestamp_seconds_ago
+from get_changes import app
+
+USER_ID = 'test-user-001'
+
+def sync(api, token=None, **query):
+    if token:
+        query['since'] = token
+    status, body, _ = api('GET', '/todos/changes', query=query or None)
+    assert status == 200, body
+    return body
+
+def sync_all(api, token=None, limit='100'):
+    """hasMore=false になるまで読み、変更と最後のsyncTokenを返す"""
+    changes = []
+    while True:
+        body = sync(api, token, limit=limit)
+        changes.extend(body['changes'])
+        token = body['syncToken']
+        if not body['hasMore']:
+            return changes, token
+
+@pytest.fixture
+def no_skew(monkeypatch):
+    """同期時刻を現在まで進める（直近の変更を次回も返さない）"""
+    monkeypatch.setattr(app, 'SYNC_SKEW_SECONDS', 0)
+
+def test_disabled_changes_index_returns_400(api, create_task, monkeypatch):
+    create_task()
+    monkeypatch.setattr(app, 'CHANGES_INDEX_ENABLED', False)
+
+    status, body, _ = api('GET', '/todos/changes')
+
+    assert status == 400
+    assert body['error'] == 'changes index is not enabled'
+
+def test_only_changes_since_the_token_are_returned(api, create_task, no_skew):
+    tasks = [create_task(title=f'task {i}') for i in range(5)]
+    first, token = sync_all(api)
+
+    api('PUT', '/todos/{taskId}', body={'title': 'renamed'}, path_parameters={'taskId': tasks[2]['taskId']})
+    changes, _ = sync_all(api, token)
+
+    assert len(first) == 5
+    assert [(change['taskId'], change['title']) for change in changes] == [(tasks[2]['taskId'], 'renamed')]
+
+def test_pages_in_change_order_without_gaps(api, create_task, no_skew):
+    tasks = [create_task(title=f'task {i}') for i in range(5)]
+
+    changes, _ = sync_all(api, limit='2')
+
+    assert [change['taskId'] for change in changes] == [task['taskId'] for task in tasks]
+
+def test_delete_is_returned_as_tombstone(api, create_task, no_skew):
+    task = create_task()
+    _, token = sync_all(api)
+
+    api('DELETE', '/todos/{taskId}', path_parameters={'taskId': task['taskId']})
+    changes, _ = sync_all(api, token)
+
+    assert changes == [{'taskId': task['taskId'], 'deleted': True, 'updatedAt': changes[0]['updatedAt']}]
+
+def test_bulk_delete_of_completed_writes_tombstones(api, create_task, no_skew):
+    done = create_task()
+    create_task()
+    api('PUT', '/todos/{taskId}', body={'status': 'COMPLETED'}, path_parameters={'taskId': done['taskId']})
+    _, token = sync_all(api)
+
+    api('POST', '/todos/bulk-delete', body={'scope': 'COMPLETED'})
+    changes, _ = sync_all(api, token)
+
+    assert [(change['taskId'], change.get('deleted')) for change in changes] == [(done['taskId'], True)]
+
+def test_purge_after_token_returns_410(api, create_task):
+    create_task()
+    _, token = sync_all(api)
+
+    api('POST', '/todos/bulk-delete', body={'scope': 'ALL'})
+    status, body, _ = api('GET', '/todos/changes', query={'since': token})
+    full, _ = sync_all(api)
+
+    assert status == 410
+    assert 'reload' in body['error']
+    # 全件の再取得（sinceなし）は印を返さない
+    assert full == []
+
+def test_token_older_than_retention_returns_410(api):
+    token = pagination.encode_page_token({'since': '2000-01-01T00:00:00.000000Z', 'k': None},
+                                         {'user': USER_ID, 'feed': 'changes'})
+
+    status, _, _ = api('GET', '/todos/changes', query={'since': token})
+
+    assert status == 410
+
+def test_token_from_other_feed_returns_400(api):
+    token = pagination.encode_page_token({'since': '0', 'k': None}, {'user': USER_ID, 'index': 'GSI1'})
+
+    status, _, _ = api('GET', '/todos/changes', query={'since': token})
+
+    assert status == 400
+
+def test_recent_changes_are_returned_again(api, create_task):
+    """同期時刻は現在より SYNC_SKEW_SECONDS 前までしか進めないため、直近の変更は次回も返す"""
+    task = create_task()
+
+    _, token = sync_all(api)
+    changes, _ = sync_all(api, token)
+
+    assert [change['taskId'] for change in changes] == [task['taskId']]
+
+def test_write_committed_after_sync_with_earlier_timestamp_is_not_missed(api, create_task):
+    """タイムスタンプを取ってからコミットするまでに同期が入っても、その書き込みを取りこぼさない"""
+    task = create_task()
+    _, token = sync_all(api)
+
+    late = timestamp_seconds_ago(1)
+    gateway.update_item(resolve_task_key(USER_ID, task['taskId']), {'title': 'late', 'updatedAt': late})
+    changes, _ = sync_all(api, token)
+
+    assert [(change['taskId'], change['title']) for change in changes] == [(task['taskId'], 'late')]
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+from common import capacity, compression, gateway, logger, metrics, summary
+from common.capture import capture_event
+from common.dynamodb_helper import create_response, build_status_pk, build_due_before
+
+@logger.log_request
+@metrics.log_metrics
+@compression.compress_response
+@capacity.track_capacity
+def lambda_handler(event, context):
+    """
+    タスク件数の集計（ステータス別・優先度別）
+
+    集計アイテムのGetItem 1回で返す。include=overdue の場合のみ、期限切れの
+    未完了タスク数をGSI2のCOUNTで数えて追加する（時間の経過で変わるため集計できない）。
+    """
+
+    logger.debug('Event', payload=event)
+    capture_event(event)
+
+    try:
+        # クエリパラメータ
+        params = event.get('queryStringParameters') or {}
+        include = [name for name in (params.get('include') or '').split(',') if name]
+        if any(name != 'overdue' for name in include):
+            return create_response(400, {'error': 'include must be overdue'})
+
+        # ユーザーID（固定）
+        user_id = 'test-user-001'
+        logger.append_keys(user=user_id)
+
+        result = summary.read(user_id)
+
+        if 'overdue' in include:
+            # 期限が現在より前の未完了タスク（GSI1SK: DUE#{dueDate}#{優先度の順位}）
+            result['overdue'] = gateway.count(
+                'GSI2_DUE_BEFORE', build_status_pk(user_id, 'PENDING'), values=build_due_before(datetime.now(timezone.utc))
+            )
+
+        return create_response(200, result)
+
+    except Exception as e:
+        logger.exception('Error: %s', e)
+        return create_response(500, {'error': 'Internal server error', 'details': str(e)})
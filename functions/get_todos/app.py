@@ -1,96 +1,186 @@
-import json
-import os
-import boto3
-from boto3.dynamodb.conditions import Key
-
-# DynamoDBクライアント
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['TABLE_NAME'])
+from datetime import datetime, timezone
+from common import capacity, compression, gateway, logger, metrics
+from common.capture import capture_event
+from common.dynamodb_helper import (
+    create_response, build_pk, build_status_pk, task_projection, task_attributes, parse_fields, get_list_version, build_list_etag, is_list_version_settled, if_none_match,
+    build_due_range, build_due_before, build_priority_range, PRIORITY_RANK, PRIORITY_INDEX_ENABLED,
+    STATUS_CREATED_INDEX_ENABLED
+)
+from common.pagination import parse_page_size, encode_page_token, decode_page_token
 
+@logger.log_request
+@metrics.log_metrics
+@compression.compress_response
+@capacity.track_capacity
 def lambda_handler(event, context):
-    """タスク一覧取得"""
+    """
+    タスク一覧取得
+
+    レスポンスのETag（一覧のバージョン）を If-None-Match に指定した場合、
+    その後に書き込みがなければ一覧を読まずに304を返す。
+
+    dueFrom/dueTo（期限の範囲）と overdue=true（期限切れの未完了タスク）は
+    GSI1SKのキー条件（BETWEEN / <）で該当する範囲のみ読む。
+
+    sortBy=priority（優先度の高い順・同じ優先度は期限順）と priority（1つの優先度を期限順）は
+    GSI5（GSI5SK: PRIO#{rank}#DUE#{dueDate}）を読む。priority は dueFrom/dueTo と組み合わせられる。
+    """
     
-    print(f"Event: {json.dumps(event)}")
+    logger.debug('Event', payload=event)
+    capture_event(event)
     
     try:
         # クエリパラメータ
         params = event.get('queryStringParameters') or {}
         status_filter = params.get('status')
-        limit = int(params.get('limit', 20))
         sort_by = params.get('sortBy', 'dueDate')
+        next_token = params.get('nextToken')
+        overdue = params.get('overdue', 'false')
+        priority_filter = params.get('priority')
+        
+        try:
+            limit = parse_page_size(params.get('limit'))
+            # 返す項目（?fields=taskId,title,status。読む属性もこれに絞る）
+            fields = parse_fields(params.get('fields'))
+            # 期限の範囲（日付のみはUTCのその日全体）
+            due_range = None
+            if params.get('dueFrom') or params.get('dueTo'):
+                due_range = build_due_range(params.get('dueFrom'), params.get('dueTo'))
+        except ValueError as e:
+            return create_response(400, {'error': str(e)})
+        
+        if status_filter and status_filter not in ['PENDING', 'COMPLETED']:
+            return create_response(400, {'error': 'status must be PENDING or COMPLETED'})
+        
+        if priority_filter and priority_filter not in PRIORITY_RANK:
+            return create_response(400, {'error': 'priority must be HIGH, MEDIUM, or LOW'})
+        
+        if (priority_filter or sort_by == 'priority') and not PRIORITY_INDEX_ENABLED:
+            return create_response(400, {'error': 'priority index is not enabled'})
+        
+        if status_filter and sort_by not in ('dueDate', 'priority') and not STATUS_CREATED_INDEX_ENABLED:
+            return create_response(400, {'error': 'status created-date index is not enabled, use sortBy=dueDate'})
+        
+        # 1つの優先度の中では優先度順と期限順は同じ
+        if priority_filter and sort_by == 'priority':
+            sort_by = 'dueDate'
+        
+        if overdue not in ['true', 'false']:
+            return create_response(400, {'error': 'overdue must be true or false'})
+        overdue = overdue == 'true'
+        
+        if (due_range or overdue) and sort_by != 'dueDate':
+            return create_response(400, {'error': 'dueFrom, dueTo and overdue require sortBy=dueDate'})
         
-        print(f"Params - status: {status_filter}, limit: {limit}, sortBy: {sort_by}")
+        # 期限切れは未完了のタスクのみ
+        if overdue and (due_range or status_filter == 'COMPLETED'):
+            return create_response(400, {'error': 'overdue cannot be combined with dueFrom, dueTo or status=COMPLETED'})
+        
+        # GSI5はステータスをキーに含まない
+        if (priority_filter or sort_by == 'priority') and (status_filter or overdue):
+            return create_response(400, {'error': 'priority and sortBy=priority cannot be combined with status or overdue'})
+        
+        if priority_filter and sort_by != 'dueDate':
+            return create_response(400, {'error': 'priority requires sortBy=dueDate or sortBy=priority'})
+        
+        logger.debug('Params status=%s priority=%s limit=%s sortBy=%s', status_filter, priority_filter, limit, sort_by)
         
         # ユーザーID（固定）
         user_id = 'test-user-001'
+        logger.append_keys(user=user_id)
         
-        # クエリ構築
-        if sort_by == 'dueDate':
+        # 一覧のバージョン（強い整合性で読むため、直前の書き込みも反映される）
+        # 期限切れの一覧は書き込みがなくても時間の経過で変わるため、ETagを使わない
+        list_version = get_list_version(user_id) if not overdue else None
+        etag = build_list_etag(list_version) if not overdue else None
+        if etag and if_none_match(event.get('headers'), etag):
+            logger.append_keys(notModified=True)
+            metrics.increment('NotModified')
+            return create_response(304, headers={'Access-Control-Expose-Headers': 'ETag', 'ETag': etag})
+        
+        # クエリ構築（ステータス指定時はステータス別インデックスで該当アイテムのみ読む）
+        values = None
+        if overdue:
+            # GSI2で未完了・期限が現在より前（GSI1SK < DUE#{now}）
+            pattern, pk, forward = 'GSI2_DUE_BEFORE', build_status_pk(user_id, 'PENDING'), True
+            values = build_due_before(datetime.now(timezone.utc))
+        elif priority_filter:
+            # GSI5で1つの優先度・期限の範囲（GSI5SK BETWEEN）
+            pattern, pk, forward = 'GSI5_RANGE', build_pk(user_id), True
+            values = build_priority_range(priority_filter, params.get('dueFrom'), params.get('dueTo'))
+        elif due_range and status_filter:
+            # GSI2でステータス別・期限の範囲（GSI1SK BETWEEN）
+            pattern, pk, forward, values = 'GSI2_DUE_RANGE', build_status_pk(user_id, status_filter), True, due_range
+        elif due_range:
+            # GSI1で期限の範囲（GSI1SK BETWEEN）
+            pattern, pk, forward, values = 'GSI1_DUE_RANGE', build_pk(user_id), True, due_range
+        elif sort_by == 'priority':
+            # GSI5で優先度順（同じ優先度は期限順）
+            pattern, pk, forward = 'GSI5', build_pk(user_id), True
+        elif sort_by == 'dueDate' and status_filter:
+            # GSI2でステータス別・期限順
+            pattern, pk, forward = 'GSI2', build_status_pk(user_id, status_filter), True
+        elif sort_by == 'dueDate':
             # GSI1で期限順
-            query_params = {
-                'IndexName': 'GSI1',
-                'KeyConditionExpression': Key('GSI1PK').eq(f'USER#{user_id}'),
-                'Limit': limit,
-                'ScanIndexForward': True
-            }
+            pattern, pk, forward = 'GSI1', build_pk(user_id), True
+        elif status_filter:
+            # GSI3でステータス別・作成日順
+            pattern, pk, forward = 'GSI3', build_status_pk(user_id, status_filter), False
         else:
             # メインテーブルで作成日順
-            query_params = {
-                'KeyConditionExpression': Key('PK').eq(f'USER#{user_id}'),
-                'Limit': limit,
-                'ScanIndexForward': False
-            }
+            pattern, pk, forward = 'TABLE', build_pk(user_id), False
         
-        print(f"Query: {query_params}")
+        # ページ間で変わってはいけないクエリ条件（nextTokenに紐づける）
+        query_shape = {
+            'user': user_id,
+            'index': pattern,
+            'status': status_filter,
+            'limit': limit
+        }
+        if due_range:
+            query_shape['due'] = due_range
+        if priority_filter:
+            query_shape['priority'] = priority_filter
         
-        # DynamoDBクエリ
-        response = table.query(**query_params)
-        items = response.get('Items', [])
+        # 続きのページ
+        start_key = None
+        if next_token:
+            try:
+                start_key = decode_page_token(next_token, query_shape)
+            except ValueError as e:
+                return create_response(400, {'error': str(e)})
         
-        print(f"Retrieved {len(items)} items")
+        logger.debug('Query pattern=%s limit=%s forward=%s', pattern, limit, forward)
         
-        # ステータスフィルタ
-        if status_filter:
-            print(f"Filtering by status: {status_filter}")
-            items = [item for item in items if item.get('status') == status_filter]
-            print(f"After filter: {len(items)} items")
+        # DynamoDBクエリ
+        items, last_key = gateway.query(
+            pattern, pk, limit, forward=forward, start_key=start_key, values=values, attributes=task_attributes(fields)
+        )
+        
+        logger.append_keys(pattern=pattern, itemCount=len(items), hasNextPage=last_key is not None)
         
         # レスポンス用に整形
-        clean_items = []
-        for item in items:
-            clean_items.append({
-                'taskId': item['taskId'],
-                'title': item['title'],
-                'description': item.get('description', ''),
-                'dueDate': item['dueDate'],
-                'priority': item['priority'],
-                'status': item['status'],
-                'createdAt': item['createdAt'],
-                'updatedAt': item['updatedAt']
-            })
+        clean_items = task_projection(fields).many(items)
+        
+        metrics.increment('ItemsReturned', len(clean_items))
         
         result = {
             'items': clean_items,
             'count': len(clean_items)
         }
         
-        print(f"Returning {len(clean_items)} items")
+        # 次ページがある場合のみnextTokenを返す
+        if last_key:
+            result['nextToken'] = encode_page_token(last_key, query_shape)
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps(result, ensure_ascii=False)
-        }
+        headers = {}
+        # 書き込みの直後はGSIに未反映の可能性があるため、再検証用のETagを返さない
+        if etag and is_list_version_settled(list_version):
+            headers['Access-Control-Expose-Headers'] = 'ETag'
+            headers['ETag'] = etag
+        
+        return create_response(200, result, headers=headers)
         
     except Exception as e:
-        print(f"Error: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Internal server error', 'details': str(e)})
-        }
\ No newline at end of file
+        logger.exception('Error: %s', e)
+        return create_response(500, {'error': 'Internal server error', 'details': str(e)})
\ No newline at end of file
@@ -0,0 +1,410 @@
+import base64
+import gzip
+import json
+
+import pytest
+
+from common import compression, dynamodb_helper, pagination
+from get_todos import app
+
+def list_page(api, **query):
+    return api('GET', '/todos', query=query)
+
+def query_pattern(capsys):
+    """直前のリクエストのサマリ行から、読んだインデックス（pattern）を返す"""
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{')]
+    return [line for line in lines if line.get('message') == 'request'][-1].get('pattern')
+
+@pytest.fixture
+def secrets(monkeypatch):
+    """Secrets Manager の代わりに、現在・1つ前のシークレットを返す"""
+    stored = {'values': [b'first'], 'fetches': 0}
+
+    def fetch():
+        stored['fetches'] += 1
+        if isinstance(stored['values'], Exception):
+            raise stored['values']
+        return list(stored['values'])
+
+    monkeypatch.setattr(pagination, 'SECRET_ID', 'arn:aws:secretsmanager:us-east-1:123456789012:secret:page-token')
+    monkeypatch.setattr(pagination, '_fetch_secrets', fetch)
+    monkeypatch.setattr(pagination, '_secrets', {'values': None, 'refreshAt': 0.0})
+    return stored
+
+def expire_cache():
+    pagination._secrets['refreshAt'] = 0.0
+
+def test_secret_is_fetched_once_and_cached(api, create_task, secrets):
+    for _ in range(3):
+        create_task()
+
+    _, first, _ = list_page(api, limit='1')
+    status, _, _ = list_page(api, limit='1', nextToken=first['nextToken'])
+
+    assert status == 200
+    assert secrets['fetches'] == 1
+
+def test_token_signed_before_rotation_is_still_accepted(api, create_task, secrets):
+    for _ in range(3):
+        create_task()
+    _, first, _ = list_page(api, limit='1')
+
+    secrets['values'] = [b'second', b'first']
+    expire_cache()
+    status, second, _ = list_page(api, limit='1', nextToken=first['nextToken'])
+
+    assert status == 200
+    assert secrets['fetches'] == 2
+    # 新しいトークンは現在のシークレットで署名する
+    secrets['values'] = [b'second']
+    expire_cache()
+    assert list_page(api, limit='1', nextToken=second['nextToken'])[0] == 200
+    assert list_page(api, limit='1', nextToken=first['nextToken'])[0] == 400
+
+def test_failed_refresh_keeps_cached_secret(api, create_task, secrets):
+    for _ in range(2):
+        create_task()
+    _, first, _ = list_page(api, limit='1')
+
+    secrets['values'] = pagination.ClientError({'Error': {'Code': 'ThrottlingException'}}, 'GetSecretValue')
+    expire_cache()
+
+    assert list_page(api, limit='1', nextToken=first['nextToken'])[0] == 200
+
+def tamper(token):
+    """署名はそのままでペイロードの末尾の1文字を変える"""
+    payload, signature = token.split('.')
+    return f"{payload[:-1]}{'A' if payload[-1] != 'A' else 'B'}.{signature}"
+
+@pytest.mark.parametrize('token', ['garbage', 'a.b.c', 'not-base64!.x'])
+def test_malformed_next_token_returns_400(api, token):
+    status, body, _ = list_page(api, nextToken=token)
+
+    assert status == 400
+    assert body['error'] == 'Invalid nextToken'
+
+def test_tampered_next_token_returns_400(api, create_task):
+    for _ in range(2):
+        create_task()
+    _, first, _ = list_page(api, limit='1')
+
+    status, body, _ = list_page(api, limit='1', nextToken=tamper(first['nextToken']))
+
+    assert status == 400
+    assert body['error'] == 'Invalid nextToken'
+
+@pytest.mark.parametrize('changed', [{'limit': '2'}, {'status': 'PENDING'}, {'sortBy': 'createdAt'},
+                                     {'dueFrom': '2030-01-01'}])
+def test_next_token_for_other_query_returns_400(api, create_task, changed):
+    for _ in range(3):
+        create_task()
+    _, first, _ = list_page(api, limit='1')
+
+    status, body, _ = list_page(api, **dict({'limit': '1', 'nextToken': first['nextToken']}, **changed))
+
+    assert status == 400
+    assert body['error'] == 'nextToken does not match the query parameters'
+
+def test_next_token_pages_through_every_task_once(api, create_task):
+    created = {create_task(title=f'task {i}')['taskId'] for i in range(5)}
+    seen, token = [], None
+
+    while True:
+        query = {'limit': '2', 'nextToken': token} if token else {'limit': '2'}
+        status, page, _ = list_page(api, **query)
+        assert status == 200
+        seen.extend(item['taskId'] for item in page['items'])
+        token = page.get('nextToken')
+        if not token:
+            break
+
+    assert sorted(seen) == sorted(created)
+
+@pytest.fixture
+def mixed_tasks(api, create_task):
+    """未完了と完了を交互に作成し、未完了のタスクIDを返す"""
+    pending = []
+    for i in range(10):
+        task = create_task(title=f'task {i}', due_date=f'2030-01-{i + 1:02d}')
+        if i % 2:
+            api('PUT', '/todos/{taskId}', body={'status': 'COMPLETED'}, path_parameters={'taskId': task['taskId']})
+        else:
+            pending.append(task['taskId'])
+    return pending
+
+@pytest.mark.parametrize('sort_by, pattern', [('dueDate', 'GSI2'), ('createdAt', 'GSI3')])
+def test_status_pages_are_exactly_limit_long(api, mixed_tasks, capsys, sort_by, pattern):
+    pages, token = [], None
+    while True:
+        query = {'status': 'PENDING', 'sortBy': sort_by, 'limit': '2'}
+        if token:
+            query['nextToken'] = token
+        status, page, _ = list_page(api, **query)
+        assert status == 200
+        assert query_pattern(capsys) == pattern
+        pages.append(page['items'])
+        token = page.get('nextToken')
+        if not token:
+            break
+
+    assert [len(items) for items in pages[:-1]] == [2, 2]
+    assert len(pages[-1]) == 1
+    assert all(item['status'] == 'PENDING' for items in pages for item in items)
+    assert sorted(item['taskId'] for items in pages for item in items) == sorted(mixed_tasks)
+
+def test_status_page_reads_only_matching_items(api, mixed_tasks, table):
+    table.stats['readUnits'] = 0.0
+    _, page, _ = list_page(api, status='COMPLETED', limit='5')
+    status_read = table.stats['readUnits']
+
+    table.stats['readUnits'] = 0.0
+    list_page(api, limit='5')
+
+    assert page['count'] == 5
+    # 一覧のバージョンのGetItemを含めて、同じ件数を読んだ未絞り込みの一覧と同じ読み込み量
+    assert status_read == table.stats['readUnits']
+
+def test_status_by_created_date_without_index_returns_400(api, monkeypatch):
+    monkeypatch.setattr(app, 'STATUS_CREATED_INDEX_ENABLED', False)
+
+    status, body, _ = list_page(api, status='PENDING', sortBy='createdAt')
+
+    assert status == 400
+    assert 'sortBy=dueDate' in body['error']
+
+def due_dates(page):
+    return [item['dueDate'] for item in page['items']]
+
+def test_due_date_is_stored_in_utc_so_offsets_sort_chronologically(api, create_task, capsys):
+    # 文字列としては '2030-01-02T08' < '2030-01-02T09' だが、UTCでは逆の順
+    later = create_task(due_date='2030-01-02T08:00:00-05:00')
+    earlier = create_task(due_date='2030-01-02T09:00:00+09:00')
+
+    status, page, _ = list_page(api, dueFrom='2030-01-02', dueTo='2030-01-02')
+
+    assert status == 200
+    assert query_pattern(capsys) == 'GSI1_DUE_RANGE'
+    assert earlier['dueDate'] == '2030-01-02T00:00:00.000Z'
+    assert later['dueDate'] == '2030-01-02T13:00:00.000Z'
+    assert [item['taskId'] for item in page['items']] == [earlier['taskId'], later['taskId']]
+
+def test_due_range_returns_only_the_range_in_due_order(api, create_task, capsys):
+    for due in ['2030-01-31T23:59:59.999Z', '2030-02-01', '2030-01-01', '2029-12-31T23:59:59.999Z', '2030-01-15T12:00:00Z']:
+        create_task(due_date=due)
+
+    status, page, _ = list_page(api, dueFrom='2030-01-01', dueTo='2030-01-31')
+
+    assert status == 200
+    assert query_pattern(capsys) == 'GSI1_DUE_RANGE'
+    assert due_dates(page) == ['2030-01-01T00:00:00.000Z', '2030-01-15T12:00:00.000Z', '2030-01-31T23:59:59.999Z']
+
+def test_due_range_with_status_uses_status_index(api, create_task, capsys):
+    done = create_task(due_date='2030-01-10')
+    create_task(due_date='2030-01-11')
+    api('PUT', '/todos/{taskId}', body={'status': 'COMPLETED'}, path_parameters={'taskId': done['taskId']})
+    capsys.readouterr()
+
+    status, page, _ = list_page(api, status='COMPLETED', dueFrom='2030-01-01', dueTo='2030-01-31')
+
+    assert status == 200
+    assert query_pattern(capsys) == 'GSI2_DUE_RANGE'
+    assert [item['taskId'] for item in page['items']] == [done['taskId']]
+
+def test_overdue_returns_past_pending_tasks_without_etag(api, create_task, capsys):
+    oldest = create_task(due_date='2000-01-01')
+    old = create_task(due_date='2000-06-01')
+    done = create_task(due_date='2000-03-01')
+    create_task(due_date='2999-01-01')
+    api('PUT', '/todos/{taskId}', body={'status': 'COMPLETED'}, path_parameters={'taskId': done['taskId']})
+    capsys.readouterr()
+
+    status, page, headers = list_page(api, overdue='true')
+
+    assert status == 200
+    assert query_pattern(capsys) == 'GSI2_DUE_BEFORE'
+    assert [item['taskId'] for item in page['items']] == [oldest['taskId'], old['taskId']]
+    assert 'ETag' not in headers
+
+@pytest.mark.parametrize('query', [
+    {'dueFrom': '2030-02-01', 'dueTo': '2030-01-01'},
+    {'dueFrom': 'tomorrow'},
+    {'overdue': 'yes'},
+    {'overdue': 'true', 'dueTo': '2030-01-01'},
+    {'overdue': 'true', 'status': 'COMPLETED'},
+    {'dueFrom': '2030-01-01', 'sortBy': 'createdAt'},
+])
+def test_invalid_due_query_returns_400(api, query):
+    assert list_page(api, **query)[0] == 400
+
+def titles(page):
+    return [item['title'] for item in page['items']]
+
+def test_same_due_date_lists_high_before_medium_before_low(api, create_task, capsys):
+    for priority in ['LOW', 'HIGH', 'MEDIUM']:
+        create_task(title=priority, priority=priority, due_date='2030-01-01')
+
+    _, page, _ = list_page(api)
+
+    assert query_pattern(capsys) == 'GSI1'
+    assert titles(page) == ['HIGH', 'MEDIUM', 'LOW']
+
+def test_sort_by_priority_orders_by_rank_then_due_date(api, create_task, capsys):
+    for title, priority, due in [('low', 'LOW', '2030-01-01'), ('high-late', 'HIGH', '2030-03-01'),
+                                 ('medium', 'MEDIUM', '2030-01-02'), ('high-early', 'HIGH', '2030-02-01')]:
+        create_task(title=title, priority=priority, due_date=due)
+
+    _, page, _ = list_page(api, sortBy='priority')
+
+    assert query_pattern(capsys) == 'GSI5'
+    assert titles(page) == ['high-early', 'high-late', 'medium', 'low']
+
+def test_one_priority_in_due_range_is_one_key_range(api, create_task, capsys):
+    for title, priority, due in [('high-jan', 'HIGH', '2030-01-15'), ('high-feb', 'HIGH', '2030-02-15'),
+                                 ('low-jan', 'LOW', '2030-01-10'), ('high-dec', 'HIGH', '2029-12-31')]:
+        create_task(title=title, priority=priority, due_date=due)
+
+    _, page, _ = list_page(api, priority='HIGH', dueFrom='2030-01-01', dueTo='2030-02-28')
+
+    assert query_pattern(capsys) == 'GSI5_RANGE'
+    assert titles(page) == ['high-jan', 'high-feb']
+
+def test_priority_change_moves_task_in_priority_order(api, create_task):
+    low = create_task(title='low', priority='LOW')
+    create_task(title='medium', priority='MEDIUM')
+    api('PUT', '/todos/{taskId}', body={'priority': 'HIGH'}, path_parameters={'taskId': low['taskId']})
+
+    _, page, _ = list_page(api, sortBy='priority')
+
+    assert titles(page) == ['low', 'medium']
+    assert [item['priority'] for item in page['items']] == ['HIGH', 'MEDIUM']
+
+def test_priority_query_without_index_returns_400(api, monkeypatch):
+    monkeypatch.setattr(app, 'PRIORITY_INDEX_ENABLED', False)
+
+    status, body, _ = list_page(api, sortBy='priority')
+
+    assert status == 400
+    assert body['error'] == 'priority index is not enabled'
+
+@pytest.mark.parametrize('query', [{'priority': 'URGENT'}, {'priority': 'HIGH', 'status': 'PENDING'},
+                                   {'sortBy': 'priority', 'overdue': 'true'}, {'priority': 'HIGH', 'sortBy': 'createdAt'}])
+def test_invalid_priority_query_returns_400(api, query):
+    assert list_page(api, **query)[0] == 400
+
+def list_page_if_none_match(api, etag, **query):
+    return api('GET', '/todos', query=query or None, headers={'If-None-Match': etag})
+
+@pytest.fixture
+def settled(monkeypatch):
+    """書き込みの直後でも一覧のETagを返す"""
+    monkeypatch.setattr(dynamodb_helper, 'LIST_ETAG_SETTLE_SECONDS', 0)
+
+def test_matching_if_none_match_returns_304_after_one_get_item(api, create_task, table, settled):
+    create_task()
+    _, _, headers = list_page(api)
+    table.stats['calls'].clear()
+
+    status, body, not_modified = list_page_if_none_match(api, headers['ETag'])
+
+    assert status == 304
+    assert body is None
+    assert not_modified['ETag'] == headers['ETag']
+    assert table.stats['calls'] == {'GetItem': 1}
+
+@pytest.mark.parametrize('write', ['create', 'update', 'delete', 'bulk-update', 'bulk-delete'])
+def test_every_write_changes_the_etag(api, create_task, settled, write):
+    task = create_task()
+    _, _, headers = list_page(api)
+    task_path = {'taskId': task['taskId']}
+
+    if write == 'create':
+        create_task()
+    elif write == 'update':
+        api('PUT', '/todos/{taskId}', body={'title': 'renamed'}, path_parameters=task_path)
+    elif write == 'delete':
+        api('DELETE', '/todos/{taskId}', path_parameters=task_path)
+    elif write == 'bulk-update':
+        api('POST', '/todos/bulk-update', body={'taskIds': [task['taskId']], 'patch': {'priority': 'HIGH'}})
+    else:
+        api('POST', '/todos/bulk-delete', body={'scope': 'ALL'})
+    status, _, changed = list_page_if_none_match(api, headers['ETag'])
+
+    assert status == 200
+    assert changed['ETag'] != headers['ETag']
+    assert list_page_if_none_match(api, changed['ETag'])[0] == 304
+
+def test_etag_is_shared_by_every_filter_and_matches_any_listed_tag(api, create_task, settled):
+    create_task()
+    _, _, headers = list_page(api)
+
+    assert list_page_if_none_match(api, headers['ETag'], status='PENDING', limit='1')[0] == 304
+    assert list_page_if_none_match(api, f'W/"999", {headers["ETag"]}')[0] == 304
+    assert list_page_if_none_match(api, '*')[0] == 304
+    assert list_page_if_none_match(api, 'W/"999"')[0] == 200
+
+def test_no_etag_right_after_a_write(api, create_task):
+    create_task()
+
+    status, _, headers = list_page(api)
+
+    assert status == 200
+    assert 'ETag' not in headers
+
+def list_raw(headers, **query):
+    """圧縮されたボディを見るため、ルーターを通さずにハンドラを呼ぶ"""
+    event = {
+        'resource': '/todos', 'path': '/todos', 'httpMethod': 'GET',
+        'headers': headers, 'queryStringParameters': query or None, 'body': None, 'isBase64Encoded': False,
+    }
+    return app.lambda_handler(event, None)
+
+@pytest.fixture
+def long_list(create_task):
+    for i in range(20):
+        create_task(title=f'買い物リスト {i}', description='牛乳・卵・パン' * 5)
+
+def test_large_list_is_gzip_compressed(long_list):
+    response = list_raw({'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate'})
+
+    assert response['isBase64Encoded'] is True
+    assert response['headers']['Content-Encoding'] == 'gzip'
+    assert response['headers']['Vary'] == 'Accept-Encoding'
+    body = json.loads(gzip.decompress(base64.b64decode(response['body'])))
+    assert body['count'] == 20
+    assert body['items'][0]['title'].startswith('買い物リスト')
+
+def test_large_list_is_brotli_compressed_when_available(long_list):
+    brotli = pytest.importorskip('brotli')
+    response = list_raw({'Accept': 'application/json', 'Accept-Encoding': 'gzip, br'})
+
+    assert response['headers']['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(base64.b64decode(response['body'])))['count'] == 20
+
+def test_highest_q_value_wins(long_list, monkeypatch):
+    monkeypatch.setitem(compression.ENCODERS, 'br', lambda data: b'br:' + data[:10])
+
+    assert list_raw({'Accept': 'application/json', 'Accept-Encoding': 'gzip, br'})['headers']['Content-Encoding'] == 'br'
+    assert list_raw({'Accept': 'application/json', 'Accept-Encoding': 'gzip;q=1, br;q=0.5'})['headers'][
+        'Content-Encoding'] == 'gzip'
+
+@pytest.mark.parametrize('headers', [
+    {'Accept': 'application/json'},
+    {'Accept': 'application/json', 'Accept-Encoding': 'gzip;q=0'},
+    {'Accept': 'application/json', 'Accept-Encoding': 'identity'},
+    # API Gatewayがバイナリに戻さないAcceptでは圧縮しない
+    {'Accept': '*/*', 'Accept-Encoding': 'gzip'},
+])
+def test_uncompressed_without_usable_encoding(long_list, headers):
+    response = list_raw(headers)
+
+    assert not response.get('isBase64Encoded')
+    assert 'Content-Encoding' not in response['headers']
+    assert json.loads(response['body'])['count'] == 20
+
+def test_small_body_is_not_compressed(create_task):
+    create_task()
+
+    response = list_raw({'Accept': 'application/json', 'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in response['headers']
+    assert json.loads(response['body'])['count'] == 1
@@ -0,0 +1,67 @@
+from common import capacity, gateway, logger, metrics, search
+from common.dynamodb_helper import TASK_SK_PREFIX
+
+def collect_changes(records):
+    """
+    ストリームのレコードをタスクごとにまとめる
+
+    同じバッチで複数回変更されたタスクは、最初のレコードの変更前と最後のレコードの変更後の
+    イメージの差分だけを書き込めばよい。
+
+    Returns:
+        dict: (PK, SK) -> [変更前のタスク, 変更後のタスク, 最初のレコードのシーケンス番号]
+    """
+    changes = {}
+    for record in records:
+        data = record.get('dynamodb') or {}
+        keys = gateway.deserialize_item(data.get('Keys') or {})
+        # template.yaml の FilterCriteria と同じ（タスク以外のアイテムは索引しない）
+        if not keys.get('SK', '').startswith(TASK_SK_PREFIX):
+            continue
+        old = gateway.deserialize_item(data['OldImage']) if 'OldImage' in data else None
+        new = gateway.deserialize_item(data['NewImage']) if 'NewImage' in data else None
+        key = (keys['PK'], keys['SK'])
+        if key in changes:
+            changes[key][1] = new
+        else:
+            changes[key] = [old, new, data.get('SequenceNumber')]
+    return changes
+
+@logger.log_request
+@metrics.log_metrics
+@capacity.track_capacity
+def lambda_handler(event, context):
+    """
+    タスクの変更（DynamoDB Streams、NEW_AND_OLD_IMAGES）から検索インデックスのポスティングを更新
+
+    リクエストの処理中には索引しないため、タスクの作成・更新・削除のレイテンシと消費WCUに
+    ポスティングの書き込みは含まれない。ポスティングの書き込みは何度実行しても同じ結果になるため、
+    失敗したタスクの最初のレコードを batchItemFailures で返し、そこから再試行させる。
+    """
+
+    records = event.get('Records') or []
+    changes = collect_changes(records)
+    logger.append_keys(records=len(records), tasks=len(changes))
+
+    failures = []
+    written = 0
+    for (pk, _), (old, new, sequence) in changes.items():
+        # 同じバッチで作成して削除したタスク
+        if old is None and new is None:
+            continue
+        task = new or old
+        # PK: USER#{userId}
+        user_id = pk[len('USER#'):]
+        try:
+            deletes, puts = search.index_changes(user_id, old, new)
+            if not deletes and not puts:
+                continue
+            search.write_postings(deletes, puts)
+            written += len(deletes) + len(puts)
+        except Exception as e:
+            logger.exception('Search index update failed: %s', e, taskId=task['taskId'])
+            metrics.increment('SearchIndexErrors')
+            failures.append({'itemIdentifier': sequence})
+
+    logger.append_keys(searchPostingsWritten=written, failures=len(failures))
+    return {'batchItemFailures': failures}
@@ -0,0 +1,44 @@
+import os
+
+from common import gateway, search
+from common.dynamodb_helper import resolve_task_key
+from process_task_changes.app import lambda_handler
+
+USER_ID = 'test-user-001'
+
+def drain():
+    return gateway.client.drain_stream(TableName=os.environ['TABLE_NAME'])
+
+def test_non_string_description_is_indexed_as_text(api, create_task, process_stream):
+    """検証を追加する前に書き込まれた、説明が文字列でないタスクも索引できる"""
+    task = create_task(title='report')
+    process_stream()
+    gateway.update_item(resolve_task_key(USER_ID, task['taskId']), {'description': None}, add={'version': 1})
+    gateway.update_item(resolve_task_key(USER_ID, task['taskId']), {'title': 404}, add={'version': 1})
+
+    response = lambda_handler({'Records': drain()}, None)
+
+    assert response['batchItemFailures'] == []
+    status, body, _ = api('GET', '/todos/search', query={'q': '404'})
+    assert status == 200
+    assert [item['taskId'] for item in body['items']] == [task['taskId']]
+
+def test_failing_task_is_reported_and_others_are_indexed(api, create_task, monkeypatch):
+    bad = create_task(title='broken')
+    good = create_task(title='report')
+    records = drain()
+    original = search.index_changes
+
+    def fail_for_bad(user_id, old, new):
+        if (new or old)['taskId'] == bad['taskId']:
+            raise TypeError('bad item')
+        return original(user_id, old, new)
+
+    monkeypatch.setattr(search, 'index_changes', fail_for_bad)
+    response = lambda_handler({'Records': records}, None)
+
+    sequence = next(r['dynamodb']['SequenceNumber'] for r in records
+                    if gateway.deserialize_item(r['dynamodb']['Keys'])['SK'].endswith(bad['taskId']))
+    assert response['batchItemFailures'] == [{'itemIdentifier': sequence}]
+    _, body, _ = api('GET', '/todos/search', query={'q': 'report'})
+    assert [item['taskId'] for item in body['items']] == [good['taskId']]
@@ -0,0 +1,44 @@
+from common import logger
+from common.dynamodb_helper import create_response
+
+# 各ハンドラを初期化フェーズでまとめて読み込む（DynamoDBクライアントとコネクションは共有される）
+from create_todo.app import lambda_handler as create_todo
+from get_todos.app import lambda_handler as get_todos
+from update_todo.app import lambda_handler as update_todo
+from delete_todo.app import lambda_handler as delete_todo
+from bulk_update_todos.app import lambda_handler as bulk_update_todos
+from bulk_delete_todos.app import lambda_handler as bulk_delete_todos
+from get_changes.app import lambda_handler as get_changes
+from get_summary.app import lambda_handler as get_summary
+from search_todos.app import lambda_handler as search_todos
+
+# ルートテーブル: (HTTPメソッド, リソースパス) -> ハンドラ
+ROUTES = {
+    ('POST', '/todos'): create_todo,
+    ('GET', '/todos'): get_todos,
+    ('PUT', '/todos/{taskId}'): update_todo,
+    ('DELETE', '/todos/{taskId}'): delete_todo,
+    ('POST', '/todos/bulk-update'): bulk_update_todos,
+    ('POST', '/todos/bulk-delete'): bulk_delete_todos,
+    ('GET', '/todos/changes'): get_changes,
+    ('GET', '/todos/summary'): get_summary,
+    ('GET', '/todos/search'): search_todos,
+}
+
+def lambda_handler(event, context):
+    """全ルートを1つの関数で処理するルーター（DeploymentMode=mono）"""
+    
+    method = event.get('httpMethod')
+    resource = event.get('resource')
+    
+    handler = ROUTES.get((method, resource))
+    if handler:
+        return handler(event, context)
+    
+    # パスは存在するがメソッドが異なる場合は405
+    if any(path == resource for _, path in ROUTES):
+        logger.warning('Method not allowed: %s %s', method, resource)
+        return create_response(405, {'error': 'Method not allowed'})
+    
+    logger.warning('Route not found: %s %s', method, resource)
+    return create_response(404, {'error': 'Route not found'})
@@ -0,0 +1,105 @@
+import re
+from pathlib import Path
+
+import pytest
+
+from common import gateway
+from common.dynamodb_helper import resolve_task_key
+from router import app
+
+USER_ID = 'test-user-001'
+
+def stored(task_id):
+    return gateway.get_item(resolve_task_key(USER_ID, task_id))
+
+def test_base64_body_on_create(api):
+    body = {'title': '買い物', 'dueDate': '2030-01-01', 'priority': 'HIGH'}
+    status, response, _ = api('POST', '/todos', body=body, base64_body=True)
+
+    assert status == 201
+    assert stored(response['todo']['taskId'])['title'] == '買い物'
+
+def test_base64_body_on_create_with_idempotency_key(api):
+    body = {'title': 'once', 'dueDate': '2030-01-01', 'priority': 'LOW'}
+    first = api('POST', '/todos', body=body, base64_body=True, headers={'Idempotency-Key': 'k1'})
+    retry = api('POST', '/todos', body=body, headers={'Idempotency-Key': 'k1'})
+
+    assert first[0] == retry[0] == 201
+    assert retry[1] == first[1]
+
+def test_base64_body_on_update(api, create_task):
+    task = create_task()
+    status, _, _ = api('PUT', '/todos/{taskId}', body={'title': 'renamed'}, path_parameters={'taskId': task['taskId']},
+                       base64_body=True)
+
+    assert status == 200
+    assert stored(task['taskId'])['title'] == 'renamed'
+
+def test_base64_body_on_bulk_update(api, create_task):
+    task = create_task()
+    status, body, _ = api('POST', '/todos/bulk-update', body={'taskIds': [task['taskId']], 'patch': {'priority': 'HIGH'}},
+                          base64_body=True)
+
+    assert status == 200
+    assert body['updated'] == 1
+    assert stored(task['taskId'])['priority'] == 'HIGH'
+
+def test_base64_body_on_bulk_delete(api, create_task):
+    task = create_task()
+    status, body, _ = api('POST', '/todos/bulk-delete', body={'scope': 'ALL'}, base64_body=True)
+
+    assert status == 200
+    assert body['deleted'] == 1
+    assert stored(task['taskId']) is None
+
+@pytest.mark.parametrize('method, resource', [('POST', '/todos'), ('POST', '/todos/bulk-update'),
+                                              ('POST', '/todos/bulk-delete')])
+def test_invalid_base64_body_returns_400(method, resource):
+    event = {
+        'resource': resource, 'path': resource, 'httpMethod': method,
+        'headers': {'Content-Type': 'application/json'},
+        'body': 'not base64!', 'isBase64Encoded': True,
+    }
+
+    response = app.lambda_handler(event, None)
+
+    assert response['statusCode'] == 400
+    assert 'base64' in response['body']
+
+def route_event(method, resource):
+    return {
+        'resource': resource, 'path': resource, 'httpMethod': method,
+        'headers': {}, 'queryStringParameters': None, 'pathParameters': None, 'body': None, 'isBase64Encoded': False,
+    }
+
+@pytest.mark.parametrize('method, resource', [('GET', '/todos/unknown'), ('GET', '/'), (None, None)])
+def test_unknown_route_returns_404(method, resource):
+    response = app.lambda_handler(route_event(method, resource), None)
+
+    assert response['statusCode'] == 404
+    assert 'Route not found' in response['body']
+
+@pytest.mark.parametrize('method, resource', [('DELETE', '/todos'), ('GET', '/todos/{taskId}'),
+                                              ('GET', '/todos/bulk-update'), ('POST', '/todos/changes')])
+def test_wrong_method_on_known_route_returns_405(method, resource):
+    response = app.lambda_handler(route_event(method, resource), None)
+
+    assert response['statusCode'] == 405
+    assert 'Method not allowed' in response['body']
+
+@pytest.mark.parametrize('route', sorted(app.ROUTES))
+def test_each_route_reaches_its_handler(route, monkeypatch):
+    calls = []
+    monkeypatch.setitem(app.ROUTES, route, lambda event, context: calls.append(event) or {'statusCode': 200})
+
+    response = app.lambda_handler(route_event(*route), None)
+
+    assert response['statusCode'] == 200
+    assert [(event['httpMethod'], event['resource']) for event in calls] == [route]
+
+def test_routes_match_api_events_in_template():
+    """ルーターの経路はテンプレートのAPIのイベント（関数ごと・monoの両方）と同じ"""
+    template = (Path(__file__).resolve().parents[2] / 'template.yaml').read_text(encoding='utf-8')
+    events = set(re.findall(r'Path: (/todos\S*)\s+Method: (\w+)', template))
+
+    assert {(method.upper(), path) for path, method in events} == set(app.ROUTES)
@@ -0,0 +1,100 @@
+from common import capacity, compression, gateway, logger, metrics, search
+from common.capture import capture_event
+from common.dynamodb_helper import create_response, resolve_task_key, task_projection, task_attributes, parse_fields
+from common.pagination import parse_page_size, encode_page_token, decode_page_token
+
+@logger.log_request
+@metrics.log_metrics
+@compression.compress_response
+@capacity.track_capacity
+def lambda_handler(event, context):
+    """
+    タスクの全文検索（タイトル・説明）
+
+    検索インデックスのポスティングから一致するタスクをスコア順に求め、
+    そのページのタスクだけを BatchGetItem で読む。trigram の積集合は語の連続を
+    保証しないため、読んだタスクが検索語を含まなければ除き、次の候補で埋める。
+    順位の残りはnextTokenに入れ、2ページ目以降はポスティングを読まない。
+    ポスティングの読み込み・順位付けの上限に達した場合は partial: true を返す。
+    """
+
+    logger.debug('Event', payload=event)
+    capture_event(event)
+
+    try:
+        # クエリパラメータ
+        params = event.get('queryStringParameters') or {}
+        next_token = params.get('nextToken')
+
+        try:
+            query_terms = search.parse_query(params.get('q'))
+            limit = parse_page_size(params.get('limit'))
+            fields = parse_fields(params.get('fields'))
+        except ValueError as e:
+            return create_response(400, {'error': str(e)})
+
+        # ユーザーID（固定）
+        user_id = 'test-user-001'
+        logger.append_keys(user=user_id, terms=len(query_terms))
+
+        # ページ間で変わってはいけないクエリ条件（nextTokenに紐づける）
+        query_shape = {
+            'user': user_id,
+            'q': query_terms,
+            'limit': limit
+        }
+
+        # 続きのページ（最初のページで順位付けした候補の残り）
+        if next_token:
+            try:
+                start_key = decode_page_token(next_token, query_shape)
+            except ValueError as e:
+                return create_response(400, {'error': str(e)})
+            try:
+                ranked = search.unpack_candidates(start_key['candidates'])
+            except (ValueError, KeyError, TypeError):
+                # 順位を引き継ぐ前の形式のnextToken
+                return create_response(400, {'error': 'Invalid nextToken'})
+            partial = start_key.get('partial', False)
+        else:
+            ranked, partial = search.search(user_id, query_terms)
+
+        # 照合のためにタイトル・説明も読む（返す項目は fields のみ）
+        attributes = tuple(dict.fromkeys(task_attributes(fields) + ('title', 'description')))
+        project = task_projection(fields)
+
+        clean_items = []
+        consumed = 0
+        while consumed < len(ranked) and len(clean_items) < limit:
+            candidates = ranked[consumed:consumed + limit - len(clean_items)]
+            consumed += len(candidates)
+            keys = [key for key in (resolve_task_key(user_id, task_id) for _, task_id in candidates) if key]
+            tasks = {task['taskId']: task for task in gateway.batch_get(keys, attributes)}
+            for score, task_id in candidates:
+                task = tasks.get(task_id)
+                # 削除済み（インデックスの更新前）や語が連続しない候補は除く
+                if task and search.matches(task, query_terms):
+                    clean_items.append(dict(project(task), score=score))
+
+        logger.append_keys(candidates=len(ranked), itemCount=len(clean_items), hasNextPage=consumed < len(ranked),
+                           partial=partial)
+        metrics.increment('ItemsReturned', len(clean_items))
+
+        result = {
+            'items': clean_items,
+            'count': len(clean_items),
+            # 上限に達し、一致するタスクの一部（新しいタスク・スコアの高いタスク）のみを返す
+            'partial': partial
+        }
+
+        # 次ページがある場合のみnextTokenを返す
+        if consumed < len(ranked):
+            result['nextToken'] = encode_page_token(
+                {'candidates': search.pack_candidates(ranked[consumed:]), 'partial': partial}, query_shape
+            )
+
+        return create_response(200, result)
+
+    except Exception as e:
+        logger.exception('Error: %s', e)
+        return create_response(500, {'error': 'Internal server error', 'details': str(e)})
@@ -0,0 +1,111 @@
+import pytest
+
+from common import search
+
+def search_todos(api, **query):
+    return api('GET', '/todos/search', query=query)
+
+def test_ranks_by_occurrences_then_newest(api, create_task, process_stream):
+    once_old = create_task(title='report draft')
+    twice = create_task(title='report', description='final report')
+    once_new = create_task(title='weekly report')
+    create_task(title='unrelated')
+    process_stream()
+
+    status, body, _ = search_todos(api, q='report')
+
+    assert status == 200
+    assert [item['taskId'] for item in body['items']] == [twice['taskId'], once_new['taskId'], once_old['taskId']]
+    assert [item['score'] for item in body['items']] == [2, 1, 1]
+    assert body['partial'] is False
+    assert 'nextToken' not in body
+
+def test_all_terms_must_match(api, create_task, process_stream):
+    both = create_task(title='会議の資料', description='予算')
+    create_task(title='会議')
+    process_stream()
+
+    _, body, _ = search_todos(api, q='会議 予算')
+
+    assert [item['taskId'] for item in body['items']] == [both['taskId']]
+
+def test_pages_continue_the_first_ranking(api, create_task, process_stream):
+    created = {create_task(title=f'meeting {i}')['taskId'] for i in range(25)}
+    process_stream()
+
+    seen = []
+    token = None
+    pages = 0
+    while True:
+        query = {'q': 'meeting', 'limit': '10'}
+        if token:
+            query['nextToken'] = token
+        status, body, _ = search_todos(api, **query)
+        assert status == 200
+        seen.extend(item['taskId'] for item in body['items'])
+        pages += 1
+        token = body.get('nextToken')
+        if not token:
+            break
+
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 25
+    assert set(seen) == created
+
+def test_later_pages_do_not_read_postings(api, create_task, process_stream, table):
+    for i in range(5):
+        create_task(title=f'meeting {i}')
+    process_stream()
+    _, first, _ = search_todos(api, q='meeting', limit='2')
+    table.stats['calls'].clear()
+
+    _, second, _ = search_todos(api, q='meeting', limit='2', nextToken=first['nextToken'])
+
+    assert len(second['items']) == 2
+    assert 'Query' not in table.stats['calls']
+
+def test_token_is_bound_to_query(api, create_task, process_stream):
+    for i in range(3):
+        create_task(title=f'meeting {i}')
+    process_stream()
+    _, first, _ = search_todos(api, q='meeting', limit='1')
+
+    status, _, _ = search_todos(api, q='meetings', limit='1', nextToken=first['nextToken'])
+    assert status == 400
+    status, _, _ = search_todos(api, q='meeting', limit='1', nextToken='garbage')
+    assert status == 400
+
+def test_result_cap_marks_partial(api, create_task, process_stream, monkeypatch):
+    monkeypatch.setattr(search, 'MAX_RESULTS', 3)
+    for i in range(5):
+        create_task(title=f'meeting {i}')
+    process_stream()
+
+    _, body, _ = search_todos(api, q='meeting')
+
+    assert body['count'] == 3
+    assert body['partial'] is True
+
+def test_deleted_task_is_not_returned_before_index_update(api, create_task, process_stream):
+    kept = create_task(title='meeting notes')
+    removed = create_task(title='meeting agenda')
+    process_stream()
+    api('DELETE', '/todos/{taskId}', path_parameters={'taskId': removed['taskId']})
+
+    _, body, _ = search_todos(api, q='meeting')
+
+    assert [item['taskId'] for item in body['items']] == [kept['taskId']]
+
+def test_updated_title_is_indexed_from_stream(api, create_task, process_stream):
+    task = create_task(title='draft')
+    process_stream()
+    api('PUT', '/todos/{taskId}', body={'title': 'budget'}, path_parameters={'taskId': task['taskId']})
+    process_stream()
+
+    assert search_todos(api, q='draft')[1]['items'] == []
+    assert [item['taskId'] for item in search_todos(api, q='budget')[1]['items']] == [task['taskId']]
+
+@pytest.mark.parametrize('q', [None, '', 'a', 'meeting a'])
+def test_invalid_query(api, q):
+    status, _, _ = search_todos(api, **({'q': q} if q is not None else {}))
+    assert status == 400
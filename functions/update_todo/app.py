@@ -1,192 +1,185 @@
 import json
-import os
-import boto3
-from boto3.dynamodb.conditions import Key
-from datetime import datetime
+from common import capacity, compression, gateway, logger, metrics, summary
+from common.capture import capture_event
+from common.dynamodb_helper import (
+    create_response, resolve_task_key, list_version_action, build_due_keys, build_status_pk, build_etag, task_response,
+    parse_if_match, version_condition, normalize_due_date, get_current_timestamp
+)
 
-# DynamoDBクライアント
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['TABLE_NAME'])
+# 読んだタスクが書き込みまでに変更された場合の再試行回数
+MAX_ATTEMPTS = 3
 
-def find_task(user_id, task_id):
-    """taskIdからタスクを検索"""
-    try:
-        response = table.query(
-            KeyConditionExpression=Key('PK').eq(f'USER#{user_id}')
-        )
-        
-        for item in response.get('Items', []):
-            if item.get('taskId') == task_id:
-                return item
-        
-        return None
-    except Exception as e:
-        print(f"Error finding task: {e}")
-        return None
+def conflict_response(task_id, current):
+    """If-Matchのversionが一致しない（412。現在のETagを返す）"""
+    return create_response(
+        412,
+        {'error': 'Task was modified by another request', 'taskId': task_id},
+        headers={'Access-Control-Expose-Headers': 'ETag', 'ETag': build_etag(current)}
+    )
+
+def not_found_response(task_id):
+    return create_response(404, {'error': 'Task not found', 'taskId': task_id})
+
+def apply_update(user_id, key, changes, expected_version):
+    """
+    タスクを読み、そのversionを条件に1つのトランザクションで更新
+
+    タスクの更新（versionを加算）・一覧のバージョンの加算・status/priorityが変わる場合の
+    件数の集計の増減を TransactWriteItems 1回で書き込む（どれかが失敗すればどれも書き込まない）。
+    versionの条件により status/priority も読んだ値のままのため、集計の増減は読んだアイテムから求める。
+    dueDate/priorityの一方だけを変更する場合は、もう一方の値からGSI1SK/GSI5SKを求める。
+    レスポンスに更新後のタスク全体を返すため、書き込みの前に1回読む。
+    間に別の更新があれば条件チェック失敗時に返るアイテムで計算し直す（If-Matchを指定した場合は412）。
+
+    Returns:
+        tuple: (更新後のアイテム, 412/404の場合の失敗理由とその時点のアイテム)
+    """
+    current = gateway.get_item(key)
+    for _ in range(MAX_ATTEMPTS):
+        if not current:
+            return None, ('not_found', None)
+        version = int(current.get('version', 0))
+        if expected_version is not None and version != expected_version:
+            return None, ('conflict', current)
+
+        task_changes = dict(changes)
+        if 'dueDate' in changes or 'priority' in changes:
+            task_changes.update(build_due_keys(
+                changes.get('dueDate', current.get('dueDate')),
+                changes.get('priority', current.get('priority', 'MEDIUM'))
+            ))
+        updated = dict(current, **task_changes, version=version + 1)
+
+        condition, condition_values = version_condition(version)
+        actions = [
+            gateway.update_action(key, task_changes, condition=condition, condition_values=condition_values,
+                                  add={'version': 1}),
+            list_version_action(user_id)
+        ]
+        counts = summary.delta(current, updated)
+        if counts:
+            actions.append(summary.update_action(user_id, counts))
+        try:
+            gateway.transact_write(actions)
+            return updated, None
+        except gateway.ConditionFailedError as e:
+            current = e.item
 
+    if not current:
+        return None, ('not_found', None)
+    return None, ('conflict', current)
+
+@logger.log_request
+@metrics.log_metrics
+@compression.compress_response
+@capacity.track_capacity
 def lambda_handler(event, context):
-    """タスク更新"""
+    """
+    タスク更新
+
+    If-Match ヘッダー（ETag）を指定した場合は、そのversionのときだけ更新する（異なれば412）。
+    """
     
-    print(f"Event: {json.dumps(event)}")
+    logger.debug('Event', payload=event)
+    capture_event(event)
     
     try:
         # パスパラメータからtaskId取得
         task_id = event.get('pathParameters', {}).get('taskId')
         if not task_id:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'taskId is required'})
-            }
+            return create_response(400, {'error': 'taskId is required'})
         
         # リクエストボディ解析
         body = json.loads(event['body'])
-        print(f"Update taskId={task_id}, body={body}")
+        logger.debug('Update taskId=%s', task_id, payload=body)
         
         # ユーザーID（固定）
         user_id = 'test-user-001'
+        logger.append_keys(user=user_id, taskId=task_id)
         
-        # タスク検索
-        existing_task = find_task(user_id, task_id)
-        if not existing_task:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Task not found', 'taskId': task_id})
-            }
-        
-        print(f"Found task: {existing_task['PK']}, {existing_task['SK']}")
+        # 期待するversion（If-Match）
+        try:
+            expected_version = parse_if_match(event.get('headers'))
+        except ValueError as e:
+            return create_response(400, {'error': str(e)})
         
-        # 更新式を構築
-        update_parts = []
-        attr_values = {}
-        attr_names = {}
+        # 更新する属性を収集
+        changes = {}
         
         # title更新
         if 'title' in body:
-            update_parts.append('#title = :title')
-            attr_names['#title'] = 'title'
-            attr_values[':title'] = body['title']
+            if not isinstance(body['title'], str):
+                return create_response(400, {'error': 'title must be a string'})
+            
+            changes['title'] = body['title']
         
         # description更新
         if 'description' in body:
-            update_parts.append('description = :description')
-            attr_values[':description'] = body['description']
+            if not isinstance(body['description'], str):
+                return create_response(400, {'error': 'description must be a string'})
+            
+            changes['description'] = body['description']
         
-        # dueDate更新
+        # dueDate更新（UTCの正規形にする）
         if 'dueDate' in body:
-            update_parts.append('dueDate = :dueDate')
-            attr_values[':dueDate'] = body['dueDate']
-            
-            # GSI1SKも更新
-            priority = body.get('priority', existing_task.get('priority', 'MEDIUM'))
-            update_parts.append('GSI1SK = :gsi1sk')
-            attr_values[':gsi1sk'] = f"DUE#{body['dueDate']}#{priority}"
+            try:
+                changes['dueDate'] = normalize_due_date(body['dueDate'])
+            except ValueError as e:
+                return create_response(400, {'error': str(e)})
         
         # priority更新
         if 'priority' in body:
             if body['priority'] not in ['HIGH', 'MEDIUM', 'LOW']:
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'priority must be HIGH, MEDIUM, or LOW'})
-                }
+                return create_response(400, {'error': 'priority must be HIGH, MEDIUM, or LOW'})
             
-            update_parts.append('priority = :priority')
-            attr_values[':priority'] = body['priority']
-            
-            # GSI1SKも更新
-            due_date = body.get('dueDate', existing_task.get('dueDate'))
-            update_parts.append('GSI1SK = :gsi1sk')
-            attr_values[':gsi1sk'] = f"DUE#{due_date}#{body['priority']}"
+            changes['priority'] = body['priority']
         
         # status更新
         if 'status' in body:
             if body['status'] not in ['PENDING', 'COMPLETED']:
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'status must be PENDING or COMPLETED'})
-                }
+                return create_response(400, {'error': 'status must be PENDING or COMPLETED'})
+            
+            changes['status'] = body['status']
             
-            update_parts.append('#status = :status')
-            attr_names['#status'] = 'status'
-            attr_values[':status'] = body['status']
+            # GSI2PK（ステータス別インデックス）も更新
+            changes['GSI2PK'] = build_status_pk(user_id, body['status'])
         
         # 更新項目なし
-        if not update_parts:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'No fields to update'})
-            }
+        if not changes:
+            return create_response(400, {'error': 'No fields to update'})
         
         # updatedAt追加
-        current_time = datetime.utcnow().isoformat() + 'Z'
-        update_parts.append('updatedAt = :updatedAt')
-        attr_values[':updatedAt'] = current_time
-        
-        # UpdateExpression構築
-        update_expression = 'SET ' + ', '.join(update_parts)
+        changes['updatedAt'] = get_current_timestamp()
         
-        print(f"UpdateExpression: {update_expression}")
-        print(f"AttributeValues: {attr_values}")
+        logger.debug('Changes', payload=changes)
         
-        # DynamoDB更新
-        update_params = {
-            'Key': {
-                'PK': existing_task['PK'],
-                'SK': existing_task['SK']
-            },
-            'UpdateExpression': update_expression,
-            'ExpressionAttributeValues': attr_values,
-            'ReturnValues': 'ALL_NEW'
-        }
+        # キー解決（新形式のtaskIdはDynamoDBへのアクセスなし）
+        key = resolve_task_key(user_id, task_id)
+        if not key:
+            return not_found_response(task_id)
         
-        if attr_names:
-            update_params['ExpressionAttributeNames'] = attr_names
+        # DynamoDB更新（存在しないタスクを新規作成しない）
+        updated_item, failure = apply_update(user_id, key, changes, expected_version)
+        if failure:
+            reason, current = failure
+            if reason == 'not_found':
+                return not_found_response(task_id)
+            logger.append_keys(conflict=True)
+            return conflict_response(task_id, current)
         
-        response = table.update_item(**update_params)
-        updated_item = response['Attributes']
-        
-        print("Update successful!")
+        logger.append_keys(fields=sorted(changes))
         
         # レスポンス
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'message': 'Task updated successfully',
-                'task': {
-                    'taskId': updated_item['taskId'],
-                    'title': updated_item['title'],
-                    'description': updated_item.get('description', ''),
-                    'dueDate': updated_item['dueDate'],
-                    'priority': updated_item['priority'],
-                    'status': updated_item['status'],
-                    'createdAt': updated_item['createdAt'],
-                    'updatedAt': updated_item['updatedAt']
-                }
-            }, ensure_ascii=False)
-        }
+        return create_response(
+            200,
+            {'message': 'Task updated successfully', 'task': task_response(updated_item)},
+            headers={'Access-Control-Expose-Headers': 'ETag', 'ETag': build_etag(updated_item)}
+        )
         
     except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}")
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Invalid JSON'})
-        }
+        logger.warning('JSON decode error: %s', e)
+        return create_response(400, {'error': 'Invalid JSON'})
     
     except Exception as e:
-        print(f"Error: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Internal server error', 'details': str(e)})
-        }
\ No newline at end of file
+        logger.exception('Error: %s', e)
+        return create_response(500, {'error': 'Internal server error', 'details': str(e)})
\ No newline at end of file
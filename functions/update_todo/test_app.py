@@ -0,0 +1,136 @@
+import pytest
+
+from common import gateway
+from common.dynamodb_helper import build_list_version_key, resolve_task_key
+
+USER_ID = 'test-user-001'
+
+def update(api, task_id, body, if_match=None):
+    headers = {'If-Match': if_match} if if_match else None
+    return api('PUT', '/todos/{taskId}', body=body, path_parameters={'taskId': task_id}, headers=headers)
+
+def stored(task_id):
+    return gateway.get_item(resolve_task_key(USER_ID, task_id))
+
+def test_matching_if_match_updates_and_bumps_etag(api, create_task):
+    task = create_task()
+    status, body, headers = update(api, task['taskId'], {'title': 'renamed'}, if_match=task['etag'])
+
+    assert status == 200
+    assert body['task']['title'] == 'renamed'
+    assert headers['ETag'] == '"2"'
+
+def test_stale_if_match_returns_412_with_current_etag(api, create_task):
+    task = create_task()
+    update(api, task['taskId'], {'title': 'first'})
+
+    status, body, headers = update(api, task['taskId'], {'status': 'COMPLETED'}, if_match=task['etag'])
+
+    assert status == 412
+    assert body['taskId'] == task['taskId']
+    assert headers['ETag'] == '"2"'
+    current = stored(task['taskId'])
+    assert current['status'] == 'PENDING'
+    assert current['title'] == 'first'
+
+def test_invalid_if_match_returns_400(api, create_task):
+    task = create_task()
+    status, _, _ = update(api, task['taskId'], {'title': 'x'}, if_match='W/"abc"')
+    assert status == 400
+
+@pytest.mark.parametrize('field, value', [('title', 1), ('description', None), ('description', {'a': 1})])
+def test_non_string_text_is_rejected(api, create_task, field, value):
+    task = create_task(description='memo')
+    status, body, _ = update(api, task['taskId'], {field: value})
+
+    assert status == 400
+    assert body['error'] == f'{field} must be a string'
+    assert stored(task['taskId'])['version'] == 1
+
+def test_missing_task_returns_404(api, create_task):
+    task = create_task()
+    api('DELETE', '/todos/{taskId}', path_parameters={'taskId': task['taskId']})
+
+    status, _, _ = update(api, task['taskId'], {'status': 'COMPLETED'})
+    assert status == 404
+    assert stored(task['taskId']) is None
+
+def test_status_and_priority_change_move_counters_in_one_transaction(api, create_task, summary, table):
+    task = create_task(priority='HIGH')
+    create_task(priority='LOW')
+    table.stats['calls'].clear()
+
+    status, body, _ = update(api, task['taskId'], {'status': 'COMPLETED', 'priority': 'LOW', 'dueDate': '2031-01-01'})
+
+    assert status == 200
+    assert body['task']['status'] == 'COMPLETED'
+    assert table.stats['calls'] == {'GetItem': 1, 'TransactWriteItems': 1}
+    counts = summary()
+    assert counts['byStatus'] == {'PENDING': 1, 'COMPLETED': 1}
+    assert counts['byPriority'] == {'HIGH': 0, 'MEDIUM': 0, 'LOW': 2}
+    assert counts['pendingByPriority'] == {'HIGH': 0, 'MEDIUM': 0, 'LOW': 1}
+
+def test_priority_only_change_rebuilds_due_keys(api, create_task, summary):
+    task = create_task(priority='MEDIUM', due_date='2030-05-01')
+
+    status, _, _ = update(api, task['taskId'], {'priority': 'HIGH'}, if_match=task['etag'])
+
+    assert status == 200
+    item = stored(task['taskId'])
+    assert item['GSI1SK'] == 'DUE#2030-05-01T00:00:00.000Z#0'
+    assert item['GSI5SK'] == 'PRIO#0#DUE#2030-05-01T00:00:00.000Z'
+    assert summary()['pendingByPriority'] == {'HIGH': 1, 'MEDIUM': 0, 'LOW': 0}
+
+def test_repeated_status_update_does_not_double_count(api, create_task, summary):
+    task = create_task()
+    update(api, task['taskId'], {'status': 'COMPLETED'})
+    update(api, task['taskId'], {'status': 'COMPLETED'})
+
+    assert summary()['byStatus'] == {'PENDING': 0, 'COMPLETED': 1}
+
+def test_failed_transaction_changes_nothing(api, create_task, summary, monkeypatch):
+    task = create_task()
+    before = gateway.get_item(build_list_version_key(USER_ID))['version']
+
+    def fail(actions):
+        raise RuntimeError('transaction failed')
+
+    monkeypatch.setattr(gateway, 'transact_write', fail)
+    status, _, _ = update(api, task['taskId'], {'status': 'COMPLETED'})
+    monkeypatch.undo()
+
+    assert status == 500
+    assert stored(task['taskId'])['status'] == 'PENDING'
+    assert summary()['byStatus'] == {'PENDING': 1, 'COMPLETED': 0}
+    assert gateway.get_item(build_list_version_key(USER_ID))['version'] == before
+
+def test_concurrent_change_is_recomputed(api, create_task, summary, monkeypatch):
+    """読んでから書き込むまでに別の更新があれば、条件チェック失敗時のアイテムから計算し直す"""
+    task = create_task(priority='HIGH')
+    original = gateway.transact_write
+    attempts = []
+
+    def interleave(actions):
+        if not attempts:
+            gateway.update_item(resolve_task_key(USER_ID, task['taskId']), {'title': 'other'}, add={'version': 1})
+        attempts.append(actions)
+        return original(actions)
+
+    monkeypatch.setattr(gateway, 'transact_write', interleave)
+    status, body, headers = update(api, task['taskId'], {'status': 'COMPLETED'})
+    monkeypatch.undo()
+
+    assert status == 200
+    assert len(attempts) == 2
+    assert body['task']['title'] == 'other'
+    assert headers['ETag'] == '"3"'
+    assert summary()['byStatus'] == {'PENDING': 0, 'COMPLETED': 1}
+
+def test_update_bumps_list_version(api, create_task):
+    task = create_task()
+    before = gateway.get_item(build_list_version_key(USER_ID))['version']
+
+    update(api, task['taskId'], {'title': 'renamed'})
+
+    after = gateway.get_item(build_list_version_key(USER_ID))['version']
+    assert after == before + 1
@@ -1,3 +1,5 @@
+from common import logger
+
 def get_user_id_from_event(event):
     """
     API Gateway eventからCognitoユーザーIDを取得
@@ -25,5 +27,5 @@ def get_user_id_from_event(event):
         return user_id
         
     except Exception as e:
-        print(f"Error extracting user_id: {e}")
+        logger.warning('Error extracting user_id: %s', e)
         raise ValueError(f'Failed to get user ID: {str(e)}')
\ No newline at end of file
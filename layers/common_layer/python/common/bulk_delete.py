@@ -0,0 +1,287 @@
+"""
+再開可能な一括削除（完了済みタスクの削除・ユーザーのパーティションのパージ）
+
+対象のキーをページ単位でQueryし、タスクは DeleteItem（ReturnValues=ALL_OLD）を並列に削除する。
+COMPLETED ではステータスが COMPLETED のタスクだけを条件付きで削除する（GSI2/GSI3は結果整合性のため、
+再開されたタスクや削除済みのタスクが返ることがある）。
+ALL はトゥームストーンを含むパーティション全体を削除し、トゥームストーンの代わりに
+パーティションのリセットの印（dynamodb_helper.build_reset_marker）を書き込む。
+検索インデックスのポスティングは、どちらもストリームのコンシューマが削除したタスクの
+変更前のイメージから削除する（ALL でもここでは削除せず、二重に書き込まない）。
+
+25件の削除ごとに、削除前のアイテム（ALL_OLD）から求めた件数の集計（common.summary）の減算、
+一覧のバージョンの加算、ユーザーのパーティション内のジョブアイテム（SK: JOB#DELETE#{scope}）への
+削除件数（タスクの件数）と処理中のページの先頭キーの保存を、1つのトランザクションで行う。
+COMPLETED では同じトランザクションで差分同期用のトゥームストーンを作成し（旧形式のtaskIdは
+ポインタも削除する）、ALL ではリセットの印を更新する。タスク以外のアイテムも、一覧のバージョンと
+リセットの印と同じトランザクションで25件ずつ削除する。削除済みのタスクは何も返さないため、
+同じページを再処理しても二重には減らず、数えもしない。ページの処理後は続きのキーを保存するため、
+呼び出しが時間切れ・スロットリングで中断しても、次の呼び出しはチェックポイントから再開する
+（ALL でもバージョン・集計・リセットの印のアイテムは残す）。
+
+同時に実行できるのはユーザー・範囲ごとに1つだけ。ジョブアイテムの lockedUntil と runId を条件付きで
+書き込んで引き受け、チェックポイントの保存も runId が変わっていない場合だけ行う。中断した呼び出しの
+ジョブは BULK_DELETE_LOCK_SECONDS（関数のタイムアウトより長くする）を過ぎると次の呼び出しが引き継ぐ。
+
+書き込みは BULK_DELETE_WCU_PER_SECOND（GSIを含む消費WCU/秒）を超えないように待機する。
+"""
+import contextvars
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from common import gateway, logger, search, summary
+from common.dynamodb_helper import (
+    build_pk, build_status_pk, build_job_sk, build_task_ref_sk, build_tombstone, build_reset_marker,
+    created_at_from_task_id, get_current_timestamp, list_version_action, TASK_SK_PREFIX, LIST_VERSION_SK, RESET_SK,
+    STATUS_CREATED_INDEX_ENABLED
+)
+
+# 削除の範囲: COMPLETED = 完了済みタスク、ALL = パーティション内の全アイテム
+SCOPES = ('COMPLETED', 'ALL')
+
+# 1秒あたりに消費してよい書き込みキャパシティ（GSIへの書き込みを含む）
+WCU_PER_SECOND = float(os.environ.get('BULK_DELETE_WCU_PER_SECOND', '500'))
+# Query 1回あたりの件数（1ページごとにチェックポイントを保存する）
+PAGE_SIZE = 100
+# 並列に実行するタスクの削除の数（コネクションプール DDB_MAX_POOL_CONNECTIONS 以下にする）
+CONCURRENCY = int(os.environ.get('BULK_DELETE_CONCURRENCY', '16'))
+# 呼び出しがジョブを引き受ける秒数（関数のタイムアウトより長くする）
+LOCK_SECONDS = int(os.environ.get('BULK_DELETE_LOCK_SECONDS', '60'))
+
+# 引き受けられるのはジョブがない・どの呼び出しも引き受けていない・期限切れ（中断した）場合のみ
+_CLAIMABLE = 'attribute_not_exists(lockedUntil) OR lockedUntil < :now'
+# 自分が引き受けたままか（期限切れで別の呼び出しに引き継がれていないか）
+_OWNED = '#runId = :heldBy'
+
+class JobInProgressError(Exception):
+    """同じユーザー・範囲の一括削除を別の呼び出しが実行中"""
+
+class WriteBudget:
+    """消費WCUのトークンバケット（1秒分までのバーストを許す）"""
+
+    def __init__(self, units_per_second: float):
+        self.rate = units_per_second
+        self.allowance = units_per_second
+        self.updated = time.monotonic()
+
+    def spend(self, units: float):
+        """消費したユニットを差し引き、超過分が回復するまで待機"""
+        now = time.monotonic()
+        self.allowance = min(self.rate, self.allowance + (now - self.updated) * self.rate) - units
+        self.updated = now
+        if self.allowance < 0:
+            time.sleep(-self.allowance / self.rate)
+
+def _job_key(user_id: str, scope: str) -> Dict:
+    return {'PK': build_pk(user_id), 'SK': build_job_sk('DELETE', scope)}
+
+def claim(user_id: str, scope: str) -> Dict:
+    """
+    ジョブを引き受け、保存済みの進捗を返す（ジョブアイテムがなければ最初から）
+
+    Raises:
+        JobInProgressError: 別の呼び出しが引き受けている場合
+    """
+    now = int(time.time())
+    run_id = str(uuid.uuid4())
+    try:
+        # 引き受けと進捗の読み込みを1回のUpdateItem（ALL_NEW）で行う
+        job = gateway.update_item(
+            _job_key(user_id, scope), {'lockedUntil': now + LOCK_SECONDS, 'runId': run_id},
+            condition=_CLAIMABLE, condition_values={':now': now}
+        )
+    except gateway.ConditionFailedError as e:
+        raise JobInProgressError(f'Bulk delete {scope} is already running') from e
+    return {
+        'lastKey': json.loads(job['lastKey']) if job.get('lastKey') else None,
+        'deleted': int(job.get('deleted', 0)),
+        'startedAt': job.get('startedAt') or get_current_timestamp(),
+        'lockedUntil': now + LOCK_SECONDS,
+        'runId': run_id,
+    }
+
+def _held(checkpoint: Dict) -> Dict:
+    return {':heldBy': checkpoint['runId']}
+
+def _checkpoint_item(user_id: str, scope: str, checkpoint: Dict) -> Dict:
+    return dict(
+        _job_key(user_id, scope),
+        lastKey=json.dumps(checkpoint['lastKey'], separators=(',', ':')) if checkpoint['lastKey'] else '',
+        deleted=checkpoint['deleted'],
+        startedAt=checkpoint['startedAt'],
+        lockedUntil=checkpoint['lockedUntil'],
+        runId=checkpoint['runId'],
+        updatedAt=get_current_timestamp(),
+    )
+
+def save_checkpoint(user_id: str, scope: str, checkpoint: Dict):
+    """
+    Raises:
+        ConditionFailedError: ジョブが別の呼び出しに引き継がれていた場合
+    """
+    gateway.put_item(_checkpoint_item(user_id, scope, checkpoint), condition=_OWNED, condition_values=_held(checkpoint))
+
+def release(user_id: str, scope: str, checkpoint: Dict):
+    """中断した呼び出しのジョブを手放し、次の呼び出しがすぐに再開できるようにする（引き継がれたジョブは変えない）"""
+    try:
+        gateway.update_item(_job_key(user_id, scope), {'lockedUntil': 0}, condition=_OWNED,
+                            condition_values=_held(checkpoint))
+    except gateway.ConditionFailedError:
+        pass
+
+def _list_actions(user_id: str, scope: str) -> List[Dict]:
+    """削除と同じトランザクションで書き込む一覧のバージョンの加算（ALL ではリセットの印も）"""
+    actions = [list_version_action(user_id)]
+    if scope == 'ALL':
+        # パージはトゥームストーンを残さないため、これより前の同期トークンを無効にする
+        actions.append(gateway.put_action(build_reset_marker(user_id, get_current_timestamp())))
+    return actions
+
+def record_deleted(user_id: str, scope: str, checkpoint: Dict, tasks: List[Dict]) -> float:
+    """
+    削除したタスクの件数をチェックポイントに足し、集計の減算・一覧のバージョンの加算・
+    トゥームストーン（COMPLETED）と同じトランザクションで保存する
+
+    チェックポイントの位置は処理中のページの先頭のまま（再開時に削除済みのタスクは数えない）。
+
+    Returns:
+        float: 消費WCU
+    """
+    counts = {}
+    for task in tasks:
+        summary.merge(counts, summary.delta(task, None))
+    actions = [
+        summary.update_action(user_id, counts),
+        gateway.put_action(_checkpoint_item(user_id, scope, dict(checkpoint, deleted=checkpoint['deleted'] + len(tasks))),
+                           condition=_OWNED, condition_values=_held(checkpoint)),
+        *_list_actions(user_id, scope),
+    ]
+    if scope == 'COMPLETED':
+        actions += _follow_ups(user_id, tasks)
+    units = gateway.transact_write(actions)
+    checkpoint['deleted'] += len(tasks)
+    return units
+
+def _split(scope: str, items: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """1ページ分のアイテムを削除するタスクのキーとそれ以外のキーに分ける"""
+    # このジョブのチェックポイントは完了後に削除する。一覧のバージョンは
+    # 0に戻すと以前に発行したETagと一致してしまうため削除しない。
+    # 集計アイテムはタスクの削除に合わせて減算し、リセットの印はパージのたびに更新する。
+    # ポスティングはストリームのコンシューマが削除する
+    keep = (build_job_sk('DELETE', scope), LIST_VERSION_SK, summary.SUMMARY_SK, RESET_SK)
+    tasks, others = [], []
+    for item in items:
+        if item['SK'] in keep or item['SK'].startswith(search.SEARCH_SK_PREFIX):
+            continue
+        key = {'PK': item['PK'], 'SK': item['SK']}
+        (tasks if item['SK'].startswith(TASK_SK_PREFIX) else others).append(key)
+    return tasks, others
+
+def _delete_task(scope: str, key: Dict) -> Tuple[Optional[Dict], float]:
+    """タスクを1件削除（削除前のタスク（削除しなかった場合はNone）と消費WCU）"""
+    if scope == 'COMPLETED':
+        condition, values = '#status = :status', {':status': 'COMPLETED'}
+    else:
+        condition, values = None, None
+    try:
+        return gateway.delete_returning(key, condition, values)
+    except gateway.ConditionFailedError:
+        # インデックスが古く、再開された・削除済みのタスク
+        return None, 0.0
+
+def _follow_ups(user_id: str, tasks: List[Dict]) -> List[Dict]:
+    """
+    COMPLETED で削除したタスクのトゥームストーンの作成と、旧形式taskIdのポインタの削除のアクション
+    （ALLではパーティションのQueryで別途返る）
+    """
+    deleted_at = get_current_timestamp()
+    actions = []
+    for task in tasks:
+        task_id = task.get('taskId')
+        if not task_id:
+            continue
+        if not created_at_from_task_id(task_id):
+            actions.append(gateway.delete_action({'PK': task['PK'], 'SK': build_task_ref_sk(task_id)}))
+        actions.append(gateway.put_action(build_tombstone(user_id, task_id, deleted_at)))
+    return actions
+
+def _delete_others(user_id: str, scope: str, budget: WriteBudget, keys: List[Dict]):
+    """タスク以外のアイテムを、一覧のバージョンの加算（ALL ではリセットの印も）と同じトランザクションで25件ずつ削除"""
+    for start in range(0, len(keys), gateway.BATCH_WRITE_SIZE):
+        chunk = keys[start:start + gateway.BATCH_WRITE_SIZE]
+        budget.spend(gateway.transact_write(
+            [gateway.delete_action(key) for key in chunk] + _list_actions(user_id, scope)
+        ))
+
+def run(user_id: str, scope: str, deadline: float, wcu_per_second: float = WCU_PER_SECOND) -> Dict:
+    """
+    ジョブを引き受けてチェックポイントから削除を再開し、完了するかdeadline（time.monotonic()）まで続ける
+
+    Returns:
+        dict: status（COMPLETED / IN_PROGRESS）、deleted（ジョブ全体で削除したタスクの件数）、
+              deletedThisRun（この呼び出しで削除したタスクの件数）
+
+    Raises:
+        JobInProgressError: 別の呼び出しが同じジョブを実行中の場合
+        gateway.UnprocessedItemsError: スロットリングが続き削除できなかった場合
+            （チェックポイントは直前の25件の削除まで）
+    """
+    if scope == 'COMPLETED':
+        # GSI3がないスタックではGSI2（どちらも射影はALL）
+        pattern = 'GSI3' if STATUS_CREATED_INDEX_ENABLED else 'GSI2'
+        pk = build_status_pk(user_id, 'COMPLETED')
+    else:
+        pattern, pk = 'PARTITION', build_pk(user_id)
+
+    checkpoint = claim(user_id, scope)
+    if scope == 'ALL':
+        # 削除を始める前に印を書き、パージの途中で発行された同期トークンも無効にする
+        # （以降の削除のトランザクションでも更新する）
+        gateway.put_item(build_reset_marker(user_id, get_current_timestamp()))
+    budget = WriteBudget(wcu_per_second)
+    deleted_this_run = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            while True:
+                # チェックポイントは直前のページの処理後に保存済み
+                if time.monotonic() >= deadline:
+                    logger.info('Bulk delete paused', scope=scope, deleted=checkpoint['deleted'])
+                    release(user_id, scope, checkpoint)
+                    return {'status': 'IN_PROGRESS', 'deleted': checkpoint['deleted'], 'deletedThisRun': deleted_this_run}
+
+                # メインテーブルは強い整合性で読み、削除済みのアイテムを再び返さない
+                items, last_key = gateway.query(pattern, pk, PAGE_SIZE, start_key=checkpoint['lastKey'],
+                                                consistent=pattern == 'PARTITION')
+                task_keys, other_keys = _split(scope, items)
+                for start in range(0, len(task_keys), gateway.BATCH_WRITE_SIZE):
+                    results = list(pool.map(
+                        lambda key: contextvars.copy_context().run(_delete_task, scope, key),
+                        task_keys[start:start + gateway.BATCH_WRITE_SIZE]
+                    ))
+                    budget.spend(sum(units for _, units in results))
+                    tasks = [task for task, _ in results if task]
+                    if not tasks:
+                        continue
+                    # 削除の直後に件数を保存し、続く書き込みが失敗しても進捗を失わない
+                    budget.spend(record_deleted(user_id, scope, checkpoint, tasks))
+                    deleted_this_run += len(tasks)
+
+                _delete_others(user_id, scope, budget, other_keys)
+                checkpoint['lastKey'] = last_key
+
+                if not last_key:
+                    break
+                save_checkpoint(user_id, scope, checkpoint)
+
+        # 完了したらジョブアイテムを削除（次回は最初から実行する）
+        gateway.delete_item(_job_key(user_id, scope), condition=_OWNED, condition_values=_held(checkpoint))
+        return {'status': 'COMPLETED', 'deleted': checkpoint['deleted'], 'deletedThisRun': deleted_this_run}
+    except Exception:
+        # 進捗は直前の保存まで残る。再送ですぐに再開できるようにする
+        release(user_id, scope, checkpoint)
+        raise
@@ -0,0 +1,134 @@
+"""
+DynamoDBの消費キャパシティのリクエスト単位の集計と遅い呼び出しのログ
+
+gatewayはすべての呼び出しで ReturnConsumedCapacity=INDEXES を指定し、結果を record に渡す。
+track_capacity で包んだハンドラは、リクエスト中の合計（RCU/WCU、テーブル・GSIごとの内訳）を
+リクエストのログ行・EMFメトリクスに追加し、CAPACITY_DEBUG_HEADER=1 の場合は
+レスポンスヘッダー X-Consumed-Capacity にも付ける。
+
+レイテンシ（DDB_SLOW_CALL_MS）または消費キャパシティ（DDB_SLOW_CALL_CAPACITY。
+一括・トランザクションの呼び出しは1アイテムあたり）がしきい値を超えた呼び出しは、
+リクエストの終わりに件数と最も遅い呼び出しのキー条件（伏せ字）を1行のWARNINGで出力する。
+"""
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+from typing import Dict
+
+from common import logger, metrics
+
+SLOW_CALL_MS = float(os.environ.get('DDB_SLOW_CALL_MS', '100'))
+# GSIへの書き込みを含めると1アイテムの通常の書き込みでも20WCU程度になる
+SLOW_CALL_CAPACITY = float(os.environ.get('DDB_SLOW_CALL_CAPACITY', '50'))
+DEBUG_HEADER_ENABLED = os.environ.get('CAPACITY_DEBUG_HEADER') == '1'
+DEBUG_HEADER = 'X-Consumed-Capacity'
+
+READ_OPERATIONS = {'get_item', 'query', 'scan', 'batch_get_item'}
+
+# キーの区切りのうち残す部分（USER / TODO / STATUS 等の大文字の種別）
+_KEY_SEGMENT_RE = re.compile(r'^[A-Z][A-Z0-9_]*$')
+
+# リクエスト単位の集計（スレッドごとに独立し、copy_context() でワーカーに引き継げる）
+_usage = contextvars.ContextVar('capacity_usage', default=None)
+# リクエスト中のしきい値を超えた呼び出し（件数と最も遅い呼び出し）
+_slow_calls = contextvars.ContextVar('capacity_slow_calls', default=None)
+_lock = threading.Lock()
+
+def mask_key_value(value: str) -> str:
+    """キーの値から種別以外（ユーザーID・日時・taskId等）を伏せる（USER#abc#STATUS#PENDING -> USER#*#STATUS#*）"""
+    return '#'.join(s if _KEY_SEGMENT_RE.match(s) else '*' for s in value.split('#'))
+
+def _mask_attribute_values(values: Dict) -> Dict:
+    masked = {}
+    for name, value in values.items():
+        s = value.get('S')
+        masked[name] = mask_key_value(s) if s is not None else '*'
+    return masked
+
+def describe_call(params: Dict) -> Dict:
+    """ログ用にリクエストのキー条件を伏せ字で要約"""
+    description = {}
+    if 'IndexName' in params:
+        description['index'] = params['IndexName']
+    if 'KeyConditionExpression' in params:
+        description['keyCondition'] = params['KeyConditionExpression']
+        description['values'] = _mask_attribute_values(params.get('ExpressionAttributeValues', {}))
+    key = params.get('Key') or params.get('Item')
+    if key is not None:
+        description['key'] = _mask_attribute_values({k: key[k] for k in ('PK', 'SK') if k in key})
+    return description
+
+def _item_count(params: Dict) -> int:
+    """呼び出しで読み書きするアイテム数（一括・トランザクション以外は1）"""
+    if 'TransactItems' in params:
+        return max(1, len(params['TransactItems']))
+    if 'RequestItems' in params:
+        return max(1, sum(len(r['Keys']) if isinstance(r, dict) else len(r) for r in params['RequestItems'].values()))
+    return 1
+
+def _parts(consumed: Dict) -> Dict:
+    """ConsumedCapacity（INDEXES）をテーブル・GSIごとのユニットに分解"""
+    parts = {}
+    table = consumed.get('Table')
+    if table:
+        parts['table'] = table.get('CapacityUnits', 0)
+    for name, index in (consumed.get('GlobalSecondaryIndexes') or {}).items():
+        parts[name] = index.get('CapacityUnits', 0)
+    if not parts:
+        parts['table'] = consumed.get('CapacityUnits', 0)
+    return parts
+
+def record(operation: str, consumed, latency_ms: float, params: Dict):
+    """DynamoDB呼び出し1回分の消費キャパシティを記録（gatewayから呼ばれる）"""
+    usage = _usage.get()
+    if usage is None:
+        return
+
+    units = 0.0
+    kind = 'read' if operation in READ_OPERATIONS else 'write'
+    with _lock:
+        for entry in (consumed if isinstance(consumed, list) else [consumed] if consumed else []):
+            units += entry.get('CapacityUnits', 0)
+            by_part = usage['byIndex'].setdefault(kind, {})
+            for part, value in _parts(entry).items():
+                by_part[part] = by_part.get(part, 0) + value
+        usage[kind] += units
+
+    if latency_ms > SLOW_CALL_MS or units / _item_count(params) > SLOW_CALL_CAPACITY:
+        slow = _slow_calls.get()
+        with _lock:
+            slow['count'] += 1
+            if slow['slowest'] is None or latency_ms > slow['slowest']['latencyMs']:
+                slow['slowest'] = dict(operation=operation, latencyMs=round(latency_ms, 3),
+                                       capacityUnits=units, **describe_call(params))
+
+def track_capacity(handler):
+    """リクエスト中の消費キャパシティを集計するデコレータ"""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        usage = {'read': 0.0, 'write': 0.0, 'byIndex': {}}
+        slow = {'count': 0, 'slowest': None}
+        token = _usage.set(usage)
+        slow_token = _slow_calls.set(slow)
+        try:
+            response = handler(event, context)
+        finally:
+            _usage.reset(token)
+            _slow_calls.reset(slow_token)
+            # 一括操作で数百回になってもリクエストごとに1行
+            if slow['count']:
+                logger.warning('Slow DynamoDB calls: %d', slow['count'], slowCalls=slow['count'], **slow['slowest'])
+            logger.append_keys(consumedCapacity=usage)
+            metrics.increment('ConsumedRCU', usage['read'], unit='None')
+            metrics.increment('ConsumedWCU', usage['write'], unit='None')
+
+        if DEBUG_HEADER_ENABLED and response is not None:
+            headers = response.setdefault('headers', {})
+            headers[DEBUG_HEADER] = json.dumps(usage, separators=(',', ':'))
+        return response
+
+    return wrapper
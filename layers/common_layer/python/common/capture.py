@@ -0,0 +1,70 @@
+"""
+トラフィックのキャプチャ（オフラインでのリプレイ用）
+
+環境変数 TRAFFIC_CAPTURE が設定されている場合、受信したAPI Gatewayイベントを
+認証情報を除いてNDJSON（1イベント1行）で書き出す。
+  TRAFFIC_CAPTURE=stdout  標準出力（CloudWatch Logsから抽出する）
+  TRAFFIC_CAPTURE=<path>  ファイルに追記（sam local やエミュレータでの実行時）
+
+requestTimeEpoch などのタイミングは残すため、benchmarks/replay_traffic.py で
+同じ到着間隔のまま再生できる。
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Dict
+
+CAPTURE_TARGET = os.environ.get('TRAFFIC_CAPTURE', '')
+
+# 保存しないヘッダー（小文字で比較）
+STRIPPED_HEADERS = {'authorization', 'cookie', 'x-amz-security-token', 'x-api-key'}
+
+# requestContext のうち保存する項目
+KEPT_CONTEXT_FIELDS = ('resourcePath', 'httpMethod', 'requestTimeEpoch', 'requestId', 'stage')
+
+_lock = threading.Lock()
+
+def _pseudonymize(user_id: str) -> str:
+    """ユーザーIDを不可逆な識別子に置き換える（同じユーザーは同じ値になる）"""
+    return 'user-' + hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:16]
+
+def _strip_headers(headers: Dict) -> Dict:
+    if not headers:
+        return headers
+    return {name: value for name, value in headers.items() if name.lower() not in STRIPPED_HEADERS}
+
+def sanitize_event(event: Dict) -> Dict:
+    """認証ヘッダー・トークン・送信元情報を除いたイベントを返す"""
+    captured = {
+        'resource': event.get('resource'),
+        'path': event.get('path'),
+        'httpMethod': event.get('httpMethod'),
+        'headers': _strip_headers(event.get('headers')),
+        'multiValueHeaders': _strip_headers(event.get('multiValueHeaders')),
+        'queryStringParameters': event.get('queryStringParameters'),
+        'pathParameters': event.get('pathParameters'),
+        'body': event.get('body'),
+        'isBase64Encoded': event.get('isBase64Encoded', False),
+    }
+
+    context = event.get('requestContext') or {}
+    captured_context = {name: context[name] for name in KEPT_CONTEXT_FIELDS if name in context}
+    sub = ((context.get('authorizer') or {}).get('claims') or {}).get('sub')
+    if sub:
+        captured_context['authorizer'] = {'claims': {'sub': _pseudonymize(sub)}}
+    captured['requestContext'] = captured_context
+    return captured
+
+def capture_event(event: Dict):
+    """キャプチャが有効な場合のみイベントを書き出す"""
+    if not CAPTURE_TARGET:
+        return
+
+    line = json.dumps(sanitize_event(event), ensure_ascii=False)
+    if CAPTURE_TARGET == 'stdout':
+        print(line)
+        return
+    with _lock:
+        with open(CAPTURE_TARGET, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
@@ -1,29 +1,120 @@
-import json
 import os
-import boto3
-from datetime import datetime
-from typing import Dict
+import re
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 
-# DynamoDBクライアント初期化
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['TABLE_NAME'])
+from common import gateway, serialization
 
-def create_response(status_code: int, body: Dict) -> Dict:
-    """API Gatewayレスポンスを生成"""
+# Sort Keyのプレフィックス
+TASK_SK_PREFIX = 'TODO#'
+TASK_REF_SK_PREFIX = 'TASKREF#'
+JOB_SK_PREFIX = 'JOB#'
+TOMBSTONE_SK_PREFIX = 'DELETED#'
+# タスク一覧のバージョン（書き込みごとに加算し、一覧の弱いETagにする）
+LIST_VERSION_SK = 'LISTVERSION'
+# パーティションのリセット（一括削除の ALL）の印
+RESET_SK = 'RESET'
+
+# 削除を差分同期で通知する期間（これより古い同期トークンは全件の再取得が必要）
+CHANGES_RETENTION_SECONDS = int(os.environ.get('CHANGES_RETENTION_DAYS', '30')) * 86400
+
+# 一覧のバージョンを加算してからこの秒数はETagを発行しない
+# （GSIは結果整合性のため、直後の一覧には書き込みが反映されていないことがある）
+LIST_ETAG_SETTLE_SECONDS = int(os.environ.get('LIST_ETAG_SETTLE_SECONDS', '2'))
+
+# 優先度のキー上の表現（文字列順が優先度の高い順になる。HIGH/MEDIUM/LOW のままでは HIGH < LOW < MEDIUM）
+PRIORITY_RANK = {'HIGH': '0', 'MEDIUM': '1', 'LOW': '2'}
+# 変更順のインデックス（GSI4）をデプロイしているか（template.yaml の ChangesIndex）
+CHANGES_INDEX_ENABLED = os.environ.get('CHANGES_INDEX', 'enabled') == 'enabled'
+# 優先度順のインデックス（GSI5）をデプロイしているか（template.yaml の PriorityIndex）
+PRIORITY_INDEX_ENABLED = os.environ.get('PRIORITY_INDEX', 'enabled') == 'enabled'
+# ステータス別・作成日順のインデックス（GSI3）をデプロイしているか（template.yaml の StatusCreatedIndex）
+STATUS_CREATED_INDEX_ENABLED = os.environ.get('STATUS_CREATED_INDEX', 'enabled') == 'enabled'
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+def create_response(status_code: int, body: Optional[Dict] = None, headers: Optional[Dict] = None) -> Dict:
+    """
+    API Gatewayレスポンスを生成（すべてのルートのレスポンスはこれで作る）
+
+    Args:
+        body: レスポンスのボディ（Noneは空のボディ。304など）
+        headers: 追加するヘッダー（ETag など）
+    """
+    response_headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key,If-Match,If-None-Match',
+        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
+    }
+    if headers:
+        response_headers.update(headers)
     return {
         'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-        },
-        'body': json.dumps(body, ensure_ascii=False)
+        'headers': response_headers,
+        'body': serialization.dumps(body) if body is not None else ''
     }
 
 def get_current_timestamp() -> str:
-    """ISO8601形式のタイムスタンプを取得"""
-    return datetime.utcnow().isoformat() + 'Z'
+    """
+    現在時刻のタイムスタンプ（format_timestamp の固定長の形式）
+
+    updatedAt などキーや条件で文字列として比較する値に使う。isoformat() はマイクロ秒が0のとき
+    小数部を省くため、同じ秒の値の文字列順が時刻順と一致しない。
+    """
+    return format_timestamp(time.time_ns() // 1000)
+
+def timestamp_seconds_ago(seconds: float) -> str:
+    """現在より seconds 秒前のタイムスタンプ（get_current_timestamp の値と文字列で比較する）"""
+    return format_timestamp(time.time_ns() // 1000 - int(seconds * 1_000_000))
+
+def format_timestamp(epoch_us: int) -> str:
+    """エポックからのマイクロ秒をISO8601形式（マイクロ秒6桁固定）に変換"""
+    dt = _EPOCH + timedelta(microseconds=epoch_us)
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+def new_task_id() -> Tuple[str, str]:
+    """
+    作成時刻を内包したtaskId（UUIDv7）と、そのcreatedAtを生成
+
+    上位48bitにミリ秒、rand_a（12bit）にミリ秒未満のマイクロ秒を格納する
+    （RFC 9562 6.2節 Method 3）。これによりtaskIdだけからSKを復元できる。
+
+    Returns:
+        tuple: (taskId, createdAt)
+    """
+    epoch_us = time.time_ns() // 1000
+    epoch_ms, sub_ms_us = divmod(epoch_us, 1000)
+    rand_b = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    value = (epoch_ms << 80) | (0x7 << 76) | (sub_ms_us << 64) | (0b10 << 62) | rand_b
+    return str(uuid.UUID(int=value)), format_timestamp(epoch_us)
+
+def created_at_from_task_id(task_id: str) -> Optional[str]:
+    """
+    new_task_id()で発行したtaskIdからcreatedAtを復元
+
+    Returns:
+        str: createdAt（旧形式のuuid4など復元できない場合はNone）
+    """
+    try:
+        value = uuid.UUID(task_id)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+    if value.version != 7 or value.variant != uuid.RFC_4122:
+        return None
+
+    epoch_ms = value.int >> 80
+    sub_ms_us = (value.int >> 64) & 0xFFF
+    if sub_ms_us > 999:
+        return None
+
+    return format_timestamp(epoch_ms * 1000 + sub_ms_us)
 
 def build_pk(user_id: str) -> str:
     """Partition Keyを生成"""
@@ -31,8 +122,291 @@ def build_pk(user_id: str) -> str:
 
 def build_sk(task_id: str, created_at: str) -> str:
     """Sort Keyを生成"""
-    return f"TODO#{created_at}#{task_id}"
+    return f"{TASK_SK_PREFIX}{created_at}#{task_id}"
+
+def build_task_ref_sk(task_id: str) -> str:
+    """旧形式taskId用のポインタアイテムのSort Keyを生成"""
+    return f"{TASK_REF_SK_PREFIX}{task_id}"
+
+def build_tombstone(user_id: str, task_id: str, deleted_at: str) -> Dict:
+    """
+    削除したタスクのトゥームストーン（GSI4の変更順に含め、保持期間後にTTLで削除）
+
+    GSI1SK/GSI2PK/GSI5SKを持たないため一覧用のインデックスには含まれない。
+    """
+    return {
+        'PK': build_pk(user_id),
+        'SK': f"{TOMBSTONE_SK_PREFIX}{task_id}",
+        'GSI1PK': build_pk(user_id),
+        'taskId': task_id,
+        'deleted': True,
+        'updatedAt': deleted_at,
+        'expiresAt': int(time.time()) + CHANGES_RETENTION_SECONDS,
+    }
+
+def build_reset_marker(user_id: str, reset_at: str) -> Dict:
+    """
+    パーティションをリセットした印（GSI4の変更順に含め、それより前の同期トークンを無効にする）
+
+    パージではトゥームストーンを作らないため、差分同期はこの印を見て全件の再取得を求める。
+    """
+    return {
+        'PK': build_pk(user_id),
+        'SK': RESET_SK,
+        'GSI1PK': build_pk(user_id),
+        'reset': True,
+        'updatedAt': reset_at,
+    }
+
+def build_job_sk(kind: str, scope: str) -> str:
+    """ユーザーのパーティション内に置くジョブ（進捗のチェックポイント）のSort Keyを生成"""
+    return f"{JOB_SK_PREFIX}{kind}#{scope}"
+
+def format_due_date(value: datetime) -> str:
+    """期限の正規形（UTC・ミリ秒までの固定長。例: 2030-01-31T23:59:59.000Z）"""
+    value = value.astimezone(timezone.utc)
+    return (f"{value.year:04d}-{value.month:02d}-{value.day:02d}T"
+            f"{value.hour:02d}:{value.minute:02d}:{value.second:02d}.{value.microsecond // 1000:03d}Z")
+
+def normalize_due_date(value) -> str:
+    """
+    ISO-8601の日付・日時を期限の正規形にする（書き込み時に使い、GSI1SKの文字列順を時刻順と一致させる）
+
+    タイムゾーンのない日時と日付のみの値はUTCとみなす（'2030-01-31' -> 2030-01-31T00:00:00.000Z）。
+    ミリ秒未満は切り捨てる。
+
+    Raises:
+        ValueError: ISO-8601の日付・日時でない場合
+    """
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError('dueDate must be an ISO-8601 date or date-time')
+    text = value.strip()
+    if text[-1:] in ('Z', 'z'):
+        text = text[:-1] + '+00:00'
+    try:
+        parsed = datetime.fromisoformat(text)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return format_due_date(parsed)
+    except (ValueError, OverflowError):
+        # UTCへの変換で範囲外になる日時（0001-01-01T00:00:00+09:00 など）も不正とする
+        raise ValueError('dueDate must be an ISO-8601 date or date-time') from None
+
+def _due_bound(value: str, name: str) -> str:
+    """範囲の端の値（日付のみはその日付、日時は正規形）"""
+    if not isinstance(value, str):
+        raise ValueError(f'{name} must be an ISO-8601 date or date-time')
+    if _DATE_RE.match(value):
+        try:
+            datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f'{name} must be an ISO-8601 date or date-time') from None
+        return value
+    try:
+        return normalize_due_date(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO-8601 date or date-time') from None
 
 def build_gsi1_sk(due_date: str, priority: str) -> str:
-    """GSI1 Sort Keyを生成"""
-    return f"DUE#{due_date}#{priority}"
\ No newline at end of file
+    """GSI1 Sort Keyを生成（due_date は正規形。同じ期限は優先度の高い順）"""
+    return f"DUE#{due_date}#{PRIORITY_RANK[priority]}"
+
+def build_gsi5_sk(due_date: str, priority: str) -> str:
+    """GSI5（優先度順・同じ優先度は期限順）のSort Keyを生成（due_date は正規形）"""
+    return f"PRIO#{PRIORITY_RANK[priority]}#DUE#{due_date}"
+
+def build_due_keys(due_date: str, priority: str) -> Dict:
+    """期限・優先度から求めるインデックスのキー（GSI1SK/GSI5SK）。どちらかを変更したら両方を書き込む"""
+    return {
+        'GSI1SK': build_gsi1_sk(due_date, priority),
+        'GSI5SK': build_gsi5_sk(due_date, priority),
+    }
+
+def build_due_range(due_from: Optional[str], due_to: Optional[str]) -> Dict:
+    """
+    期限の範囲からGSI1SKのBETWEEN条件の値（:from / :to）を生成
+
+    日付のみの値はUTCのその日全体を表す（due_to の '2030-01-31' は 2030-01-31T23:59:59.999Z も含む）。
+    日時の値は正規化し、その時刻ちょうどの期限も含める。省略した側は範囲の端まで。
+
+    Raises:
+        ValueError: 値がISO-8601の日付・日時でない、または due_from が due_to より後の場合
+    """
+    start = _due_bound(due_from, 'dueFrom') if due_from else ''
+    end = _due_bound(due_to, 'dueTo') if due_to else ''
+    values = {
+        ':from': f"DUE#{start}",
+        ':to': f"DUE#{end}~",
+    }
+    # BETWEEN の下限が上限より大きいとDynamoDBはValidationExceptionを返す
+    if values[':from'] > values[':to']:
+        raise ValueError('dueFrom must not be after dueTo')
+    return values
+
+def build_priority_range(priority: str, due_from: Optional[str] = None, due_to: Optional[str] = None) -> Dict:
+    """
+    優先度と期限の範囲からGSI5SKのBETWEEN条件の値（:from / :to）を生成
+
+    1つの優先度のタスクを期限順に読むキーの範囲（期限の扱いは build_due_range と同じ）。
+
+    Raises:
+        ValueError: 期限の値が不正、または due_from が due_to より後の場合
+    """
+    prefix = f"PRIO#{PRIORITY_RANK[priority]}#"
+    return {name: prefix + value for name, value in build_due_range(due_from, due_to).items()}
+
+def build_due_before(due_before: datetime) -> Dict:
+    """期限が due_before より前（GSI1SK < :before）の条件の値"""
+    return {':before': f"DUE#{format_due_date(due_before)}"}
+
+def build_status_pk(user_id: str, status: str) -> str:
+    """GSI2/GSI3（ステータス別インデックス）のPartition Keyを生成"""
+    return f"USER#{user_id}#STATUS#{status}"
+
+def build_etag(item: Dict) -> str:
+    """タスクのETag（書き込みごとに加算されるversion。version導入前のタスクは0）"""
+    return f'"{int(item.get("version", 0))}"'
+
+# レスポンスのタスクの項目（APIで公開する属性のみ。キーやGSIの属性は含めない。この順で出力する）
+TASK_FIELDS = ('taskId', 'title', 'description', 'dueDate', 'priority', 'status', 'createdAt', 'updatedAt', 'etag')
+
+@lru_cache(maxsize=32)
+def task_projection(fields: Tuple[str, ...] = TASK_FIELDS) -> serialization.Projection:
+    """指定した項目だけのタスクのレスポンス形式（fields は parse_fields の戻り値）"""
+    return serialization.Projection(
+        [('description', '') if name == 'description' else name for name in fields if name != 'etag'],
+        **({'etag': build_etag} if 'etag' in fields else {})
+    )
+
+def task_attributes(fields: Tuple[str, ...] = TASK_FIELDS) -> Tuple[str, ...]:
+    """
+    項目の作成に読むアイテムの属性（QueryのProjectionExpression。etag は version から作る）
+
+    すべての項目の属性は template.yaml の GSI5 の射影（NonKeyAttributes）と同じ。
+    """
+    return tuple('version' if name == 'etag' else name for name in fields)
+
+def parse_fields(value: Optional[str]) -> Tuple[str, ...]:
+    """
+    ?fields= の値（カンマ区切り）をTASK_FIELDSの順の項目に変換（taskIdは常に含める。未指定はすべて）
+
+    Raises:
+        ValueError: TASK_FIELDS にない項目
+    """
+    if not value:
+        return TASK_FIELDS
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = sorted(names - set(TASK_FIELDS))
+    if unknown:
+        raise ValueError(f"unknown field: {', '.join(unknown)}")
+    names.add('taskId')
+    return tuple(name for name in TASK_FIELDS if name in names)
+
+task_response = task_projection()
+
+def parse_if_match(headers: Optional[Dict]) -> Optional[int]:
+    """
+    If-Match ヘッダーから期待するversionを取得
+
+    Returns:
+        int: 期待するversion（ヘッダーがない、または * の場合はNone）
+
+    Raises:
+        ValueError: build_etag で発行した形式でない場合
+    """
+    value = None
+    for name, header in (headers or {}).items():
+        if name.lower() == 'if-match':
+            value = header.strip()
+    if value is None or value == '*':
+        return None
+
+    tag = value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+    if not tag.isdigit():
+        raise ValueError('If-Match must be an ETag returned by the API')
+    return int(tag)
+
+def build_list_version_key(user_id: str) -> Dict:
+    """ユーザーのタスク一覧のバージョンアイテムのキー"""
+    return {'PK': build_pk(user_id), 'SK': LIST_VERSION_SK}
+
+def bump_list_version(user_id: str):
+    """一括処理の後に一覧のバージョンを加算（アイテムがなければ1から）"""
+    gateway.update_item(
+        build_list_version_key(user_id), {'updatedAt': get_current_timestamp()},
+        condition=None, add={'version': 1}
+    )
+
+def list_version_action(user_id: str) -> Dict:
+    """一覧のバージョンを加算する transact_write のアクション（タスクの書き込みと同じトランザクションにする）"""
+    return gateway.update_action(
+        build_list_version_key(user_id), {'updatedAt': get_current_timestamp()},
+        condition=None, add={'version': 1}
+    )
+
+def get_list_version(user_id: str) -> Dict:
+    """一覧のバージョン（強い整合性のGetItem 1回。一度も書き込みがなければversion 0）"""
+    item = gateway.get_item(build_list_version_key(user_id), consistent=True)
+    return item or {'version': 0}
+
+def build_list_etag(list_version: Dict) -> str:
+    """一覧の弱いETag（W/"{version}"。一覧のページ・絞り込みによらずユーザーごとに1つ）"""
+    return f'W/"{int(list_version.get("version", 0))}"'
+
+def is_list_version_settled(list_version: Dict) -> bool:
+    """
+    加算から LIST_ETAG_SETTLE_SECONDS 以上経ったか
+
+    経っていない場合はGSIに未反映の一覧をそのバージョンとしてキャッシュさせないよう、
+    ETagを返さない。
+    """
+    updated_at = list_version.get('updatedAt')
+    if not updated_at:
+        return True
+    return updated_at <= timestamp_seconds_ago(LIST_ETAG_SETTLE_SECONDS)
+
+def if_none_match(headers: Optional[Dict], etag: str) -> bool:
+    """If-None-Match ヘッダーのいずれかのETagが一致するか（弱い比較。* は常に一致）"""
+    for name, value in (headers or {}).items():
+        if name.lower() != 'if-none-match':
+            continue
+        for tag in value.split(','):
+            tag = tag.strip()
+            if tag == '*' or tag.removeprefix('W/') == etag.removeprefix('W/'):
+                return True
+    return False
+
+def version_condition(expected_version: Optional[int]) -> Tuple[str, Optional[Dict]]:
+    """
+    書き込みの条件式（condition, condition_values）
+
+    期待するversionがない場合はアイテムが存在することのみを条件にする。
+    """
+    if expected_version is None:
+        return gateway.ITEM_EXISTS, None
+    if expected_version == 0:
+        return 'attribute_exists(PK) AND attribute_not_exists(#version)', None
+    return '#version = :expectedVersion', {':expectedVersion': expected_version}
+
+def resolve_task_key(user_id: str, task_id: str) -> Optional[Dict]:
+    """
+    taskIdからタスクアイテムのキー（PK/SK）を解決
+
+    新形式のtaskIdはSKを計算で求めるためDynamoDBへのアクセスは発生しない。
+    旧形式（uuid4）のtaskIdはマイグレーションで作成したポインタアイテムを
+    GetItemで1回だけ参照する。パーティションのサイズには依存しない。
+
+    Returns:
+        dict: {'PK': ..., 'SK': ...}（タスクが存在しない場合はNone）
+    """
+    pk = build_pk(user_id)
+
+    created_at = created_at_from_task_id(task_id)
+    if created_at:
+        return {'PK': pk, 'SK': build_sk(task_id, created_at)}
+
+    ref = gateway.get_item({'PK': pk, 'SK': build_task_ref_sk(task_id)}, projection='targetSK')
+    if not ref:
+        return None
+
+    return {'PK': pk, 'SK': ref['targetSK']}
\ No newline at end of file
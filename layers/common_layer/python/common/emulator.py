@@ -0,0 +1,1301 @@
+"""
+インメモリのDynamoDBエミュレータ（ローカルの負荷試験・ベンチマーク用）
+
+botocoreのDynamoDBクライアントのうち、このアプリケーションが使う操作を
+同じ引数・戻り値（DynamoDB形式）で提供する。gatewayは環境変数
+DYNAMODB_EMULATOR=1 のときに本物のクライアントの代わりにこれを使う。
+
+対応範囲:
+  - get_item / put_item / update_item / delete_item / query / scan / batch_get_item / batch_write_item
+  - transact_write_items（Put / Update / Delete / ConditionCheck と CancellationReasons）
+  - GSI（スパースインデックス、ALL / KEYS_ONLY / INCLUDE の射影）
+  - Limit / ExclusiveStartKey / LastEvaluatedKey と 1MB のページ上限
+  - ConditionExpression / FilterExpression / KeyConditionExpression / ProjectionExpression
+  - UpdateExpression（SET / REMOVE / ADD / DELETE、if_not_exists、list_append、+ / -）
+  - ReturnConsumedCapacity（TOTAL / INDEXES）と ReturnValues
+  - DynamoDB Streams（NEW_AND_OLD_IMAGES）のレコード。drain_stream で取り出し、
+    Lambdaのイベント（{'Records': [...]}）としてストリームのコンシューマに渡す
+
+対応しないもの: ネストした属性パス、予約語のチェック、スループットの制限。
+"""
+import bisect
+import collections
+import copy
+import math
+import re
+import threading
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+# template.yaml の TodoTable と同じキー・インデックス定義
+TABLE_DEFINITION = {
+    'AttributeDefinitions': [
+        {'AttributeName': 'PK', 'AttributeType': 'S'},
+        {'AttributeName': 'SK', 'AttributeType': 'S'},
+        {'AttributeName': 'GSI1PK', 'AttributeType': 'S'},
+        {'AttributeName': 'GSI1SK', 'AttributeType': 'S'},
+        {'AttributeName': 'GSI2PK', 'AttributeType': 'S'},
+        {'AttributeName': 'updatedAt', 'AttributeType': 'S'},
+        {'AttributeName': 'GSI5SK', 'AttributeType': 'S'},
+    ],
+    'KeySchema': [
+        {'AttributeName': 'PK', 'KeyType': 'HASH'},
+        {'AttributeName': 'SK', 'KeyType': 'RANGE'},
+    ],
+    'GlobalSecondaryIndexes': [
+        {
+            'IndexName': 'GSI1',
+            'KeySchema': [
+                {'AttributeName': 'GSI1PK', 'KeyType': 'HASH'},
+                {'AttributeName': 'GSI1SK', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        },
+        {
+            'IndexName': 'GSI2',
+            'KeySchema': [
+                {'AttributeName': 'GSI2PK', 'KeyType': 'HASH'},
+                {'AttributeName': 'GSI1SK', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        },
+        {
+            'IndexName': 'GSI3',
+            'KeySchema': [
+                {'AttributeName': 'GSI2PK', 'KeyType': 'HASH'},
+                {'AttributeName': 'SK', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        },
+        {
+            'IndexName': 'GSI4',
+            'KeySchema': [
+                {'AttributeName': 'GSI1PK', 'KeyType': 'HASH'},
+                {'AttributeName': 'updatedAt', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        },
+        {
+            'IndexName': 'GSI5',
+            'KeySchema': [
+                {'AttributeName': 'GSI1PK', 'KeyType': 'HASH'},
+                {'AttributeName': 'GSI5SK', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {
+                'ProjectionType': 'INCLUDE',
+                'NonKeyAttributes': ['taskId', 'title', 'description', 'dueDate', 'priority', 'status',
+                                     'createdAt', 'updatedAt', 'version'],
+            },
+        },
+    ],
+    'BillingMode': 'PAY_PER_REQUEST',
+    'StreamSpecification': {'StreamEnabled': True, 'StreamViewType': 'NEW_AND_OLD_IMAGES'},
+}
+
+PAGE_SIZE_LIMIT = 1024 * 1024
+ITEM_SIZE_LIMIT = 400 * 1024
+READ_UNIT_BYTES = 4096
+WRITE_UNIT_BYTES = 1024
+BATCH_WRITE_LIMIT = 25
+BATCH_GET_LIMIT = 100
+TRANSACT_WRITE_LIMIT = 100
+# 取り出されていないストリームのレコードの保持件数（DynamoDB Streamsの24時間の保持の代わり）
+STREAM_RETENTION_RECORDS = 100000
+
+def _error(code: str, message: str, operation: str, **extra) -> ClientError:
+    response = {'Error': {'Code': code, 'Message': message}}
+    response.update(extra)
+    return ClientError(response, operation)
+
+def _validation(message: str, operation: str) -> ClientError:
+    return _error('ValidationException', message, operation)
+
+# ---------------------------------------------------------------------------
+# 属性値
+# ---------------------------------------------------------------------------
+
+def _type_of(value: Dict) -> str:
+    for type_code in value:
+        return type_code
+    raise ValueError('Empty attribute value')
+
+def _python(value: Dict):
+    """比較用にDynamoDB形式の値をPythonの値へ変換"""
+    type_code = _type_of(value)
+    data = value[type_code]
+    if type_code in ('S', 'B', 'BOOL'):
+        return data
+    if type_code == 'N':
+        return Decimal(data)
+    if type_code == 'NULL':
+        return None
+    if type_code == 'SS' or type_code == 'BS':
+        return frozenset(data)
+    if type_code == 'NS':
+        return frozenset(Decimal(v) for v in data)
+    if type_code == 'L':
+        return [(_type_of(v), _python(v)) for v in data]
+    if type_code == 'M':
+        return {k: (_type_of(v), _python(v)) for k, v in data.items()}
+    raise ValueError(f'Unknown attribute type: {type_code}')
+
+def _key_value(value: Dict):
+    """キー属性（S / N / B）の並び順を決める値"""
+    type_code = _type_of(value)
+    if type_code == 'N':
+        return Decimal(value['N'])
+    return value[type_code]
+
+def _copy_value(value: Dict) -> Dict:
+    type_code = _type_of(value)
+    if type_code in ('S', 'N', 'B', 'BOOL', 'NULL'):
+        return {type_code: value[type_code]}
+    return copy.deepcopy(value)
+
+def _copy_item(item: Dict) -> Dict:
+    return {name: _copy_value(value) for name, value in item.items()}
+
+def _value_size(value: Dict) -> int:
+    type_code = _type_of(value)
+    data = value[type_code]
+    if type_code == 'S':
+        return len(data) if data.isascii() else len(data.encode('utf-8'))
+    if type_code == 'N':
+        digits = data.lstrip('-').replace('.', '').lstrip('0') or '0'
+        return (len(digits) + 1) // 2 + 1
+    if type_code == 'B':
+        return len(data)
+    if type_code in ('BOOL', 'NULL'):
+        return 1
+    if type_code == 'SS':
+        return sum(len(v.encode('utf-8')) for v in data)
+    if type_code == 'NS':
+        return sum(_value_size({'N': v}) for v in data)
+    if type_code == 'BS':
+        return sum(len(v) for v in data)
+    if type_code == 'L':
+        return 3 + sum(1 + _value_size(v) for v in data)
+    if type_code == 'M':
+        return 3 + sum(len(k.encode('utf-8')) + 1 + _value_size(v) for k, v in data.items())
+    return 0
+
+def item_size(item: Dict) -> int:
+    """アイテムのサイズ（バイト）。キャパシティユニットの計算に使う"""
+    return sum((len(name) if name.isascii() else len(name.encode('utf-8'))) + _value_size(value)
+               for name, value in item.items())
+
+def _format_number(value: Decimal) -> str:
+    text = format(value, 'f')
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return text or '0'
+
+# ---------------------------------------------------------------------------
+# 式のパーサ
+# ---------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(
+    r'\s*(?:(?P<name>#[A-Za-z0-9_]+)|(?P<value>:[A-Za-z0-9_]+)'
+    r'|(?P<op><>|<=|>=|[=<>(),+\-\[\].])|(?P<ident>[A-Za-z_][A-Za-z0-9_]*)|(?P<num>[0-9]+))'
+)
+_KEYWORDS = {'AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'REMOVE', 'ADD', 'DELETE'}
+_CONDITION_FUNCTIONS = {'attribute_exists', 'attribute_not_exists', 'attribute_type', 'begins_with', 'contains'}
+_COMPARATORS = {'=', '<>', '<', '<=', '>', '>='}
+
+class _ExpressionError(Exception):
+    pass
+
+def _tokenize(expression: str) -> List:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if not match or match.end() == position:
+            raise _ExpressionError(f'Invalid syntax near: {expression[position:position + 20]!r}')
+        position = match.end()
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'ident' and text.upper() in _KEYWORDS:
+            tokens.append(('kw', text.upper()))
+        else:
+            tokens.append((kind, text))
+    return tokens
+
+class _Parser:
+    def __init__(self, expression: str):
+        self.tokens = _tokenize(expression)
+        self.index = 0
+
+    def peek(self, offset=0):
+        position = self.index + offset
+        return self.tokens[position] if position < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, text=None):
+        token = self.peek()
+        if token[0] is None or (kind and token[0] != kind) or (text and token[1] != text):
+            raise _ExpressionError(f'Unexpected token {token[1]!r}, expected {text or kind}')
+        self.index += 1
+        return token
+
+    def accept(self, kind, text=None):
+        token = self.peek()
+        if token[0] == kind and (text is None or token[1] == text):
+            self.index += 1
+            return True
+        return False
+
+    def done(self):
+        if self.index != len(self.tokens):
+            raise _ExpressionError(f'Unexpected token {self.peek()[1]!r}')
+
+    # パス（トップレベルの属性のみ）
+    def path(self):
+        kind, text = self.take()
+        if kind not in ('name', 'ident'):
+            raise _ExpressionError(f'Invalid attribute path: {text!r}')
+        if self.peek()[1] in ('.', '['):
+            raise _ExpressionError('Nested attribute paths are not supported by the emulator')
+        return ('path', text)
+
+    # 条件式
+    def condition(self):
+        node = self.conjunction()
+        while self.accept('kw', 'OR'):
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.accept('kw', 'AND'):
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.accept('kw', 'NOT'):
+            return ('not', self.negation())
+        return self.predicate()
+
+    def predicate(self):
+        kind, text = self.peek()
+        if kind == 'op' and text == '(':
+            self.take()
+            node = self.condition()
+            self.take('op', ')')
+            return node
+        if kind == 'ident' and text in _CONDITION_FUNCTIONS and self.peek(1)[1] == '(':
+            self.take()
+            self.take('op', '(')
+            args = [self.path()]
+            while self.accept('op', ','):
+                args.append(self.operand())
+            self.take('op', ')')
+            return ('func', text, args)
+
+        left = self.operand()
+        kind, text = self.peek()
+        if kind == 'op' and text in _COMPARATORS:
+            self.take()
+            return ('cmp', text, left, self.operand())
+        if self.accept('kw', 'BETWEEN'):
+            low = self.operand()
+            self.take('kw', 'AND')
+            return ('between', left, low, self.operand())
+        if self.accept('kw', 'IN'):
+            self.take('op', '(')
+            options = [self.operand()]
+            while self.accept('op', ','):
+                options.append(self.operand())
+            self.take('op', ')')
+            return ('in', left, options)
+        raise _ExpressionError(f'Unexpected token {text!r}')
+
+    def operand(self):
+        kind, text = self.peek()
+        if kind == 'value':
+            self.take()
+            return ('value', text)
+        if kind == 'ident' and text == 'size' and self.peek(1)[1] == '(':
+            self.take()
+            self.take('op', '(')
+            node = ('size', self.path())
+            self.take('op', ')')
+            return node
+        return self.path()
+
+    # 更新式
+    def update(self):
+        actions = []
+        while self.peek()[0] is not None:
+            clause = self.take('kw')[1]
+            while True:
+                if clause == 'SET':
+                    target = self.path()
+                    self.take('op', '=')
+                    actions.append(('set', target, self.set_value()))
+                elif clause == 'REMOVE':
+                    actions.append(('remove', self.path()))
+                elif clause in ('ADD', 'DELETE'):
+                    target = self.path()
+                    actions.append((clause.lower(), target, self.operand()))
+                else:
+                    raise _ExpressionError(f'Invalid update clause: {clause}')
+                if not self.accept('op', ','):
+                    break
+        return actions
+
+    def set_value(self):
+        node = self.set_operand()
+        if self.accept('op', '+'):
+            return ('plus', node, self.set_operand())
+        if self.accept('op', '-'):
+            return ('minus', node, self.set_operand())
+        return node
+
+    def set_operand(self):
+        kind, text = self.peek()
+        if kind == 'ident' and text in ('if_not_exists', 'list_append') and self.peek(1)[1] == '(':
+            self.take()
+            self.take('op', '(')
+            first = self.path() if text == 'if_not_exists' else self.set_operand()
+            self.take('op', ',')
+            second = self.set_operand()
+            self.take('op', ')')
+            return (text, first, second)
+        return self.operand()
+
+@lru_cache(maxsize=1024)
+def _parse_condition(expression: str):
+    parser = _Parser(expression)
+    node = parser.condition()
+    parser.done()
+    return node
+
+@lru_cache(maxsize=1024)
+def _parse_update(expression: str):
+    parser = _Parser(expression)
+    actions = parser.update()
+    parser.done()
+    return actions
+
+@lru_cache(maxsize=1024)
+def _parse_projection(expression: str):
+    parser = _Parser(expression)
+    paths = [parser.path()]
+    while parser.accept('op', ','):
+        paths.append(parser.path())
+    parser.done()
+    return paths
+
+# ---------------------------------------------------------------------------
+# 式の評価
+# ---------------------------------------------------------------------------
+
+class _Context:
+    """ExpressionAttributeNames / Values の解決"""
+
+    def __init__(self, names: Optional[Dict], values: Optional[Dict]):
+        self.names = names or {}
+        self.values = values or {}
+
+    def name(self, path) -> str:
+        text = path[1]
+        if text.startswith('#'):
+            if text not in self.names:
+                raise _ExpressionError(f'An expression attribute name used in the document path is not defined: {text}')
+            return self.names[text]
+        return text
+
+    def value(self, placeholder: str) -> Dict:
+        if placeholder not in self.values:
+            raise _ExpressionError(f'An expression attribute value used in expression is not defined: {placeholder}')
+        return self.values[placeholder]
+
+    def operand(self, node, item: Dict) -> Optional[Dict]:
+        kind = node[0]
+        if kind == 'path':
+            return item.get(self.name(node))
+        if kind == 'value':
+            return self.value(node[1])
+        if kind == 'size':
+            target = item.get(self.name(node[1]))
+            if target is None:
+                return None
+            data = target[_type_of(target)]
+            return {'N': str(len(data))}
+        raise _ExpressionError(f'Invalid operand: {kind}')
+
+def _compare(op: str, left: Optional[Dict], right: Optional[Dict]) -> bool:
+    if left is None or right is None:
+        return op == '<>' and (left is None) != (right is None)
+    left_type, right_type = _type_of(left), _type_of(right)
+    if op in ('=', '<>'):
+        equal = left_type == right_type and _python(left) == _python(right)
+        return equal if op == '=' else not equal
+    if left_type != right_type or left_type not in ('S', 'N', 'B'):
+        return False
+    a, b = _python(left), _python(right)
+    if op == '<':
+        return a < b
+    if op == '<=':
+        return a <= b
+    if op == '>':
+        return a > b
+    return a >= b
+
+def _evaluate(node, item: Dict, ctx: _Context) -> bool:
+    kind = node[0]
+    if kind == 'and':
+        return _evaluate(node[1], item, ctx) and _evaluate(node[2], item, ctx)
+    if kind == 'or':
+        return _evaluate(node[1], item, ctx) or _evaluate(node[2], item, ctx)
+    if kind == 'not':
+        return not _evaluate(node[1], item, ctx)
+    if kind == 'cmp':
+        return _compare(node[1], ctx.operand(node[2], item), ctx.operand(node[3], item))
+    if kind == 'between':
+        value = ctx.operand(node[1], item)
+        return _compare('>=', value, ctx.operand(node[2], item)) and _compare('<=', value, ctx.operand(node[3], item))
+    if kind == 'in':
+        value = ctx.operand(node[1], item)
+        return any(_compare('=', value, ctx.operand(option, item)) for option in node[2])
+    if kind == 'func':
+        name, args = node[1], node[2]
+        target = item.get(ctx.name(args[0]))
+        if name == 'attribute_exists':
+            return target is not None
+        if name == 'attribute_not_exists':
+            return target is None
+        if target is None:
+            return False
+        operand = ctx.operand(args[1], item)
+        if operand is None:
+            return False
+        if name == 'attribute_type':
+            return _type_of(target) == operand.get('S')
+        if name == 'begins_with':
+            target_type = _type_of(target)
+            return target_type in ('S', 'B') and target_type == _type_of(operand) \
+                and target[target_type].startswith(operand[target_type])
+        if name == 'contains':
+            target_type = _type_of(target)
+            if target_type == 'S':
+                return _type_of(operand) == 'S' and operand['S'] in target['S']
+            if target_type in ('SS', 'NS', 'BS'):
+                return _python(operand) in _python(target)
+            if target_type == 'L':
+                return (_type_of(operand), _python(operand)) in _python(target)
+            return False
+    raise _ExpressionError(f'Invalid condition: {kind}')
+
+def _set_value(node, item: Dict, ctx: _Context) -> Dict:
+    kind = node[0]
+    if kind in ('plus', 'minus'):
+        left, right = _set_value(node[1], item, ctx), _set_value(node[2], item, ctx)
+        if _type_of(left) != 'N' or _type_of(right) != 'N':
+            raise _ExpressionError('An operand in the update expression has an incorrect data type')
+        a, b = Decimal(left['N']), Decimal(right['N'])
+        return {'N': _format_number(a + b if kind == 'plus' else a - b)}
+    if kind == 'if_not_exists':
+        existing = item.get(ctx.name(node[1]))
+        return existing if existing is not None else _set_value(node[2], item, ctx)
+    if kind == 'list_append':
+        left, right = _set_value(node[1], item, ctx), _set_value(node[2], item, ctx)
+        if _type_of(left) != 'L' or _type_of(right) != 'L':
+            raise _ExpressionError('list_append requires list operands')
+        return {'L': left['L'] + right['L']}
+    value = ctx.operand(node, item)
+    if value is None:
+        raise _ExpressionError('The provided expression refers to an attribute that does not exist in the item')
+    return value
+
+def _apply_update(actions, item: Dict, ctx: _Context, key_names) -> List[str]:
+    """更新式を適用し、更新した属性名のリストを返す"""
+    touched = []
+    for action in actions:
+        name = ctx.name(action[1])
+        if name in key_names:
+            raise _ExpressionError(f'Cannot update attribute {name}. This attribute is part of the key')
+        if name in touched:
+            raise _ExpressionError(f'Two document paths overlap with each other; [{name}]')
+        touched.append(name)
+
+    # 右辺はすべて更新前のアイテムに対して評価する
+    original = dict(item)
+    for action in actions:
+        kind, name = action[0], ctx.name(action[1])
+        if kind == 'set':
+            item[name] = _copy_value(_set_value(action[2], original, ctx))
+        elif kind == 'remove':
+            item.pop(name, None)
+        elif kind == 'add':
+            value = ctx.operand(action[2], original)
+            existing = original.get(name)
+            value_type = _type_of(value)
+            if value_type == 'N':
+                base = Decimal(existing['N']) if existing is not None else Decimal(0)
+                if existing is not None and _type_of(existing) != 'N':
+                    raise _ExpressionError('An operand in the update expression has an incorrect data type')
+                item[name] = {'N': _format_number(base + Decimal(value['N']))}
+            elif value_type in ('SS', 'NS', 'BS'):
+                members = list(existing[value_type]) if existing is not None else []
+                for member in value[value_type]:
+                    if member not in members:
+                        members.append(member)
+                item[name] = {value_type: members}
+            else:
+                raise _ExpressionError('ADD action requires a number or set operand')
+        elif kind == 'delete':
+            value = ctx.operand(action[2], original)
+            existing = original.get(name)
+            value_type = _type_of(value)
+            if existing is None:
+                continue
+            remaining = [m for m in existing[value_type] if m not in value[value_type]]
+            if remaining:
+                item[name] = {value_type: remaining}
+            else:
+                item.pop(name, None)
+    return touched
+
+# ---------------------------------------------------------------------------
+# テーブル
+# ---------------------------------------------------------------------------
+
+def _key_schema(schema):
+    hash_key = next(k['AttributeName'] for k in schema if k['KeyType'] == 'HASH')
+    range_key = next((k['AttributeName'] for k in schema if k['KeyType'] == 'RANGE'), None)
+    return hash_key, range_key
+
+class _Index:
+    def __init__(self, definition: Dict, table_keys):
+        self.name = definition['IndexName']
+        self.hash_key, self.range_key = _key_schema(definition['KeySchema'])
+        projection = definition.get('Projection', {'ProjectionType': 'ALL'})
+        self.projection_type = projection['ProjectionType']
+        self.projected = set(table_keys) | {self.hash_key} | ({self.range_key} if self.range_key else set())
+        self.projected |= set(projection.get('NonKeyAttributes', []))
+        # インデックスのパーティションキー -> [(インデックスのソートキー, テーブルPK, テーブルSK)]
+        self.partitions = {}
+
+    def entry(self, item: Dict):
+        """インデックスに含まれるアイテムなら (パーティション, 並び順のキー) を返す（スパース）"""
+        hash_value = item.get(self.hash_key)
+        if hash_value is None:
+            return None
+        if self.range_key:
+            range_value = item.get(self.range_key)
+            if range_value is None:
+                return None
+            return _key_value(hash_value), _key_value(range_value)
+        return _key_value(hash_value), None
+
+    def project(self, item: Dict) -> Dict:
+        if self.projection_type == 'ALL':
+            return item
+        return {name: value for name, value in item.items() if name in self.projected}
+
+class _Table:
+    def __init__(self, name: str, definition: Dict):
+        self.name = name
+        self.hash_key, self.range_key = _key_schema(definition['KeySchema'])
+        self.key_names = (self.hash_key, self.range_key) if self.range_key else (self.hash_key,)
+        self.indexes = {
+            index['IndexName']: _Index(index, self.key_names)
+            for index in definition.get('GlobalSecondaryIndexes', [])
+        }
+        # (PK, SK) -> アイテム
+        self.items = {}
+        # (PK, SK) -> アイテムのサイズ（読み込みのたびに計算しないよう書き込み時に記録）
+        self.sizes = {}
+        # PK -> ソート済みのSKのリスト
+        self.partitions = {}
+        # ストリームのレコード（StreamSpecification が有効な場合のみ）
+        stream = definition.get('StreamSpecification') or {}
+        self.stream = collections.deque(maxlen=STREAM_RETENTION_RECORDS) if stream.get('StreamEnabled') else None
+        self.sequence = 0
+
+    def key_of(self, key: Dict, operation: str):
+        """Keyを検証して (PK, SK) のタプルを返す"""
+        if set(key) != set(self.key_names):
+            raise _validation('The provided key element does not match the schema', operation)
+        hash_value = key[self.hash_key]
+        if _type_of(hash_value) not in ('S', 'N', 'B'):
+            raise _validation('The provided key element does not match the schema', operation)
+        range_value = key.get(self.range_key) if self.range_key else None
+        return _key_value(hash_value), _key_value(range_value) if range_value is not None else None
+
+    def item_key(self, item: Dict, operation: str):
+        for name in self.key_names:
+            value = item.get(name)
+            if value is None:
+                raise _validation(f'One or more parameter values were invalid: Missing the key {name} in the item', operation)
+            if _type_of(value) == 'S' and value['S'] == '':
+                raise _validation('One or more parameter values are not valid. '
+                                  'The AttributeValue for a key attribute cannot contain an empty string value.', operation)
+        return self.key_of({name: item[name] for name in self.key_names}, operation)
+
+    def key_attributes(self, item: Dict) -> Dict:
+        return {name: item[name] for name in self.key_names}
+
+    def store(self, key, item: Optional[Dict]):
+        """アイテムを保存（Noneなら削除）し、インデックスとストリームを更新"""
+        old = self.items.get(key)
+        if self.stream is not None and old != item:
+            self.record(old, item)
+        if old is not None:
+            for index in self.indexes.values():
+                entry = index.entry(old)
+                if entry:
+                    entries = index.partitions[entry[0]]
+                    del entries[bisect.bisect_left(entries, (entry[1],) + key)]
+        if item is None:
+            if old is not None:
+                del self.items[key]
+                del self.sizes[key]
+                sort_keys = self.partitions[key[0]]
+                del sort_keys[bisect.bisect_left(sort_keys, key[1])]
+                if not sort_keys:
+                    del self.partitions[key[0]]
+            return
+        if old is None:
+            bisect.insort(self.partitions.setdefault(key[0], []), key[1])
+        self.items[key] = item
+        self.sizes[key] = item_size(item)
+        for index in self.indexes.values():
+            entry = index.entry(item)
+            if entry:
+                bisect.insort(index.partitions.setdefault(entry[0], []), (entry[1],) + key)
+
+    def record(self, old: Optional[Dict], new: Optional[Dict]):
+        """ストリームのレコードを追加（データが変わらない書き込みはレコードにならない）"""
+        self.sequence += 1
+        image = {'Keys': self.key_attributes(new or old), 'SequenceNumber': str(self.sequence),
+                 'StreamViewType': 'NEW_AND_OLD_IMAGES'}
+        # 保存したアイテムは書き換えずに置き換えるため、コピーせずに参照する
+        if new is not None:
+            image['NewImage'] = new
+        if old is not None:
+            image['OldImage'] = old
+        self.stream.append({
+            'eventID': str(self.sequence),
+            'eventName': 'INSERT' if old is None else 'REMOVE' if new is None else 'MODIFY',
+            'eventSource': 'aws:dynamodb',
+            'dynamodb': image,
+        })
+
+    def write_units(self, old: Optional[Dict], new: Optional[Dict]):
+        """書き込みのキャパシティユニット（テーブル, {インデックス名: ユニット}）"""
+        sizes = [item_size(i) for i in (old, new) if i is not None]
+        table_units = max(1, math.ceil(max(sizes) / WRITE_UNIT_BYTES)) if sizes else 1
+        index_units = {}
+        for index in self.indexes.values():
+            before = index.entry(old) if old is not None else None
+            after = index.entry(new) if new is not None else None
+            units = 0
+            if before and after:
+                if before != after:
+                    units = _units(item_size(index.project(old))) + _units(item_size(index.project(new)))
+                elif index.project(old) != index.project(new):
+                    units = _units(item_size(index.project(new)))
+            elif before:
+                units = _units(item_size(index.project(old)))
+            elif after:
+                units = _units(item_size(index.project(new)))
+            if units:
+                index_units[index.name] = units
+        return table_units, index_units
+
+def _units(size: int, unit: int = WRITE_UNIT_BYTES) -> int:
+    return max(1, math.ceil(size / unit))
+
+def _range_bounds(node, ctx: _Context, range_key: str):
+    """ソートキー条件を二分探索の範囲 (下限, 下限を含む, 上限, 上限を含む) に変換"""
+    if node[0] == 'func' and node[1] == 'begins_with':
+        prefix = _key_value(ctx.operand(node[2][1], {}))
+        # 前方一致は [prefix, prefix + 最大の文字) の範囲として扱う
+        upper = prefix + ('\U0010ffff' if isinstance(prefix, str) else b'\xff')
+        return prefix, True, upper, False
+    if node[0] == 'between':
+        low, high = _key_value(ctx.operand(node[2], {})), _key_value(ctx.operand(node[3], {}))
+        return low, True, high, True
+    if node[0] == 'cmp':
+        value = _key_value(ctx.operand(node[3], {}))
+        op = node[1]
+        if op == '=':
+            return value, True, value, True
+        if op == '<':
+            return None, False, value, False
+        if op == '<=':
+            return None, False, value, True
+        if op == '>':
+            return value, False, None, False
+        if op == '>=':
+            return value, True, None, False
+    raise _ExpressionError(f'Unsupported key condition for {range_key}')
+
+def _split_key_condition(node, ctx: _Context, hash_key: str, range_key: Optional[str]):
+    """KeyConditionExpression を パーティションキーの値 と ソートキー条件 に分解"""
+    parts = []
+
+    def flatten(n):
+        if n[0] == 'and':
+            flatten(n[1])
+            flatten(n[2])
+        else:
+            parts.append(n)
+
+    flatten(node)
+    hash_value, range_condition = None, None
+    for part in parts:
+        if part[0] == 'cmp':
+            target = part[2]
+        elif part[0] == 'between':
+            target = part[1]
+        elif part[0] == 'func':
+            target = part[2][0]
+        else:
+            target = None
+        name = ctx.name(target) if target and target[0] == 'path' else None
+        if part[0] == 'cmp' and part[1] == '=' and name == hash_key:
+            hash_value = ctx.operand(part[3], {})
+        elif name == range_key and range_key is not None and range_condition is None:
+            range_condition = part
+        else:
+            raise _ExpressionError('Query key condition not supported')
+    if hash_value is None:
+        raise _ExpressionError('Query condition missed key schema element: ' + hash_key)
+    return _key_value(hash_value), range_condition
+
+def _locked(method):
+    """ストアのロックを取って操作を実行（複数スレッドからの同時呼び出し用）"""
+    def wrapper(self, *args, **kwargs):
+        with self.store.lock:
+            return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+class DynamoDBStore:
+    """エミュレータのデータ（テーブルと統計）。複数のクライアントで共有できる"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables = {}
+        self.stats = {'calls': {}, 'readUnits': 0.0, 'writeUnits': 0.0}
+
+    def reset(self):
+        self.tables.clear()
+        self.stats = {'calls': {}, 'readUnits': 0.0, 'writeUnits': 0.0}
+
+default_store = DynamoDBStore()
+
+class EmulatedClient:
+    """
+    botocoreのDynamoDBクライアント互換のインメモリ実装
+
+    Args:
+        store: 共有するデータ（省略時はプロセス内で共通のもの）
+        default_definition: 未作成のテーブルにアクセスしたときに使う定義
+    """
+
+    def __init__(self, store: DynamoDBStore = None, default_definition: Optional[Dict] = TABLE_DEFINITION):
+        self.store = store or default_store
+        self.default_definition = default_definition
+
+    # -- 内部処理 -------------------------------------------------------------
+
+    def _table(self, name: str, operation: str) -> _Table:
+        table = self.store.tables.get(name)
+        if table is None:
+            if self.default_definition is None:
+                raise _error('ResourceNotFoundException', 'Requested resource not found', operation)
+            table = self.store.tables[name] = _Table(name, self.default_definition)
+        return table
+
+    def _count(self, operation: str):
+        calls = self.store.stats['calls']
+        calls[operation] = calls.get(operation, 0) + 1
+
+    def _capacity(self, mode: Optional[str], table: _Table, table_units: float, index_units: Dict, kind: str):
+        total = table_units + sum(index_units.values())
+        self.store.stats[kind] += total
+        if not mode or mode == 'NONE':
+            return None
+        unit_name = 'ReadCapacityUnits' if kind == 'readUnits' else 'WriteCapacityUnits'
+        capacity = {'TableName': table.name, 'CapacityUnits': total, unit_name: total}
+        if mode == 'INDEXES':
+            capacity['Table'] = {'CapacityUnits': table_units, unit_name: table_units}
+            if index_units:
+                capacity['GlobalSecondaryIndexes'] = {
+                    name: {'CapacityUnits': units, unit_name: units} for name, units in index_units.items()
+                }
+        return capacity
+
+    @staticmethod
+    def _holds(expression, names, values, item, operation) -> bool:
+        if not expression:
+            return True
+        ctx = _Context(names, values)
+        try:
+            return _evaluate(_parse_condition(expression), item or {}, ctx)
+        except _ExpressionError as e:
+            raise _validation(str(e), operation)
+
+    def _check(self, expression, names, values, item, operation, return_on_failure=None):
+        if not self._holds(expression, names, values, item, operation):
+            extra = {}
+            if return_on_failure == 'ALL_OLD' and item:
+                extra['Item'] = _copy_item(item)
+            raise _error('ConditionalCheckFailedException', 'The conditional request failed', operation, **extra)
+
+    @staticmethod
+    def _project(item: Dict, expression: Optional[str], names: Optional[Dict], operation: str) -> Dict:
+        if not expression:
+            return _copy_item(item)
+        ctx = _Context(names, None)
+        try:
+            wanted = {ctx.name(path) for path in _parse_projection(expression)}
+        except _ExpressionError as e:
+            raise _validation(str(e), operation)
+        return {name: _copy_value(value) for name, value in item.items() if name in wanted}
+
+    @staticmethod
+    def _updated(table: _Table, key, old: Optional[Dict], expression, names, values, operation):
+        """UpdateExpressionを適用した新しいアイテムと、変更した属性名"""
+        # 存在しない場合はキーだけのアイテムとして作成される
+        new = _copy_item(old) if old is not None else _copy_item(key)
+        touched = []
+        if expression:
+            ctx = _Context(names, values)
+            try:
+                touched = _apply_update(_parse_update(expression), new, ctx, table.key_names)
+            except _ExpressionError as e:
+                raise _validation(str(e), operation)
+        return new, touched
+
+    def _write(self, table: _Table, key, old: Optional[Dict], new: Optional[Dict], capacity_mode, operation):
+        if new is not None:
+            size = item_size(new)
+            if size > ITEM_SIZE_LIMIT:
+                raise _validation('Item size has exceeded the maximum allowed size', operation)
+        table_units, index_units = table.write_units(old, new)
+        table.store(key, new)
+        return self._capacity(capacity_mode, table, table_units, index_units, 'writeUnits')
+
+    # -- テーブル管理 ---------------------------------------------------------
+
+    @_locked
+    def create_table(self, TableName, KeySchema, AttributeDefinitions=None, GlobalSecondaryIndexes=None, **kwargs):
+        if TableName in self.store.tables:
+            raise _error('ResourceInUseException', f'Table already exists: {TableName}', 'CreateTable')
+        definition = {'KeySchema': KeySchema, 'GlobalSecondaryIndexes': GlobalSecondaryIndexes or [],
+                      'StreamSpecification': kwargs.get('StreamSpecification')}
+        self.store.tables[TableName] = _Table(TableName, definition)
+        return {'TableDescription': {'TableName': TableName, 'TableStatus': 'ACTIVE'}}
+
+    @_locked
+    def list_tables(self, **kwargs):
+        return {'TableNames': sorted(self.store.tables)}
+
+    @_locked
+    def drain_stream(self, TableName, Limit=None):
+        """
+        ストリームのレコードを古い順に取り出す（エミュレータ独自。DynamoDB StreamsとLambdaのポーリングの代わり）
+
+        Returns:
+            list: Lambdaのイベントの Records と同じ形式のレコード（ストリームが無効なら空）
+        """
+        table = self._table(TableName, 'DrainStream')
+        if table.stream is None:
+            return []
+        count = len(table.stream) if Limit is None else min(Limit, len(table.stream))
+        return [table.stream.popleft() for _ in range(count)]
+
+    def get_waiter(self, name):
+        class _Waiter:
+            def wait(self, **kwargs):
+                return None
+        return _Waiter()
+
+    # -- 単一アイテムの操作 ---------------------------------------------------
+
+    @_locked
+    def get_item(self, TableName, Key, ProjectionExpression=None, ExpressionAttributeNames=None,
+                 ConsistentRead=False, ReturnConsumedCapacity=None, **kwargs):
+        self._count('GetItem')
+        table = self._table(TableName, 'GetItem')
+        key = table.key_of(Key, 'GetItem')
+        item = table.items.get(key)
+
+        units = _units(table.sizes[key], READ_UNIT_BYTES) if item else 1
+        units = units if ConsistentRead else units / 2
+        response = {}
+        if item is not None:
+            response['Item'] = self._project(item, ProjectionExpression, ExpressionAttributeNames, 'GetItem')
+        capacity = self._capacity(ReturnConsumedCapacity, table, units, {}, 'readUnits')
+        if capacity:
+            response['ConsumedCapacity'] = capacity
+        return response
+
+    @_locked
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValues='NONE', ReturnConsumedCapacity=None,
+                 ReturnValuesOnConditionCheckFailure=None, **kwargs):
+        self._count('PutItem')
+        table = self._table(TableName, 'PutItem')
+        key = table.item_key(Item, 'PutItem')
+        old = table.items.get(key)
+        self._check(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, old, 'PutItem',
+                    ReturnValuesOnConditionCheckFailure)
+
+        capacity = self._write(table, key, old, _copy_item(Item), ReturnConsumedCapacity, 'PutItem')
+        response = {}
+        if ReturnValues == 'ALL_OLD' and old is not None:
+            response['Attributes'] = _copy_item(old)
+        if capacity:
+            response['ConsumedCapacity'] = capacity
+        return response
+
+    @_locked
+    def update_item(self, TableName, Key, UpdateExpression=None, ConditionExpression=None,
+                    ExpressionAttributeNames=None, ExpressionAttributeValues=None, ReturnValues='NONE',
+                    ReturnConsumedCapacity=None, ReturnValuesOnConditionCheckFailure=None, **kwargs):
+        self._count('UpdateItem')
+        table = self._table(TableName, 'UpdateItem')
+        key = table.key_of(Key, 'UpdateItem')
+        old = table.items.get(key)
+        self._check(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, old, 'UpdateItem',
+                    ReturnValuesOnConditionCheckFailure)
+
+        new, touched = self._updated(table, Key, old, UpdateExpression, ExpressionAttributeNames,
+                                     ExpressionAttributeValues, 'UpdateItem')
+        capacity = self._write(table, key, old, new, ReturnConsumedCapacity, 'UpdateItem')
+        response = {}
+        if ReturnValues == 'ALL_NEW':
+            response['Attributes'] = _copy_item(new)
+        elif ReturnValues == 'ALL_OLD' and old is not None:
+            response['Attributes'] = _copy_item(old)
+        elif ReturnValues == 'UPDATED_NEW':
+            response['Attributes'] = {n: _copy_value(new[n]) for n in touched if n in new}
+        elif ReturnValues == 'UPDATED_OLD' and old is not None:
+            response['Attributes'] = {n: _copy_value(old[n]) for n in touched if n in old}
+        if capacity:
+            response['ConsumedCapacity'] = capacity
+        return response
+
+    @_locked
+    def delete_item(self, TableName, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE', ReturnConsumedCapacity=None,
+                    ReturnValuesOnConditionCheckFailure=None, **kwargs):
+        self._count('DeleteItem')
+        table = self._table(TableName, 'DeleteItem')
+        key = table.key_of(Key, 'DeleteItem')
+        old = table.items.get(key)
+        self._check(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, old, 'DeleteItem',
+                    ReturnValuesOnConditionCheckFailure)
+
+        capacity = self._write(table, key, old, None, ReturnConsumedCapacity, 'DeleteItem')
+        response = {}
+        if ReturnValues == 'ALL_OLD' and old is not None:
+            response['Attributes'] = _copy_item(old)
+        if capacity:
+            response['ConsumedCapacity'] = capacity
+        return response
+
+    # -- 複数アイテムの操作 ---------------------------------------------------
+
+    @_locked
+    def batch_get_item(self, RequestItems, ReturnConsumedCapacity=None, **kwargs):
+        self._count('BatchGetItem')
+        total = sum(len(request['Keys']) for request in RequestItems.values())
+        if total > BATCH_GET_LIMIT:
+            raise _validation('Too many items requested for the BatchGetItem call', 'BatchGetItem')
+
+        responses, capacities = {}, []
+        for table_name, request in RequestItems.items():
+            table = self._table(table_name, 'BatchGetItem')
+            keys = [table.key_of(key, 'BatchGetItem') for key in request['Keys']]
+            if len(set(keys)) != len(keys):
+                raise _validation('Provided list of item keys contains duplicates', 'BatchGetItem')
+            found, units = [], 0
+            for key in keys:
+                item = table.items.get(key)
+                # 存在しないキーも1件分として数える
+                units += _units(table.sizes[key], READ_UNIT_BYTES) if item is not None else 1
+                if item is not None:
+                    found.append(self._project(item, request.get('ProjectionExpression'),
+                                               request.get('ExpressionAttributeNames'), 'BatchGetItem'))
+            units = units if request.get('ConsistentRead') else units / 2
+            responses[table_name] = found
+            capacity = self._capacity(ReturnConsumedCapacity, table, units, {}, 'readUnits')
+            if capacity:
+                capacities.append(capacity)
+
+        response = {'Responses': responses, 'UnprocessedKeys': {}}
+        if capacities:
+            response['ConsumedCapacity'] = capacities
+        return response
+
+    @_locked
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity=None, **kwargs):
+        self._count('BatchWriteItem')
+        total = sum(len(requests) for requests in RequestItems.values())
+        if total > BATCH_WRITE_LIMIT:
+            raise _validation('Too many items requested for the BatchWriteItem call', 'BatchWriteItem')
+
+        capacities = []
+        for table_name, requests in RequestItems.items():
+            table = self._table(table_name, 'BatchWriteItem')
+            table_units, index_units = 0, {}
+            for request in requests:
+                if 'PutRequest' in request:
+                    item = request['PutRequest']['Item']
+                    key = table.item_key(item, 'BatchWriteItem')
+                    new = _copy_item(item)
+                else:
+                    key = table.key_of(request['DeleteRequest']['Key'], 'BatchWriteItem')
+                    new = None
+                old = table.items.get(key)
+                units, per_index = table.write_units(old, new)
+                table_units += units
+                for name, value in per_index.items():
+                    index_units[name] = index_units.get(name, 0) + value
+                table.store(key, new)
+            capacity = self._capacity(ReturnConsumedCapacity, table, table_units, index_units, 'writeUnits')
+            if capacity:
+                capacities.append(capacity)
+
+        response = {'UnprocessedItems': {}}
+        if capacities:
+            response['ConsumedCapacity'] = capacities
+        return response
+
+    @_locked
+    def transact_write_items(self, TransactItems, ReturnConsumedCapacity=None, ClientRequestToken=None, **kwargs):
+        """すべての条件を評価してから書き込む（1件でも満たさなければ何も書き込まない）"""
+        self._count('TransactWriteItems')
+        if not TransactItems or len(TransactItems) > TRANSACT_WRITE_LIMIT:
+            raise _validation(f'Member must have length between 1 and {TRANSACT_WRITE_LIMIT}', 'TransactWriteItems')
+
+        writes, reasons, seen = [], [], set()
+        for action in TransactItems:
+            (kind, request), = action.items()
+            table = self._table(request['TableName'], 'TransactWriteItems')
+            if kind == 'Put':
+                key = table.item_key(request['Item'], 'TransactWriteItems')
+            else:
+                key = table.key_of(request['Key'], 'TransactWriteItems')
+            if (table.name, key) in seen:
+                raise _validation('Transaction request cannot include multiple operations on one item',
+                                  'TransactWriteItems')
+            seen.add((table.name, key))
+
+            old = table.items.get(key)
+            names, values = request.get('ExpressionAttributeNames'), request.get('ExpressionAttributeValues')
+            if not self._holds(request.get('ConditionExpression'), names, values, old, 'TransactWriteItems'):
+                reason = {'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'}
+                if request.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD' and old is not None:
+                    reason['Item'] = _copy_item(old)
+                reasons.append(reason)
+                continue
+            reasons.append({'Code': 'None'})
+
+            if kind == 'Put':
+                new = _copy_item(request['Item'])
+            elif kind == 'Update':
+                new, _ = self._updated(table, request['Key'], old, request.get('UpdateExpression'), names, values,
+                                       'TransactWriteItems')
+            elif kind == 'Delete':
+                new = None
+            else:
+                continue
+            if new is not None and item_size(new) > ITEM_SIZE_LIMIT:
+                raise _validation('Item size has exceeded the maximum allowed size', 'TransactWriteItems')
+            writes.append((table, key, old, new))
+
+        if any(reason['Code'] != 'None' for reason in reasons):
+            codes = ', '.join(reason['Code'] for reason in reasons)
+            raise _error('TransactionCanceledException',
+                         f'Transaction cancelled, please refer cancellation reasons for specific reasons [{codes}]',
+                         'TransactWriteItems', CancellationReasons=reasons)
+
+        # トランザクションの書き込みは通常の2倍のユニットを消費する
+        usage = {}
+        for table, key, old, new in writes:
+            table_units, index_units = table.write_units(old, new)
+            totals = usage.setdefault(table.name, {'table': table, 'units': 0, 'indexes': {}})
+            totals['units'] += 2 * table_units
+            for name, units in index_units.items():
+                totals['indexes'][name] = totals['indexes'].get(name, 0) + 2 * units
+            table.store(key, new)
+
+        response = {}
+        capacities = []
+        for totals in usage.values():
+            capacity = self._capacity(ReturnConsumedCapacity, totals['table'], totals['units'], totals['indexes'],
+                                      'writeUnits')
+            if capacity:
+                capacities.append(capacity)
+        if capacities:
+            response['ConsumedCapacity'] = capacities
+        return response
+
+    @_locked
+    def query(self, TableName, KeyConditionExpression, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+              IndexName=None, Limit=None, ScanIndexForward=True, ExclusiveStartKey=None, FilterExpression=None,
+              ProjectionExpression=None, Select=None, ConsistentRead=False, ReturnConsumedCapacity=None, **kwargs):
+        self._count('Query')
+        table = self._table(TableName, 'Query')
+        index = None
+        if IndexName:
+            index = table.indexes.get(IndexName)
+            if index is None:
+                raise _validation(f'The table does not have the specified index: {IndexName}', 'Query')
+            if ConsistentRead:
+                raise _validation('Consistent reads are not supported on global secondary indexes', 'Query')
+        hash_key, range_key = (index.hash_key, index.range_key) if index else (table.hash_key, table.range_key)
+
+        ctx = _Context(ExpressionAttributeNames, ExpressionAttributeValues)
+        try:
+            partition, range_condition = _split_key_condition(
+                _parse_condition(KeyConditionExpression), ctx, hash_key, range_key
+            )
+            bounds = _range_bounds(range_condition, ctx, range_key) if range_condition else None
+            filter_node = _parse_condition(FilterExpression) if FilterExpression else None
+        except _ExpressionError as e:
+            raise _validation(str(e), 'Query')
+
+        if index:
+            entries = index.partitions.get(partition, [])
+            position = (lambda entry: entry[0])
+        else:
+            entries = table.partitions.get(partition, [])
+            position = (lambda entry: entry)
+
+        # ソートキーの範囲で二分探索
+        start, end = 0, len(entries)
+        if bounds:
+            low, low_inclusive, high, high_inclusive = bounds
+            if low is not None:
+                start = _bisect_sort_key(entries, low, low_inclusive, True, position)
+            if high is not None:
+                end = _bisect_sort_key(entries, high, high_inclusive, False, position)
+
+        # ExclusiveStartKey の次から
+        if ExclusiveStartKey:
+            start_key = table.key_of({k: ExclusiveStartKey[k] for k in table.key_names if k in ExclusiveStartKey},
+                                     'Query')
+            if index:
+                marker = (_key_value(ExclusiveStartKey[index.range_key]),) + start_key if index.range_key \
+                    else (None,) + start_key
+            else:
+                marker = start_key[1]
+            if ScanIndexForward:
+                start = max(start, bisect.bisect_right(entries, marker))
+            else:
+                end = min(end, bisect.bisect_left(entries, marker))
+
+        sequence = range(start, end) if ScanIndexForward else range(end - 1, start - 1, -1)
+        items, scanned, read_bytes, last = [], 0, 0, None
+        for i in sequence:
+            entry = entries[i]
+            key = entry[1:] if index else (partition, entry)
+            item = table.items[key]
+            if index and index.projection_type != 'ALL':
+                item = index.project(item)
+                read_bytes += item_size(item)
+            else:
+                read_bytes += table.sizes[key]
+            scanned += 1
+            last = item
+            if filter_node is None or _evaluate(filter_node, item, ctx):
+                items.append(item)
+            if (Limit and scanned >= Limit) or read_bytes >= PAGE_SIZE_LIMIT:
+                break
+        else:
+            last = None
+
+        response = {'Count': len(items), 'ScannedCount': scanned}
+        if Select != 'COUNT':
+            response['Items'] = [self._project(i, ProjectionExpression, ExpressionAttributeNames, 'Query') for i in items]
+        if last is not None and (scanned == Limit or read_bytes >= PAGE_SIZE_LIMIT):
+            last_key = table.key_attributes(last)
+            if index:
+                for name in (index.hash_key, index.range_key):
+                    if name:
+                        last_key[name] = last[name]
+            response['LastEvaluatedKey'] = _copy_item(last_key)
+
+        units = max(1, math.ceil(read_bytes / READ_UNIT_BYTES))
+        units = units if ConsistentRead else units / 2
+        index_units = {index.name: units} if index else {}
+        capacity = self._capacity(ReturnConsumedCapacity, table, 0 if index else units, index_units, 'readUnits')
+        if capacity:
+            response['ConsumedCapacity'] = capacity
+        return response
+
+    @_locked
+    def scan(self, TableName, IndexName=None, Limit=None, ExclusiveStartKey=None, FilterExpression=None,
+             ProjectionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+             Select=None, ConsistentRead=False, ReturnConsumedCapacity=None, **kwargs):
+        self._count('Scan')
+        table = self._table(TableName, 'Scan')
+        if IndexName:
+            raise _validation('Scan on an index is not supported by the emulator', 'Scan')
+
+        ctx = _Context(ExpressionAttributeNames, ExpressionAttributeValues)
+        try:
+            filter_node = _parse_condition(FilterExpression) if FilterExpression else None
+        except _ExpressionError as e:
+            raise _validation(str(e), 'Scan')
+
+        keys = sorted(table.items)
+        start = 0
+        if ExclusiveStartKey:
+            start = bisect.bisect_right(keys, table.key_of(ExclusiveStartKey, 'Scan'))
+
+        items, scanned, read_bytes, last = [], 0, 0, None
+        for key in keys[start:]:
+            item = table.items[key]
+            scanned += 1
+            read_bytes += table.sizes[key]
+            last = item
+            if filter_node is None or _evaluate(filter_node, item, ctx):
+                items.append(item)
+            if (Limit and scanned >= Limit) or read_bytes >= PAGE_SIZE_LIMIT:
+                break
+        else:
+            last = None
+
+        response = {'Count': len(items), 'ScannedCount': scanned}
+        if Select != 'COUNT':
+            response['Items'] = [self._project(i, ProjectionExpression, ExpressionAttributeNames, 'Scan') for i in items]
+        if last is not None:
+            response['LastEvaluatedKey'] = _copy_item(table.key_attributes(last))
+
+        units = max(1, math.ceil(read_bytes / READ_UNIT_BYTES))
+        units = units if ConsistentRead else units / 2
+        capacity = self._capacity(ReturnConsumedCapacity, table, units, {}, 'readUnits')
+        if capacity:
+            response['ConsumedCapacity'] = capacity
+        return response
+
+def _bisect_sort_key(entries, value, inclusive: bool, lower: bool, position) -> int:
+    """エントリをソートキーで二分探索（lower: 範囲の開始位置 / それ以外: 終了位置）"""
+    lo, hi = 0, len(entries)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        sort_key = position(entries[mid])
+        if lower:
+            before = sort_key < value if inclusive else sort_key <= value
+        else:
+            before = sort_key <= value if inclusive else sort_key < value
+        if before:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
@@ -0,0 +1,168 @@
+"""
+Idempotency-Key ヘッダーによる冪等な書き込み
+
+ヘッダー付きのリクエストは、処理の前にユーザーのパーティションへ記録
+（SK: IDEMPOTENCY#{key}）を条件付きPutItemで作成する。
+
+- 記録がなければ処理を実行し、レスポンスを記録に保存する（5xxの場合は記録を消して再試行できるようにする）
+- ハンドラが transact_write で書き込む場合は、レスポンスを書き込みと同じトランザクションで保存する。
+  書き込みが確定した後は、後続の処理が失敗しても記録を消さず保存したレスポンスを返す（再送で二重に作成しない）
+- 同じキー・同じリクエストの記録が完了済みなら、保存したレスポンスをそのまま返す
+- 同じキーのリクエストが処理中なら409、別の内容のリクエストに使われたキーなら422
+
+記録は IDEMPOTENCY_TTL_SECONDS 後にDynamoDBのTTL（expiresAt）で削除される。
+処理中の記録は IDEMPOTENCY_LOCK_SECONDS（関数のタイムアウトより長くする）を過ぎると
+中断したものとみなし、次のリクエストが引き継ぐ。
+"""
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from common import gateway, logger, metrics
+from common.dynamodb_helper import build_pk, create_response
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+IDEMPOTENCY_SK_PREFIX = 'IDEMPOTENCY#'
+
+TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400'))
+LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '60'))
+
+# 作成できるのは記録がない場合か、期限切れ（処理中のまま中断・TTL削除待ち）の場合のみ
+_CLAIMABLE = 'attribute_not_exists(PK) OR lockedUntil < :now'
+# 自分が作成した処理中の記録のままか（期限切れで別のリクエストに引き継がれていないか）
+_OWNED = '#lockedUntil = :lockedUntil'
+
+# 処理中のリクエストの記録（キー・ダイジェスト・lockedUntil。保存したら response を持つ）
+_claim = contextvars.ContextVar('idempotency_claim', default=None)
+
+def get_key(event: Dict) -> Optional[str]:
+    """リクエストのIdempotency-Key（ヘッダー名の大文字小文字は区別しない）"""
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == HEADER.lower():
+            return value
+    return None
+
+def request_hash(event: Dict) -> str:
+    """同じキーで別の内容のリクエストが送られたことを検出するためのダイジェスト"""
+    canonical = '\n'.join([event.get('httpMethod') or '', event.get('path') or '', event.get('body') or ''])
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def _record_key(user_id: str, key: str) -> Dict:
+    return {'PK': build_pk(user_id), 'SK': f'{IDEMPOTENCY_SK_PREFIX}{key}'}
+
+def _completed(claim: Dict, response: Dict) -> Dict:
+    """完了済みの記録（TTLまで上書きさせない）"""
+    return dict(
+        claim['key'],
+        requestHash=claim['hash'],
+        response=json.dumps(response, ensure_ascii=False, separators=(',', ':')),
+        lockedUntil=claim['now'] + TTL_SECONDS,
+        expiresAt=claim['now'] + TTL_SECONDS,
+    )
+
+def _release(claim: Dict):
+    """処理中の記録を削除して同じキーで再試行できるようにする（引き継がれた記録は消さない）"""
+    try:
+        gateway.delete_item(claim['key'], condition=_OWNED, condition_values={':lockedUntil': claim['lockedUntil']})
+    except gateway.ConditionFailedError:
+        pass
+
+def transact_write(actions: List[Dict], response: Dict):
+    """
+    actions と、Idempotency-Key の記録へのresponseの保存を1つのトランザクションで書き込む
+
+    書き込みとレスポンスの保存が同時に確定するため、後続の処理が失敗した後の再送も
+    保存したレスポンスを返し、二重に書き込まない。Idempotency-Key のないリクエストでは
+    actions だけを書き込む。
+
+    Raises:
+        ConditionFailedError: いずれかのアクションの条件を満たさない場合（記録が別のリクエストに
+                              引き継がれていた場合を含む）
+    """
+    claim = _claim.get()
+    if claim is None:
+        gateway.transact_write(actions)
+        return
+    gateway.transact_write(list(actions) + [gateway.put_action(
+        _completed(claim, response), condition=_OWNED, condition_values={':lockedUntil': claim['lockedUntil']}
+    )])
+    claim['response'] = response
+
+def _replay(record: Dict) -> Dict:
+    response = json.loads(record['response'])
+    response['headers'] = dict(response.get('headers') or {}, **{REPLAYED_HEADER: 'true'})
+    return response
+
+def idempotent(handler):
+    """
+    Idempotency-Key ヘッダーがあるリクエストを冪等にするデコレータ
+
+    track_capacity の内側に付け、記録の読み書きもリクエストの消費キャパシティに含める。
+    記録を消すのは何も書き込んでいない場合だけで、transact_write で保存した後は
+    ハンドラの結果によらず保存したレスポンスを返す。
+    """
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        key = get_key(event)
+        if key is None:
+            return handler(event, context)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return create_response(400, {'error': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters'})
+
+        # ユーザーID（固定。ハンドラと同じ）
+        user_id = 'test-user-001'
+        record_key = _record_key(user_id, key)
+        digest = request_hash(event)
+        now = int(time.time())
+        logger.append_keys(idempotencyKey=key)
+
+        claim = {'key': record_key, 'hash': digest, 'lockedUntil': now + LOCK_SECONDS, 'now': now}
+        try:
+            gateway.put_item(
+                dict(record_key, requestHash=digest, lockedUntil=claim['lockedUntil'], expiresAt=now + TTL_SECONDS),
+                condition=_CLAIMABLE,
+                condition_values={':now': now}
+            )
+        except gateway.ConditionFailedError as e:
+            # 失敗時のアイテムが返るため読み直さない
+            record = e.item or {}
+            if record.get('requestHash') != digest:
+                return create_response(422, {'error': f'{HEADER} was already used for a different request'})
+            if 'response' not in record:
+                return create_response(409, {'error': f'A request with this {HEADER} is in progress'},
+                                       headers={'Retry-After': '1'})
+            metrics.increment('IdempotentReplays')
+            logger.append_keys(idempotentReplay=True)
+            return _replay(record)
+
+        token = _claim.set(claim)
+        try:
+            response = handler(event, context)
+        except Exception as e:
+            if 'response' not in claim:
+                _release(claim)
+                raise
+            logger.exception('Error after the write was committed: %s', e)
+        finally:
+            _claim.reset(token)
+
+        if 'response' in claim:
+            # 書き込みと同じトランザクションで保存済み（後続の処理が失敗しても書き込みは確定している）
+            return claim['response']
+
+        if response.get('statusCode', 500) >= 500:
+            # サーバー側の失敗は保存せず、同じキーで再試行できるようにする
+            _release(claim)
+            return response
+
+        gateway.put_item(_completed(claim, response))
+        return response
+
+    return wrapper
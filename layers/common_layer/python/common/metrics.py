@@ -0,0 +1,121 @@
+"""
+CloudWatch Embedded Metric Format（EMF）によるメトリクス
+
+呼び出し中に記録した値をバッファし、log_metrics で包んだハンドラの終了時に
+1行のEMF JSONとして標準出力へ書き出す（CloudWatch Logsがメトリクスに変換する）。
+ディメンションは service（POWERTOOLS_SERVICE_NAME）と route。
+
+呼び出しの外（スクリプトやベンチマークからgatewayを直接使う場合）で記録した値は捨てる。
+"""
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict
+
+from common.logger import route_of
+
+NAMESPACE = os.environ.get('POWERTOOLS_METRICS_NAMESPACE', 'TodoApi')
+SERVICE = os.environ.get('POWERTOOLS_SERVICE_NAME', 'todo-api')
+
+# EMFの1メトリクスあたりの値の上限
+MAX_VALUES_PER_METRIC = 100
+
+# コンテナ（プロセス）内で最初の呼び出しか。monoデプロイでは全ルートで共有される
+_cold_start = True
+_cold_start_lock = threading.Lock()
+
+# 呼び出し単位のバッファ（スレッドごとに独立し、copy_context() でワーカーに引き継げる）
+_buffer = contextvars.ContextVar('metrics_buffer', default=None)
+# ワーカースレッドから同じバッファに書き込む場合の排他
+_lock = threading.Lock()
+
+def add_metric(name: str, unit: str, value: float):
+    """値を追加（同じ名前の値は配列として出力され、CloudWatch側で集計される）"""
+    metrics = _buffer.get()
+    if metrics is None:
+        return
+    with _lock:
+        entry = metrics.get(name)
+        if entry is None:
+            metrics[name] = (unit, [value])
+        elif len(entry[1]) < MAX_VALUES_PER_METRIC:
+            entry[1].append(value)
+
+def increment(name: str, value: float = 1, unit: str = 'Count'):
+    """カウンタを加算（呼び出しごとに1つの値として出力）"""
+    metrics = _buffer.get()
+    if metrics is None:
+        return
+    with _lock:
+        entry = metrics.get(name)
+        if entry is None:
+            metrics[name] = (unit, [value])
+        else:
+            entry[1][0] += value
+
+def record_dynamodb_call(latency_ms: float):
+    """DynamoDB呼び出し1回分（gatewayから呼ばれる）"""
+    if _buffer.get() is None:
+        return
+    increment('DynamoDBCalls')
+    add_metric('DynamoDBLatency', 'Milliseconds', round(latency_ms, 3))
+
+def render(route: str, metrics: Dict, timestamp_ms: int) -> Dict:
+    """EMFのドキュメントを生成"""
+    document = {
+        '_aws': {
+            'Timestamp': timestamp_ms,
+            'CloudWatchMetrics': [{
+                'Namespace': NAMESPACE,
+                'Dimensions': [['service', 'route']],
+                'Metrics': [{'Name': name, 'Unit': unit} for name, (unit, _) in metrics.items()],
+            }],
+        },
+        'service': SERVICE,
+        'route': route,
+    }
+    for name, (_, values) in metrics.items():
+        document[name] = values[0] if len(values) == 1 else values
+    return document
+
+def _take_cold_start() -> bool:
+    global _cold_start
+    with _cold_start_lock:
+        cold, _cold_start = _cold_start, False
+    return cold
+
+def log_metrics(handler):
+    """ハンドラを包み、呼び出しごとにルートのメトリクスを1回だけ書き出すデコレータ"""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        metrics = {}
+        token = _buffer.set(metrics)
+        increment('ColdStart', 1 if _take_cold_start() else 0)
+
+        started = time.perf_counter()
+        response = None
+        try:
+            response = handler(event, context)
+            return response
+        finally:
+            _buffer.reset(token)
+            metrics['Latency'] = ('Milliseconds', [round((time.perf_counter() - started) * 1000, 3)])
+            # API Gatewayのレスポンスのみ（ストリームのコンシューマの戻り値はボディを持たない）
+            if response is not None and 'statusCode' in response:
+                body = response.get('body') or ''
+                if response.get('isBase64Encoded'):
+                    # 圧縮したボディ。クライアントに届くのはbase64を戻したバイト数
+                    size = len(body) * 3 // 4 - body[-2:].count('=')
+                else:
+                    size = len(body.encode('utf-8'))
+                metrics['ResponseBytes'] = ('Bytes', [size])
+
+            document = render(route_of(event), metrics, int(time.time() * 1000))
+            sys.stdout.write(json.dumps(document, separators=(',', ':')) + '\n')
+
+    return wrapper
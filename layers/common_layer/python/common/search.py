@@ -0,0 +1,269 @@
+"""
+タスクの全文検索（タイトル・説明の n-gram 転置インデックス）
+
+日本語は単語の区切りがないため、形態素解析ではなく文字の n-gram で索引する。
+テキストを NFKC 正規化・casefold し、記号・空白で区切った語ごとに、各文字から
+始まる bigram と trigram を作る（例: 会議資料 -> 会議, 会議資, 議資, 議資料, 資料）。1文字の語は索引しない。
+
+ポスティング（SK: SEARCH#{gram}#{taskId}、n: タスク内の出現回数）はユーザーの
+パーティションに置く。リクエストの処理中には書き込まず、テーブルのストリームのコンシューマ
+（functions/process_task_changes）がタスクの変更前後のイメージから差分を BatchWriteItem で書き込む
+（失敗したバッチはストリームから再試行される。ずれは scripts/rebuild_search_index.py で作り直す）。
+タスクごとのポスティングは異なる gram ごとに1件で、MAX_POSTINGS_PER_TASK 件まで
+（タイトル、説明の先頭の順に gram が最初に現れた順で残す）。
+
+検索語（空白区切り、2文字以上）をすべて含むタスクを返す（AND）。gram ごとのポスティングの
+完全一致の Query を並列に実行する（前方一致では読まない）。
+  - 2文字の語: その bigram のポスティング
+  - 3文字以上の語: 語を覆う trigram（MAX_LOOKUPS_PER_TERM 個まで）のポスティングの積集合
+1つの gram について新しいタスクから MAX_POSTINGS_READ 件まで読み、順位付けは MAX_RESULTS 件までとする。
+どちらかの上限に達した場合、結果は一部（partial）となる。スコアは語ごとの出現回数（gram の n の最小値）の和。
+trigram の積集合は語の連続を保証しないため、返す前にタスクが実際に語を含むか match で確かめる。
+"""
+import base64
+import contextvars
+import os
+import re
+import struct
+import unicodedata
+import uuid
+from collections import Counter
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from common import gateway, logger
+from common.dynamodb_helper import build_pk
+
+SEARCH_SK_PREFIX = 'SEARCH#'
+# 索引する gram の長さ（2文字の語は bigram、3文字以上の語は trigram で引く）
+GRAM_SIZES = (2, 3)
+# 索引する説明の長さ（正規化前の文字数。長い説明でポスティングが増えすぎないようにする）
+MAX_INDEXED_DESCRIPTION = int(os.environ.get('SEARCH_MAX_INDEXED_DESCRIPTION', '300'))
+# タスク1件あたりのポスティングの上限（作成時の書き込みは最大でこの件数のWCU）
+MAX_POSTINGS_PER_TASK = int(os.environ.get('SEARCH_MAX_POSTINGS_PER_TASK', '200'))
+# 検索語の数・長さの上限と下限
+MAX_QUERY_TERMS = 5
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 50
+# 語1つあたりに読む trigram の数の上限（長い語は間引き、match で確かめる）
+MAX_LOOKUPS_PER_TERM = 4
+# gram 1つあたりに読むポスティングの上限（新しいタスクから。超えた分は partial）
+MAX_POSTINGS_READ = int(os.environ.get('SEARCH_MAX_POSTINGS_READ', '2000'))
+# 順位付けして返すタスクの上限（超えた分は partial。残りの順位はnextTokenで引き継ぐ）
+MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', '100'))
+# nextTokenに引き継ぐ候補1件のバイト数（スコア2バイト + taskId（UUID）16バイト）
+_CANDIDATE_BYTES = 18
+# ポスティングのQuery 1回あたりの件数（1MBの上限で先に区切られることもある）
+POSTINGS_PAGE_SIZE = 5000
+# 並列に実行するポスティングのQueryの数
+SEARCH_CONCURRENCY = int(os.environ.get('SEARCH_CONCURRENCY', '8'))
+
+_TERM_RE = re.compile(r'\w+')
+
+def normalize(text: str) -> str:
+    """全角・半角と大文字・小文字を区別しない形にする"""
+    return unicodedata.normalize('NFKC', text).casefold()
+
+def terms(text: str) -> List[str]:
+    """正規化したテキストを記号・空白で区切った語"""
+    return _TERM_RE.findall(normalize(text))
+
+def grams(term: str) -> List[str]:
+    """語の各文字から始まる bigram と trigram（1文字の語は空）"""
+    return [term[i:i + size] for i in range(len(term) - 1) for size in GRAM_SIZES if i + size <= len(term)]
+
+def indexed_text(task: Dict) -> str:
+    """索引するテキスト（タイトルと説明の先頭 MAX_INDEXED_DESCRIPTION 文字）"""
+    # 型を検証する前に書き込まれたアイテムもあるため、文字列以外も文字列にして索引する
+    title = str(task.get('title') or '')
+    description = str(task.get('description') or '')
+    return f"{title}\n{description[:MAX_INDEXED_DESCRIPTION]}"
+
+def task_grams(task: Optional[Dict]) -> Dict[str, int]:
+    """タスクの gram と出現回数（Noneなら空。最初に現れた順に MAX_POSTINGS_PER_TASK 件まで）"""
+    if not task:
+        return {}
+    counts = Counter(gram for term in terms(indexed_text(task)) for gram in grams(term))
+    return dict(islice(counts.items(), MAX_POSTINGS_PER_TASK))
+
+def posting_key(user_id: str, gram: str, task_id: str) -> Dict:
+    return {'PK': build_pk(user_id), 'SK': f'{SEARCH_SK_PREFIX}{gram}#{task_id}'}
+
+def index_changes(user_id: str, old: Optional[Dict], new: Optional[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    old（変更前のタスク、作成ならNone）から new（変更後、削除ならNone）へのポスティングの差分
+
+    Returns:
+        tuple: (削除するキーのリスト, 書き込むアイテムのリスト)
+    """
+    task_id = (new or old)['taskId']
+    before, after = task_grams(old), task_grams(new)
+    deletes = [posting_key(user_id, gram, task_id) for gram in before if gram not in after]
+    puts = [dict(posting_key(user_id, gram, task_id), n=count)
+            for gram, count in after.items() if before.get(gram) != count]
+    return deletes, puts
+
+def write_postings(deletes: List[Dict], puts: List[Dict]):
+    """ポスティングを BatchWriteItem（25件ずつ）で削除・書き込み"""
+    requests = [('delete', key) for key in deletes] + [('put', item) for item in puts]
+    for start in range(0, len(requests), gateway.BATCH_WRITE_SIZE):
+        chunk = requests[start:start + gateway.BATCH_WRITE_SIZE]
+        gateway.batch_write([value for kind, value in chunk if kind == 'delete'],
+                            [value for kind, value in chunk if kind == 'put'])
+
+def parse_query(q: Optional[str]) -> List[str]:
+    """
+    検索文字列を検索語（正規化済み、重複なし）に分割
+
+    Raises:
+        ValueError: 検索語がない、または数・長さが上限を超える場合
+    """
+    query_terms = list(dict.fromkeys(terms(q or '')))
+    if not query_terms:
+        raise ValueError('q must contain at least one letter or digit')
+    if len(query_terms) > MAX_QUERY_TERMS:
+        raise ValueError(f'q must contain at most {MAX_QUERY_TERMS} terms')
+    if any(len(term) < MIN_TERM_LENGTH for term in query_terms):
+        raise ValueError(f'each term in q must be at least {MIN_TERM_LENGTH} characters')
+    if any(len(term) > MAX_TERM_LENGTH for term in query_terms):
+        raise ValueError(f'each term in q must be at most {MAX_TERM_LENGTH} characters')
+    return query_terms
+
+def lookups(term: str) -> List[str]:
+    """
+    検索語1つに対して読むポスティングのSKの接頭辞（gram の完全一致）
+
+    2文字の語はその bigram、3文字以上は語を覆う trigram（3文字おきと最後の3文字。
+    MAX_LOOKUPS_PER_TERM 個を超える場合は最初と最後を含めて間引く）。
+    """
+    size = GRAM_SIZES[-1]
+    if len(term) < size:
+        return [f'{SEARCH_SK_PREFIX}{term}#']
+    starts = sorted(set(range(0, len(term) - size + 1, size)) | {len(term) - size})
+    if len(starts) > MAX_LOOKUPS_PER_TERM:
+        starts = [starts[i * (len(starts) - 1) // (MAX_LOOKUPS_PER_TERM - 1)] for i in range(MAX_LOOKUPS_PER_TERM)]
+    return [f'{SEARCH_SK_PREFIX}{term[i:i + size]}#' for i in starts]
+
+def read_postings(user_id: str, prefix: str) -> Tuple[Dict[str, int], bool]:
+    """
+    gram のポスティングを新しいタスクから MAX_POSTINGS_READ 件まで読む（taskIdはUUIDv7のため降順が新しい順）
+
+    Returns:
+        tuple: (taskId -> 出現回数, 上限で打ち切ったか)
+    """
+    counts = {}
+    start_key = None
+    while True:
+        items, start_key = gateway.query(
+            'SEARCH', build_pk(user_id), min(POSTINGS_PAGE_SIZE, MAX_POSTINGS_READ - len(counts)), forward=False,
+            start_key=start_key, values={':prefix': prefix}, attributes=('SK', 'n')
+        )
+        for item in items:
+            counts[item['SK'].rsplit('#', 1)[1]] = int(item['n'])
+        if not start_key:
+            return counts, False
+        if len(counts) >= MAX_POSTINGS_READ:
+            return counts, True
+
+def search(user_id: str, query_terms: List[str]) -> Tuple[List[Tuple[int, str]], bool]:
+    """
+    すべての検索語を含む（可能性がある）タスク
+
+    Returns:
+        tuple: ((スコア, taskId) のスコアの高い順（同点は taskId の降順 = 新しい順）の MAX_RESULTS 件まで,
+                ポスティングの読み込みか件数の上限に達したか)
+    """
+    prefixes = sorted({prefix for term in query_terms for prefix in lookups(term)})
+    # ワーカーはリクエストのcontextvarsのコピーで実行し、消費キャパシティ等をこのリクエストに集計する
+    with ThreadPoolExecutor(max_workers=min(SEARCH_CONCURRENCY, len(prefixes))) as pool:
+        futures = {
+            prefix: pool.submit(contextvars.copy_context().run, read_postings, user_id, prefix)
+            for prefix in prefixes
+        }
+        results = {prefix: future.result() for prefix, future in futures.items()}
+    postings = {prefix: counts for prefix, (counts, _) in results.items()}
+    partial = any(truncated for _, truncated in results.values())
+    logger.append_keys(searchLookups=len(prefixes), postingsRead=sum(len(p) for p in postings.values()))
+
+    scores = None
+    for term in query_terms:
+        # 語の出現回数: gram ごとの出現回数の最小値（すべての gram を含むタスクのみ）
+        lists = sorted((postings[prefix] for prefix in lookups(term)), key=len)
+        term_counts = {
+            task_id: min([count] + [other.get(task_id, 0) for other in lists[1:]])
+            for task_id, count in lists[0].items()
+        }
+        term_counts = {task_id: count for task_id, count in term_counts.items() if count}
+        if scores is None:
+            scores = term_counts
+        else:
+            scores = {task_id: score + term_counts[task_id] for task_id, score in scores.items()
+                      if task_id in term_counts}
+        if not scores:
+            return [], partial
+
+    ranked = sorted(((score, task_id) for task_id, score in scores.items()), reverse=True)
+    return ranked[:MAX_RESULTS], partial or len(ranked) > MAX_RESULTS
+
+def pack_candidates(candidates: List[Tuple[int, str]]) -> str:
+    """
+    順位付けした (スコア, taskId) をnextToken用の短い文字列にする
+
+    2ページ目以降はポスティングを読み直さず、この順位の続きを返す。
+    """
+    data = b''.join(struct.pack('>H', min(score, 0xFFFF)) + uuid.UUID(task_id).bytes for score, task_id in candidates)
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+def unpack_candidates(packed: str) -> List[Tuple[int, str]]:
+    """
+    pack_candidates の逆
+
+    Raises:
+        ValueError: 形式が正しくない場合
+    """
+    data = base64.urlsafe_b64decode(packed)
+    if len(data) % _CANDIDATE_BYTES:
+        raise ValueError('Invalid candidates')
+    return [(struct.unpack('>H', data[i:i + 2])[0], str(uuid.UUID(bytes=data[i + 2:i + _CANDIDATE_BYTES])))
+            for i in range(0, len(data), _CANDIDATE_BYTES)]
+
+def matches(task: Dict, query_terms: List[str]) -> bool:
+    """タスクがすべての検索語を（連続した文字列として）含むか"""
+    text = normalize(indexed_text(task))
+    return all(term in text for term in query_terms)
+
+def rebuild(user_id: str, dry_run: bool = False) -> Tuple[int, int]:
+    """
+    ユーザーのタスクからポスティングを作り直す（インデックスの導入前のタスク・更新の失敗の修復）
+
+    タスクから求めたポスティングと既存のポスティングの差分だけを書き込む。
+
+    Returns:
+        tuple: (削除したポスティング数, 書き込んだポスティング数)
+    """
+    pk = build_pk(user_id)
+    expected = {}
+    start_key = None
+    while True:
+        items, start_key = gateway.query('TABLE', pk, 100, start_key=start_key, consistent=True,
+                                         attributes=('taskId', 'title', 'description'))
+        for item in items:
+            for key in index_changes(user_id, None, item)[1]:
+                expected[key['SK']] = key
+        if not start_key:
+            break
+
+    existing = {}
+    while True:
+        items, start_key = gateway.query('SEARCH', pk, POSTINGS_PAGE_SIZE, start_key=start_key, consistent=True,
+                                         values={':prefix': SEARCH_SK_PREFIX}, attributes=('SK', 'n'))
+        existing.update((item['SK'], int(item['n'])) for item in items)
+        if not start_key:
+            break
+
+    deletes = [{'PK': pk, 'SK': sk} for sk in existing if sk not in expected]
+    puts = [item for sk, item in expected.items() if existing.get(sk) != item['n']]
+    if not dry_run:
+        write_postings(deletes, puts)
+    return len(deletes), len(puts)
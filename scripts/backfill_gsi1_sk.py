@@ -0,0 +1,110 @@
+"""
+既存タスクの dueDate を正規形にし、GSI1SK（期限順）・GSI5SK（優先度順）を再計算するバックフィル
+
+GSI1SK は期限の文字列順で並ぶため、正規化の導入前に書き込まれた dueDate
+（タイムゾーン付き・ミリ秒なし等）があると期限の範囲・期限切れの一覧の結果がずれる。
+また、優先度を順位（HIGH=0, MEDIUM=1, LOW=2）で表す前の GSI1SK は優先度の名前を含み、
+GSI5SK は優先度順のインデックス（GSI5）の導入前のタスクにはない。
+各タスクについて dueDate を正規化し、build_due_keys の現在の形式で GSI1SK・GSI5SK を設定する。
+表現を揃えるだけのため version・updatedAt は変えない（ETagや差分同期に影響しない）。
+
+スキャン後に dueDate・priority が変更されたアイテムは条件付き更新でスキップする
+（変更したハンドラが正しい値を設定済みのため）。何度実行しても結果は同じ。
+ISO-8601として解釈できない dueDate のタスクは変更せず件数のみ表示する。
+
+使い方:
+    python scripts/backfill_gsi1_sk.py --table-name serverless-todo-dev-todos [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'layers', 'common_layer', 'python'))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='既存タスクのdueDateを正規化しGSI1SK/GSI5SKを再計算')
+    parser.add_argument('--table-name', default=os.environ.get('TABLE_NAME'), required='TABLE_NAME' not in os.environ)
+    parser.add_argument('--dry-run', action='store_true', help='書き込みを行わず対象件数のみ表示')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    os.environ['TABLE_NAME'] = args.table_name
+
+    import boto3
+    from botocore.exceptions import ClientError
+    from boto3.dynamodb.conditions import Attr
+    from common.dynamodb_helper import build_due_keys, normalize_due_date, PRIORITY_RANK, TASK_SK_PREFIX
+
+    table = boto3.resource('dynamodb').Table(args.table_name)
+
+    scan_params = {
+        'FilterExpression': Attr('SK').begins_with(TASK_SK_PREFIX),
+        'ProjectionExpression': 'PK, SK, dueDate, priority, GSI1SK, GSI5SK'
+    }
+
+    scanned = 0
+    updated = 0
+    skipped = 0
+    invalid = 0
+
+    while True:
+        response = table.scan(**scan_params)
+
+        for item in response.get('Items', []):
+            scanned += 1
+            due_date = item.get('dueDate')
+            if not due_date:
+                continue
+            try:
+                normalized = normalize_due_date(due_date)
+            except ValueError:
+                print(f"Invalid dueDate: {item['PK']} {item['SK']} {due_date!r}")
+                invalid += 1
+                continue
+
+            priority = item.get('priority', 'MEDIUM')
+            if priority not in PRIORITY_RANK:
+                print(f"Invalid priority: {item['PK']} {item['SK']} {priority!r}")
+                invalid += 1
+                continue
+            keys = build_due_keys(normalized, priority)
+            if normalized == due_date and all(item.get(name) == value for name, value in keys.items()):
+                continue
+
+            if args.dry_run:
+                updated += 1
+                continue
+
+            values = {':normalized': normalized, ':gsi1sk': keys['GSI1SK'], ':gsi5sk': keys['GSI5SK'],
+                      ':dueDate': due_date}
+            if 'priority' in item:
+                condition = 'dueDate = :dueDate AND priority = :priority'
+                values[':priority'] = priority
+            else:
+                condition = 'dueDate = :dueDate AND attribute_not_exists(priority)'
+            try:
+                table.update_item(
+                    Key={'PK': item['PK'], 'SK': item['SK']},
+                    UpdateExpression='SET dueDate = :normalized, GSI1SK = :gsi1sk, GSI5SK = :gsi5sk',
+                    ConditionExpression=condition,
+                    ExpressionAttributeValues=values
+                )
+                updated += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                skipped += 1
+
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        scan_params['ExclusiveStartKey'] = last_key
+        print(f"Progress: scanned={scanned}, updated={updated}, skipped={skipped}, invalid={invalid}")
+
+    label = 'would update' if args.dry_run else 'updated'
+    print(f"Done: scanned={scanned}, {label}={updated}, skipped={skipped}, invalid={invalid}")
+
+if __name__ == '__main__':
+    main()
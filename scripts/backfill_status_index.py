@@ -0,0 +1,91 @@
+"""
+既存タスクにGSI2PK（ステータス別インデックスのキー）を設定するバックフィル
+
+GSI2/GSI3はGSI2PKを持つアイテムのみを含むため、この属性が追加される前に
+作成されたタスクは ?status= 指定の一覧に表示されない。各タスクについて
+現在のstatusからGSI2PKを設定する。
+
+スキャン後にstatusが変更されたアイテムは条件付き更新でスキップする
+（変更したハンドラが正しいGSI2PKを設定済みのため）。何度実行しても結果は同じ。
+
+使い方:
+    python scripts/backfill_status_index.py --table-name serverless-todo-dev-todos [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'layers', 'common_layer', 'python'))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='既存タスクにGSI2PKを設定')
+    parser.add_argument('--table-name', default=os.environ.get('TABLE_NAME'), required='TABLE_NAME' not in os.environ)
+    parser.add_argument('--dry-run', action='store_true', help='書き込みを行わず対象件数のみ表示')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    os.environ['TABLE_NAME'] = args.table_name
+
+    import boto3
+    from botocore.exceptions import ClientError
+    from boto3.dynamodb.conditions import Attr
+    from common.dynamodb_helper import build_status_pk, TASK_SK_PREFIX
+
+    table = boto3.resource('dynamodb').Table(args.table_name)
+
+    scan_params = {
+        'FilterExpression': Attr('SK').begins_with(TASK_SK_PREFIX),
+        'ProjectionExpression': 'PK, SK, #status, GSI2PK',
+        'ExpressionAttributeNames': {'#status': 'status'}
+    }
+
+    scanned = 0
+    updated = 0
+    skipped = 0
+
+    while True:
+        response = table.scan(**scan_params)
+
+        for item in response.get('Items', []):
+            scanned += 1
+            status = item.get('status')
+            if not status:
+                continue
+
+            # PK: USER#{userId}
+            user_id = item['PK'][len('USER#'):]
+            status_pk = build_status_pk(user_id, status)
+            if item.get('GSI2PK') == status_pk:
+                continue
+
+            if args.dry_run:
+                updated += 1
+                continue
+
+            try:
+                table.update_item(
+                    Key={'PK': item['PK'], 'SK': item['SK']},
+                    UpdateExpression='SET GSI2PK = :gsi2pk',
+                    ConditionExpression='#status = :status',
+                    ExpressionAttributeNames={'#status': 'status'},
+                    ExpressionAttributeValues={':gsi2pk': status_pk, ':status': status}
+                )
+                updated += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                skipped += 1
+
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        scan_params['ExclusiveStartKey'] = last_key
+        print(f"Progress: scanned={scanned}, updated={updated}, skipped={skipped}")
+
+    label = 'would update' if args.dry_run else 'updated'
+    print(f"Done: scanned={scanned}, {label}={updated}, skipped={skipped}")
+
+if __name__ == '__main__':
+    main()
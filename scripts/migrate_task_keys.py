@@ -0,0 +1,91 @@
+"""
+旧形式taskIdのタスクにポインタアイテムを作成するマイグレーション
+
+uuid4で発行された既存タスク（SK: TODO#{createdAt}#{taskId}）は、taskIdから
+SKを計算できない。各タスクについて以下のポインタアイテムを作成し、
+update/deleteがGetItem 1回でキーを解決できるようにする。
+
+    PK: USER#{userId}
+    SK: TASKREF#{taskId}
+    targetSK: TODO#{createdAt}#{taskId}
+
+何度実行しても結果は同じ（作成済みのポインタはスキップ）。
+
+使い方:
+    python scripts/migrate_task_keys.py --table-name serverless-todo-dev-todos [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'layers', 'common_layer', 'python'))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='旧形式taskIdのポインタアイテムを作成')
+    parser.add_argument('--table-name', default=os.environ.get('TABLE_NAME'), required='TABLE_NAME' not in os.environ)
+    parser.add_argument('--dry-run', action='store_true', help='書き込みを行わず対象件数のみ表示')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    os.environ['TABLE_NAME'] = args.table_name
+
+    import boto3
+    from botocore.exceptions import ClientError
+    from boto3.dynamodb.conditions import Attr
+    from common.dynamodb_helper import build_task_ref_sk, created_at_from_task_id, TASK_SK_PREFIX
+
+    table = boto3.resource('dynamodb').Table(args.table_name)
+
+    scan_params = {
+        'FilterExpression': Attr('SK').begins_with(TASK_SK_PREFIX),
+        'ProjectionExpression': 'PK, SK, taskId'
+    }
+
+    scanned = 0
+    created = 0
+    skipped = 0
+
+    while True:
+        response = table.scan(**scan_params)
+
+        for item in response.get('Items', []):
+            scanned += 1
+            task_id = item.get('taskId')
+
+            # 新形式のtaskIdはSKを計算できるのでポインタ不要
+            if not task_id or created_at_from_task_id(task_id):
+                continue
+
+            if args.dry_run:
+                created += 1
+                continue
+
+            try:
+                table.put_item(
+                    Item={
+                        'PK': item['PK'],
+                        'SK': build_task_ref_sk(task_id),
+                        'taskId': task_id,
+                        'targetSK': item['SK']
+                    },
+                    ConditionExpression='attribute_not_exists(PK)'
+                )
+                created += 1
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                skipped += 1
+
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        scan_params['ExclusiveStartKey'] = last_key
+        print(f"Progress: scanned={scanned}, created={created}, skipped={skipped}")
+
+    label = 'would create' if args.dry_run else 'created'
+    print(f"Done: scanned={scanned}, {label}={created}, skipped={skipped}")
+
+if __name__ == '__main__':
+    main()
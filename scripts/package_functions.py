@@ -0,0 +1,224 @@
+"""
+sam build の成果物をコールドスタート向けに最小化するパッケージング
+
+.aws-sam/build 配下の各関数・レイヤーに対して以下を行う:
+  1. Lambdaランタイムに含まれるパッケージ（boto3/botocore等）を削除
+     （--keep-runtime-deps 指定時は残し、botocore/boto3 のデータをDynamoDB分のみに削減）
+  2. バックアップ・キャッシュ・テスト（test_*.py / conftest.py）等の不要ファイルを削除
+  3. .py を最適化済みバイトコード（ソースなしの .pyc）に置き換え
+     （読み取り専用ファイルシステムでのコールドスタート毎の再コンパイルを回避）
+
+処理前後の成果物サイズとimport時間を出力する。import時間の計測には
+ランタイム相当のboto3/botocoreが必要（--runtime-path で指定、省略時は実行環境のもの）。
+
+.pyc はこのスクリプトを実行したPythonのバージョンでしか読み込めないため、
+Lambdaランタイムと同じ python3.11 で実行すること（sam build --use-container と同じ環境）。
+
+使い方:
+    sam build
+    python scripts/package_functions.py --build-dir .aws-sam/build --report package-report.json
+    sam deploy
+"""
+import argparse
+import compileall
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+
+# Lambda python3.11 ランタイムに含まれるパッケージ
+RUNTIME_PACKAGES = ('boto3', 'botocore', 's3transfer', 'jmespath', 'urllib3', 'dateutil', 'six')
+
+# ランタイムのPythonバージョン（template.yaml の Runtime と合わせる）
+RUNTIME_VERSION = (3, 11)
+
+# --keep-runtime-deps 時に残す botocore/boto3 のデータ
+KEEP_BOTOCORE_DATA = ('dynamodb',)
+KEEP_BOTOCORE_DATA_FILES = ('endpoints.json', 'partitions.json', 'sdk-default-configuration.json', '_retry.json')
+
+REMOVE_SUFFIXES = ('.backup', '.pyc', '.pyo')
+# ハンドラの隣に置いたテスト（python -m pytest functions 用。デプロイには含めない）
+TEST_PREFIX = 'test_'
+TEST_FILES = ('conftest.py',)
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def file_count(path):
+    return sum(len(files) for _, _, files in os.walk(path))
+
+def measure_import_ms(import_paths, module, runtime_path, runs):
+    """新しいサブプロセスでモジュールをimportし、所要時間（ms）の中央値を返す"""
+    code = (
+        'import time; start = time.perf_counter(); '
+        f'import {module}; '
+        'print((time.perf_counter() - start) * 1000)'
+    )
+    env = dict(os.environ)
+    env.setdefault('TABLE_NAME', 'package-report')
+    env.setdefault('AWS_DEFAULT_REGION', 'ap-northeast-1')
+    env['PYTHONPATH'] = os.pathsep.join(import_paths + ([runtime_path] if runtime_path else []))
+    # Lambdaと同様に __pycache__ への書き込みはできない前提で計測
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples), None
+
+def remove_runtime_packages(artifact_dir):
+    """ランタイム提供のパッケージとそのdist-infoを削除"""
+    removed = []
+    for name in os.listdir(artifact_dir):
+        path = os.path.join(artifact_dir, name)
+        # dist-info はディストリビューション名（python_dateutil 等）で判定
+        base = name.split('-')[0].lower().replace('python_', '')
+        if name.endswith(('.dist-info', '.data')) and base in RUNTIME_PACKAGES:
+            shutil.rmtree(path)
+        elif os.path.isdir(path) and name in RUNTIME_PACKAGES:
+            shutil.rmtree(path)
+        elif os.path.isfile(path) and name[:-len('.py')] in RUNTIME_PACKAGES and name.endswith('.py'):
+            os.remove(path)
+        else:
+            continue
+        removed.append(name)
+    return removed
+
+def prune_botocore_data(artifact_dir):
+    """botocore/boto3 のサービス定義をDynamoDB分のみに削減"""
+    removed = 0
+    for package in ('botocore', 'boto3'):
+        data_dir = os.path.join(artifact_dir, package, 'data')
+        if not os.path.isdir(data_dir):
+            continue
+        for name in os.listdir(data_dir):
+            path = os.path.join(data_dir, name)
+            if os.path.isdir(path) and name not in KEEP_BOTOCORE_DATA:
+                shutil.rmtree(path)
+                removed += 1
+            elif os.path.isfile(path) and name not in KEEP_BOTOCORE_DATA_FILES:
+                os.remove(path)
+                removed += 1
+    return removed
+
+def remove_junk(artifact_dir):
+    """__pycache__・バックアップファイル・テストを削除"""
+    for root, dirs, files in os.walk(artifact_dir):
+        if '__pycache__' in dirs:
+            shutil.rmtree(os.path.join(root, '__pycache__'))
+            dirs.remove('__pycache__')
+        for name in files:
+            if name.endswith(REMOVE_SUFFIXES) or name in TEST_FILES or (
+                    name.startswith(TEST_PREFIX) and name.endswith('.py')):
+                os.remove(os.path.join(root, name))
+
+def compile_sourceless(artifact_dir, optimize):
+    """
+    .py をソースなしの .pyc に置き換え
+
+    ソースなしの .pyc（legacy配置）は最適化レベルやソースの更新日時に関係なく
+    そのまま読み込まれるため、Lambdaで -O を指定しなくても最適化済みコードが使われる。
+    """
+    ok = compileall.compile_dir(artifact_dir, quiet=1, legacy=True, optimize=optimize)
+    if not ok:
+        raise RuntimeError(f'Failed to compile {artifact_dir}')
+
+    for root, _, files in os.walk(artifact_dir):
+        for name in files:
+            if name.endswith('.py') and os.path.exists(os.path.join(root, name + 'c')):
+                os.remove(os.path.join(root, name))
+
+def find_artifacts(build_dir):
+    """
+    ビルドディレクトリから関数・レイヤーの成果物を列挙
+
+    Returns:
+        list: (名前, 成果物のディレクトリ, importパスのルート, 計測対象モジュール)
+    """
+    artifacts = []
+    for name in sorted(os.listdir(build_dir)):
+        path = os.path.join(build_dir, name)
+        if not os.path.isdir(path):
+            continue
+        if os.path.isdir(os.path.join(path, 'python')):
+            # レイヤー（/opt/python に展開される）
+            artifacts.append((name, path, os.path.join(path, 'python'), None))
+        elif os.path.exists(os.path.join(path, 'app.py')):
+            artifacts.append((name, path, path, 'app'))
+        elif os.path.exists(os.path.join(path, 'router', 'app.py')):
+            artifacts.append((name, path, path, 'router.app'))
+    return artifacts
+
+def main():
+    parser = argparse.ArgumentParser(description='Lambda成果物の最小化とバイトコードの事前コンパイル')
+    parser.add_argument('--build-dir', default='.aws-sam/build')
+    parser.add_argument('--keep-runtime-deps', action='store_true',
+                        help='boto3/botocore等を残す（バージョン固定が必要な場合）。データはDynamoDB分のみに削減')
+    parser.add_argument('--optimize', type=int, default=2, choices=[0, 1, 2],
+                        help='バイトコードの最適化レベル（2: assertとdocstringを除去）')
+    parser.add_argument('--runtime-path', help='import時間の計測に使うランタイム相当のboto3/botocoreの場所')
+    parser.add_argument('--runs', type=int, default=5, help='import時間の計測回数')
+    parser.add_argument('--report', help='結果をJSONで書き出すファイル')
+    args = parser.parse_args()
+
+    if sys.version_info[:2] != RUNTIME_VERSION:
+        version = '.'.join(map(str, RUNTIME_VERSION))
+        sys.exit(f'Run this script with python{version} (the Lambda runtime version); '
+                 f'bytecode compiled by {sys.version.split()[0]} cannot be loaded there.')
+
+    artifacts = find_artifacts(args.build_dir)
+    layer_paths = [import_root for _, _, import_root, module in artifacts if module is None]
+
+    def measure(phase):
+        for name, path, import_root, module in artifacts:
+            entry = report.setdefault(name, {})
+            entry[phase] = {'bytes': dir_size(path), 'files': file_count(path)}
+            if module:
+                import_paths = [import_root] + [p for p in layer_paths if p != import_root]
+                entry[phase]['importMs'], entry[phase]['importError'] = measure_import_ms(
+                    import_paths, module, args.runtime_path, args.runs
+                )
+
+    report = {}
+    measure('before')
+
+    for name, path, import_root, module in artifacts:
+        entry = report[name]
+        if args.keep_runtime_deps:
+            entry['prunedDataEntries'] = prune_botocore_data(import_root)
+        else:
+            entry['removedPackages'] = remove_runtime_packages(import_root)
+        remove_junk(path)
+        compile_sourceless(path, args.optimize)
+
+    measure('after')
+
+    def fmt_ms(value):
+        return f'{value:8.1f}' if value is not None else '       -'
+
+    print(f"{'artifact':<24} {'size before':>12} {'size after':>12} {'import before':>14} {'import after':>13}")
+    for name, entry in report.items():
+        before, after = entry['before'], entry['after']
+        print(
+            f"{name:<24} {before['bytes'] / 1024:>10.0f}KB {after['bytes'] / 1024:>10.0f}KB "
+            f"{fmt_ms(before.get('importMs')):>12}ms {fmt_ms(after.get('importMs')):>11}ms"
+        )
+        for phase in ('before', 'after'):
+            if entry[phase].get('importError'):
+                print(f"  {phase} import failed: {entry[phase]['importError']}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+検索インデックスのポスティング（SK: SEARCH#{gram}#{taskId}）をタスクから作り直す修復ジョブ
+
+ポスティングはテーブルのストリームのコンシューマ（functions/process_task_changes）が更新するため、
+再試行を使い切ったレコード（SearchIndexErrors メトリクス）や、検索の導入前・索引の上限
+（SEARCH_MAX_POSTINGS_PER_TASK 等）の変更前に書き込まれたタスクによりタスクとずれることがある。
+各ユーザーのタスクを強い整合性で読み、求めたポスティングと既存のポスティングの差分だけを書き込む。
+
+何度実行しても結果は同じ。稼働中に実行してよいが、実行中に更新されたタスクは
+次の実行で修復される場合がある。
+
+使い方:
+    python scripts/rebuild_search_index.py --table-name serverless-todo-dev-todos [--user-id test-user-001] [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'layers', 'common_layer', 'python'))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='検索インデックスを作り直す')
+    parser.add_argument('--table-name', default=os.environ.get('TABLE_NAME'), required='TABLE_NAME' not in os.environ)
+    parser.add_argument('--user-id', action='append', help='対象のユーザー（省略時はタスクかポスティングを持つ全ユーザー）')
+    parser.add_argument('--dry-run', action='store_true', help='書き込みを行わずずれのあるユーザーのみ表示')
+    return parser.parse_args()
+
+def find_users(table_name):
+    """タスクまたはポスティングを持つユーザーIDをスキャンで列挙"""
+    import boto3
+    from boto3.dynamodb.conditions import Attr
+    from common.dynamodb_helper import TASK_SK_PREFIX
+    from common.search import SEARCH_SK_PREFIX
+
+    table = boto3.resource('dynamodb').Table(table_name)
+    scan_params = {
+        'FilterExpression': Attr('SK').begins_with(TASK_SK_PREFIX) | Attr('SK').begins_with(SEARCH_SK_PREFIX),
+        'ProjectionExpression': 'PK'
+    }
+
+    users = set()
+    while True:
+        response = table.scan(**scan_params)
+        for item in response.get('Items', []):
+            # PK: USER#{userId}
+            users.add(item['PK'][len('USER#'):])
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return sorted(users)
+        scan_params['ExclusiveStartKey'] = last_key
+
+def main():
+    args = parse_args()
+    os.environ['TABLE_NAME'] = args.table_name
+
+    from common import search
+
+    users = args.user_id or find_users(args.table_name)
+
+    repaired = 0
+    for user_id in users:
+        deleted, written = search.rebuild(user_id, dry_run=args.dry_run)
+        if not deleted and not written:
+            continue
+
+        print(f"{user_id}: stale={deleted}, missing={written}")
+        repaired += 1
+
+    label = 'would repair' if args.dry_run else 'repaired'
+    print(f"Done: users={len(users)}, {label}={repaired}")
+
+if __name__ == '__main__':
+    main()
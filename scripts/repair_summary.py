@@ -0,0 +1,78 @@
+"""
+タスク件数の集計アイテム（SK: SUMMARY）をパーティションから数え直す修復ジョブ
+
+集計はタスクの書き込みと同じトランザクションで更新されるが、一括削除の途中の失敗や
+集計の導入前に作成されたタスクにより実際の件数とずれることがある。各ユーザーの
+タスクを強い整合性で数え直し、集計アイテムを置き換える。
+
+数え直しの間に集計が更新された場合はそのユーザーを最初からやり直すため、
+稼働中に実行してよい。何度実行しても結果は同じ。
+
+使い方:
+    python scripts/repair_summary.py --table-name serverless-todo-dev-todos [--user-id test-user-001] [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'layers', 'common_layer', 'python'))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='タスク件数の集計を数え直す')
+    parser.add_argument('--table-name', default=os.environ.get('TABLE_NAME'), required='TABLE_NAME' not in os.environ)
+    parser.add_argument('--user-id', action='append', help='対象のユーザー（省略時はタスクか集計を持つ全ユーザー）')
+    parser.add_argument('--dry-run', action='store_true', help='書き込みを行わずずれのあるユーザーのみ表示')
+    return parser.parse_args()
+
+def find_users(table_name):
+    """タスクまたは集計アイテムを持つユーザーIDをスキャンで列挙"""
+    import boto3
+    from boto3.dynamodb.conditions import Attr
+    from common.dynamodb_helper import TASK_SK_PREFIX
+    from common.summary import SUMMARY_SK
+
+    table = boto3.resource('dynamodb').Table(table_name)
+    scan_params = {
+        'FilterExpression': Attr('SK').begins_with(TASK_SK_PREFIX) | Attr('SK').eq(SUMMARY_SK),
+        'ProjectionExpression': 'PK'
+    }
+
+    users = set()
+    while True:
+        response = table.scan(**scan_params)
+        for item in response.get('Items', []):
+            # PK: USER#{userId}
+            users.add(item['PK'][len('USER#'):])
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return sorted(users)
+        scan_params['ExclusiveStartKey'] = last_key
+
+def main():
+    args = parse_args()
+    os.environ['TABLE_NAME'] = args.table_name
+
+    from common import gateway, summary
+
+    users = args.user_id or find_users(args.table_name)
+
+    repaired = 0
+    for user_id in users:
+        stored = gateway.get_item(summary.summary_key(user_id), consistent=True) or {}
+        counted = summary.count_tasks(user_id)
+        drift = {name: counted.get(name, 0) - int(stored.get(name, 0)) for name in summary.COUNTERS}
+        drift = {name: diff for name, diff in drift.items() if diff}
+        if not drift:
+            continue
+
+        print(f"{user_id}: drift={drift}")
+        if not args.dry_run:
+            summary.recompute(user_id)
+        repaired += 1
+
+    label = 'would repair' if args.dry_run else 'repaired'
+    print(f"Done: users={len(users)}, {label}={repaired}")
+
+if __name__ == '__main__':
+    main()